@@ -0,0 +1,69 @@
+"""
+    Benchmark of the bincount based Cramér's V (association_utils) against the previous implementation
+    (pd.crosstab + scipy.stats.chi2_contingency per column), on the categorical columns of the per player
+    frame including the high cardinality player name, tournament and score columns.
+    The values must be equal; the feature x feature matrix is timed too.
+
+    Run from the project root:
+        python -m benchmarks.bench_cramers_v
+"""
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+
+from src.utils import association_utils
+from benchmarks.bench_merge_players_to_matches import make_data
+
+
+def _legacy_cramers_v(x, y):
+    confusion_matrix = pd.crosstab(x, y)
+    chi2 = stats.chi2_contingency(confusion_matrix)[0]
+    n = confusion_matrix.sum().sum()
+    phi2 = chi2 / n
+    r,k = confusion_matrix.shape
+    phi2corr = max(0, phi2 - ((k-1)*(r-1))/(n-1))
+    rcorr = r - ((r-1)**2)/(n-1)
+    kcorr = k - ((k-1)**2)/(n-1)
+    return np.sqrt(phi2corr / min((kcorr-1), (rcorr-1)))
+
+
+def _time(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    players, _ = make_data()
+    rng = np.random.default_rng(0)
+    players["score"] = rng.choice([f"6-{i} 6-{j}" for i in range(5) for j in range(5)], len(players))
+    players.loc[rng.random(len(players)) < 0.02, "ioc"] = np.nan
+    # winner-dependent category, so not every association is zero
+    players["form"] = np.where(players["is_winner"] == 1, rng.choice(["good", "ok"], len(players), p=[0.7, 0.3]),
+                               rng.choice(["good", "ok"], len(players), p=[0.4, 0.6]))
+    cols = players.select_dtypes(include="object").columns.tolist()
+    print(f"[INFO] Rows: {len(players)}, categorical columns: "
+          + ", ".join(f"{col} ({players[col].nunique()})" for col in cols))
+
+    target, new_time = _time(association_utils.target_cramers_v, players, "is_winner", cols)
+    legacy, legacy_time = _time(lambda: {col: _legacy_cramers_v(players[col], players["is_winner"]) for col in cols})
+    for col, value in target:
+        np.testing.assert_allclose(value, legacy[col], rtol=1e-9, atol=1e-12)
+    print(f"[INFO] Feature x target: crosstab + chi2_contingency: {legacy_time:.2f} s, bincount: {new_time:.3f} s, "
+          f"speedup: {legacy_time / new_time:.0f}x (values are equal)")
+
+    matrix, new_time = _time(association_utils.cramers_v_matrix, players, cols)
+    start = time.perf_counter()
+    for i, col_x in enumerate(cols):
+        for col_y in cols[i + 1:]:
+            np.testing.assert_allclose(matrix.loc[col_x, col_y], _legacy_cramers_v(players[col_x], players[col_y]),
+                                       rtol=1e-9, atol=1e-12)
+    legacy_time = time.perf_counter() - start
+    print(f"[INFO] Feature x feature ({len(cols)} columns): crosstab + chi2_contingency: {legacy_time:.2f} s, "
+          f"bincount: {new_time:.3f} s, speedup: {legacy_time / new_time:.0f}x (values are equal)")
+
+
+if __name__ == "__main__":
+    main()
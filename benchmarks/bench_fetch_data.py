@@ -0,0 +1,169 @@
+"""
+    Benchmark of the yearly downloads of fetch_data against a local HTTP stand-in of the source server
+    (http.server with a fixed latency per request, ETag support and injectable errors), on synthetic yearly
+    csv files: one worker (the previous serial downloads) against the thread pool. It checks the behaviour
+    of the downloader too:
+        200: every year is downloaded, the merged dataframe is the same as with one worker
+        304: a second run sends conditional requests only and keeps the files on disk
+        changed year: only the year changed on the server is downloaded again
+        retry: a 503 answer is retried by the session
+        failure: a 404 year raises one error listing it, even if an older file is on disk
+
+    Run from the project root:
+        python -m benchmarks.bench_fetch_data
+"""
+import contextlib
+import hashlib
+import http.server
+import io
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from src.data import fetch_data, synthetic_data
+from src.utils import api_utils
+
+
+N_SEASONS = 10
+START_YEAR = 2000
+LATENCY = 0.05
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            failures = server.failures.get(self.path, 0)
+            if failures:
+                server.failures[self.path] = failures - 1
+        time.sleep(server.latency)
+
+        body = server.files.get(self.path)
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"' if body is not None else None
+        if body is None:
+            status = 404
+        elif failures:
+            status = 503
+        elif self.headers.get("If-None-Match") == etag:
+            status = 304
+        else:
+            status = 200
+        with server.lock:
+            server.log.append((self.path, status))
+
+        self.send_response(status)
+        if status in (200, 304):
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body) if status == 200 else 0))
+        self.end_headers()
+        if status == 200:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server(files: dict, latency: float):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.files, server.failures, server.log = files, {}, []
+    server.latency, server.lock = latency, threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _statuses(server, start: int):
+    """
+        The answers of the server since start: year -> list of status codes
+    """
+    statuses = {}
+    for path, status in server.log[start:]:
+        statuses.setdefault(int(path.split("_")[-1].split(".")[0]), []).append(status)
+    return statuses
+
+
+def _download(server, url: str, output_folder: str, max_workers: int, year_to: int):
+    start = len(server.log)
+    with contextlib.redirect_stdout(io.StringIO()):
+        begin = time.perf_counter()
+        df = fetch_data._download_atp(START_YEAR, year_to, output_folder, url=url, max_workers=max_workers)
+        elapsed = time.perf_counter() - begin
+    return df, elapsed, _statuses(server, start)
+
+
+def _expect_failure(server, url: str, output_folder: str, year_to: int, failed_years: list):
+    start = len(server.log)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            fetch_data._download_atp(START_YEAR, year_to, output_folder, url=url)
+    except RuntimeError as e:
+        assert str(failed_years) in str(e), e
+        return _statuses(server, start)
+    raise AssertionError(f"The download of the years {failed_years} did not fail")
+
+
+def main():
+    matches = synthetic_data.generate_matches(N_SEASONS, start_year=START_YEAR)
+    years = list(range(START_YEAR, START_YEAR + N_SEASONS))
+    year_to = years[-1]
+    files = {
+        f"/atp_matches_{year}.csv": matches[matches["tourney_date"] // 10_000 == year].to_csv(index=False).encode()
+        for year in years
+    }
+    server = _start_server(files, LATENCY)
+    url = f"http://127.0.0.1:{server.server_address[1]}/atp_matches_{{year}}.csv"
+    print(f"[INFO] {len(years)} yearly files, {len(matches)} rows, {LATENCY * 1000:.0f} ms latency per request")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        serial, serial_time, _ = _download(server, url, os.path.join(tmp_dir, "serial"), 1, year_to)
+        folder = os.path.join(tmp_dir, "parallel")
+        df, elapsed, statuses = _download(server, url, folder, fetch_data.DEFAULT_MAX_WORKERS, year_to)
+        assert statuses == {year: [200] for year in years}, statuses
+        pd.testing.assert_frame_equal(df, serial)
+        assert len(df) == len(matches)
+        print(f"[INFO] 1 worker: {serial_time:.3f} s, {fetch_data.DEFAULT_MAX_WORKERS} workers: {elapsed:.3f} s, "
+              f"speedup: {serial_time / elapsed:.1f}x")
+
+        mtimes = {file: os.stat(os.path.join(folder, file)).st_mtime_ns for file in os.listdir(folder)}
+        df, elapsed, statuses = _download(server, url, folder, fetch_data.DEFAULT_MAX_WORKERS, year_to)
+        assert statuses == {year: [304] for year in years}, statuses
+        assert all(os.stat(os.path.join(folder, file)).st_mtime_ns == mtime for file, mtime in mtimes.items()
+                   if file.startswith("atp_matches_"))
+        pd.testing.assert_frame_equal(df, serial)
+        print(f"[INFO] Unchanged files (304): {elapsed:.3f} s")
+
+        last_file = f"/atp_matches_{year_to}.csv"
+        files[last_file] = files[last_file].rsplit(b"\n", 2)[0] + b"\n"
+        df, elapsed, statuses = _download(server, url, folder, fetch_data.DEFAULT_MAX_WORKERS, year_to)
+        assert statuses == {year: [200] if year == year_to else [304] for year in years}, statuses
+        assert len(df) == len(matches) - 1
+        print(f"[INFO] One changed year: {elapsed:.3f} s")
+
+        retry_year = years[3]
+        server.failures[f"/atp_matches_{retry_year}.csv"] = 1
+        df, _, statuses = _download(server, url, os.path.join(tmp_dir, "retry"), fetch_data.DEFAULT_MAX_WORKERS,
+                                    year_to)
+        assert statuses[retry_year] == [503, 200], statuses
+        assert len(df) == len(matches) - 1
+        print("[INFO] A 503 answer is retried")
+
+        failed_year = years[5]
+        del files[f"/atp_matches_{failed_year}.csv"]
+        failed_folder = os.path.join(tmp_dir, "failed")
+        statuses = _expect_failure(server, url, failed_folder, year_to, [failed_year])
+        assert statuses[failed_year] == [404], statuses
+        manifest = api_utils.load_manifest(os.path.join(failed_folder, fetch_data.MANIFEST_FILE_NAME))
+        assert sorted(manifest) == sorted(str(year) for year in years if year != failed_year), sorted(manifest)
+        assert not os.path.exists(os.path.join(failed_folder, f"all_from_{START_YEAR}_to_{year_to}.csv"))
+        # the older file of the year on disk is not used silently
+        _expect_failure(server, url, folder, year_to, [failed_year])
+        print("[INFO] A failed year raises one error, the manifest of the other years is saved")
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+    Benchmark of merge_players_data.merge_on_name_and_date against the previous row by row
+    implementation (iterrows + progress_apply) at the full 2000-2024 scale.
+    The matches of the players with a two token name and a single initial are used, where the previous
+    key functions and the player index give the same keys, so the results must be identical.
+
+    Run from the project root:
+        python -m benchmarks.bench_merge_on_name_and_date
+"""
+import time
+
+import pandas as pd
+
+from src.data import synthetic_data
+from src.utils import merge_players_data
+
+
+N_SEASONS = 25
+SWAPPED_RATIO = 0.1
+
+
+def _legacy_form_odds(name): 
+    if pd.isnull(name):
+        return None
+    parts = name.replace(".", "").replace("-", "").replace("'", "").split()
+    if(len(parts) > 2):
+        return None
+    
+    return f"{parts[0][:3].lower()} {parts[1].lower()}"
+
+
+def _legacy_form_atp(name): 
+    if pd.isnull(name):
+        return None
+    parts = name.replace(".", "").replace("-", "").replace("'", "").split()
+    if(len(parts) > 2):
+        return None
+    
+    return f"{parts[1][:3].lower()} {parts[0][0].lower()}"
+
+
+def _legacy_merge_on_name_and_date(df1: pd.DataFrame, df2: pd.DataFrame, date_col: str = "date"):
+    df1 = df1.copy()
+    df2 = df2.copy()
+
+    df1.columns = df1.columns.str.lower()
+    df2.columns = df2.columns.str.lower()
+
+    df1["winner_key"] = df1["winner"].apply(_legacy_form_atp)
+    df1["loser_key"] = df1["loser"].apply(_legacy_form_atp)
+    df1[date_col] = pd.to_datetime(df1[date_col], format="%Y%m%d")
+
+    df2["winner_key"] = df2["winner"].apply(_legacy_form_odds)
+    df2["loser_key"] = df2["loser"].apply(_legacy_form_odds)
+    df2[date_col] = pd.to_datetime(df2[date_col], format="%Y-%m-%d")
+
+    match_key_dict = {
+        (row[date_col], frozenset([row["winner_key"], row["loser_key"]])): row["winner_key"]
+        for _, row in df1.iterrows()
+    }
+    def fix_order(row):
+        match_key = (row[date_col], frozenset([row["winner_key"], row["loser_key"]]))
+        correct_winner = match_key_dict.get(match_key)
+
+        if correct_winner is not None and row["winner_key"] != correct_winner:
+            row["winner_key"], row["loser_key"] = row["loser_key"], row["winner_key"]
+            row["winner"], row["loser"] = row["loser"], row["winner"]
+        return row
+    df2 = df2.apply(fix_order, axis=1)
+
+    return pd.merge(
+        df1,
+        df2,
+        on=[date_col, "winner_key", "loser_key"],
+        suffixes=("_df1", "_df2"),
+        how="left",
+    )
+
+
+def make_data(n_seasons: int = N_SEASONS, seed: int = 42):
+    """
+        Create ATP shaped match statistics (full names) and odds (abbreviated names, part of the
+        winner / loser pairs swapped) for n_seasons seasons with synthetic_data. Only the matches of
+        players with a two token name are kept (see the module docstring).
+    """
+    matches = synthetic_data.generate_matches(n_seasons, seed=seed)
+    two_tokens = [matches[col].str.split().str.len() == 2 for col in ("winner_name", "loser_name")]
+    matches = matches[two_tokens[0] & two_tokens[1]].reset_index(drop=True)
+    odds = synthetic_data.generate_odds(matches, seed=seed, coverage=0.9, swapped_ratio=SWAPPED_RATIO, exact_dates=True)
+
+    df1 = matches.rename(columns={"winner_name": "winner", "loser_name": "loser", "tourney_date": "date"})
+    return df1[["winner", "loser", "date", "w_ace", "l_ace"]], odds[["Winner", "Loser", "Date", "B365W", "B365L"]]
+
+
+def _time(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    df1, df2 = make_data()
+    print(f"[INFO] Stats rows: {len(df1)}, odds rows: {len(df2)}")
+
+    merged, vectorized_time = _time(merge_players_data.merge_on_name_and_date, df1, df2)
+    legacy, legacy_time = _time(_legacy_merge_on_name_and_date, df1, df2)
+
+    pd.testing.assert_frame_equal(merged, legacy, check_dtype=False)
+    print(f"[INFO] Row by row implementation: {legacy_time:.2f} s")
+    print(f"[INFO] Vectorized implementation: {vectorized_time:.2f} s")
+    print(f"[INFO] Speedup: {legacy_time / vectorized_time:.1f}x (results are identical)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+    Benchmark of merge_players_data.merge_players_to_matches against the previous implementation
+    (drop_duplicates + two full merges on four keys): wall time and tracemalloc peak memory.
+
+    Run from the project root:
+        python -m benchmarks.bench_merge_players_to_matches
+"""
+import contextlib
+import io
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from src.data import synthetic_data
+from src.features import build_features
+from src.utils import merge_players_data
+
+
+N_SEASONS = 25
+N_FEATURE_COLS = 12
+
+
+def _legacy_merge_players_to_matches(players_df, original_df):
+    players_df = players_df.drop_duplicates(subset=['tourney_id', 'match_num', 'player_name', 'tourney_date'])
+
+    original_df['tourney_date'] = pd.to_datetime(original_df['tourney_date'])
+    players_df['tourney_date'] = pd.to_datetime(players_df['tourney_date'])
+
+    id_cols = ['tourney_id', 'match_num', 'player_name', 'tourney_date']
+    stat_cols = [col for col in players_df.columns if col not in id_cols + ['id', 'hand', 'ioc', 'ht', 'age']]
+    players_df_reduced = players_df[id_cols + stat_cols]
+
+    merged = original_df.merge(
+        players_df_reduced,
+        left_on=['tourney_id', 'match_num', 'winner_name', 'tourney_date'],
+        right_on=['tourney_id', 'match_num', 'player_name', 'tourney_date'],
+        how='left'
+    ).rename(columns={col: f'winner_{col}' for col in stat_cols})
+    merged = merged.drop(columns=['player_name'])
+
+    merged = merged.merge(
+        players_df_reduced,
+        left_on=['tourney_id', 'match_num', 'loser_name', 'tourney_date'],
+        right_on=['tourney_id', 'match_num', 'player_name', 'tourney_date'],
+        how='left'
+    ).rename(columns={col: f'loser_{col}' for col in stat_cols})
+    return merged.drop(columns=['player_name'])
+
+
+def make_data(n_seasons: int = N_SEASONS, seed: int = 42):
+    """
+        Create an ATP shaped match frame (synthetic_data.generate_matches) and its per player frame
+        (one row per player and match, with the match columns, the player's stats and a few rolling
+        feature columns)
+    """
+    matches = synthetic_data.generate_matches(n_seasons, seed=seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        players = build_features.split_players_per_game(matches)
+    rng = np.random.default_rng(seed)
+    for i in range(N_FEATURE_COLS):
+        players[f"feature_{i}_last_5_avg"] = rng.normal(size=len(players))
+    return players, matches
+
+
+def _measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 ** 2
+
+
+def main():
+    players, matches = make_data()
+    print(f"[INFO] Matches: {len(matches)}, player rows: {len(players)}")
+
+    merged, new_time, new_peak = _measure(merge_players_data.merge_players_to_matches, players, matches)
+    assert pd.api.types.is_integer_dtype(matches["tourney_date"]), "the input frame was modified"
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", pd.errors.SettingWithCopyWarning)
+        legacy, legacy_time, legacy_peak = _measure(_legacy_merge_players_to_matches, players.copy(), matches.copy())
+
+    # The legacy merge duplicates the match level columns (surface_x / surface_y / loser_surface, ...)
+    legacy = legacy.loc[:, ~legacy.columns.duplicated()]
+    common_cols = [col for col in merged.columns if col in legacy.columns]
+    pd.testing.assert_frame_equal(merged[common_cols], legacy[common_cols])
+    print(f"[INFO] Previous implementation: {legacy_time:.2f} s, peak memory {legacy_peak:.0f} MB")
+    print(f"[INFO] Single pass implementation: {new_time:.2f} s, peak memory {new_peak:.0f} MB")
+    print(f"[INFO] Speedup: {legacy_time / new_time:.1f}x, memory: {legacy_peak / new_peak:.1f}x less "
+          f"({len(common_cols)} common columns are identical)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+    Scaling benchmark of the process pool feature generation (parallel_features) with 1, 2, 4 and 8 workers:
+    the statistical features sharded by season and the rolling features sharded by player, against the
+    single process build_features functions. The results must be the same for every number of workers.
+    The speedup is bounded by the number of cores of the machine (printed first).
+
+    Run from the project root:
+        python -m benchmarks.bench_parallel_features
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.features import build_features, parallel_features
+from benchmarks.bench_merge_players_to_matches import make_data
+from benchmarks.bench_rolling_features import MANY_WINDOWS, NOTEBOOK_SPECS
+
+
+N_SEASONS = 50
+WORKERS = [1, 2, 4, 8]
+
+
+def _time(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _scaling(label: str, serial_func, parallel_func, frame: pd.DataFrame, *args, **kwargs):
+    serial, serial_time = _time(serial_func, frame, *args)
+    print(f"[INFO] {label}: single process build_features: {serial_time:.2f} s")
+    first = None
+    for workers in WORKERS:
+        result, elapsed = _time(parallel_func, frame, *args, max_workers=workers, **kwargs)
+        if first is None:
+            first = result
+            # the rolling means are differences of prefix sums over the whole frame or over a shard, their
+            # rounding differs in the last digits (~1e-11 on the ranking columns of the synthetic seasons)
+            pd.testing.assert_frame_equal(result, serial, rtol=1e-10, atol=1e-10)
+        else:
+            pd.testing.assert_frame_equal(result, first, check_exact=True)
+        print(f"[INFO] {label}: {workers} workers: {elapsed:.2f} s, speedup: {serial_time / elapsed:.2f}x")
+
+
+def main():
+    players, matches = make_data(N_SEASONS)
+    print(f"[INFO] CPU count: {os.cpu_count()}, matches: {len(matches)}, player rows: {len(players)}")
+
+    _scaling("Statistical features", build_features.create_statistical_features,
+             parallel_features.create_statistical_features_parallel, matches)
+
+    specs = [(col, MANY_WINDOWS) for col, _ in NOTEBOOK_SPECS]
+    _scaling(f"Rolling features ({len(specs) * len(MANY_WINDOWS)})", build_features.compute_rolling_features,
+             parallel_features.compute_rolling_features_parallel, players, specs)
+    print("[INFO] The results are the same for every number of workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+    Replay of a 2000-2024 history through player_form.update_form_store in weekly batches, with a
+    checkpoint save / reload in the middle. The features must be equal to the full recompute
+    (build_features.compute_rolling_features), and one batch update is timed against the full recompute
+    which was needed for every new batch before.
+
+    Run from the project root:
+        python -m benchmarks.bench_player_form
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.features import build_features, player_form
+from benchmarks.bench_merge_players_to_matches import make_data
+
+
+STATS = ["ranking", "rank_points", "ace", "df", "svpt", "1stin", "1stwon", "2ndwon", "svgms", "bpsaved",
+         "bpfaced", "minutes"]
+WINDOWS = [5, 10]
+
+
+def main():
+    players, _ = make_data()
+    players = players.drop(columns=[col for col in players.columns if col.endswith("_avg")])
+    rng = np.random.default_rng(0)
+    players.loc[rng.random(len(players)) < 0.05, "ace"] = np.nan
+    print(f"[INFO] Player rows: {len(players)}")
+
+    start = time.perf_counter()
+    full = build_features.compute_rolling_features(players, [(col, WINDOWS) for col in STATS])
+    full_time = time.perf_counter() - start
+
+    store = player_form.create_form_store(STATS, WINDOWS)
+    batches = [batch for _, batch in players.groupby("tourney_date", sort=True)]
+    replayed, batch_times = [], []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        checkpoint = os.path.join(tmp_dir, "player_form.npz")
+        for i, batch in enumerate(batches):
+            start = time.perf_counter()
+            replayed.append(player_form.update_form_store(store, batch))
+            batch_times.append(time.perf_counter() - start)
+            if i == len(batches) // 2:
+                player_form.save_form_store(store, checkpoint)
+                store = player_form.load_form_store(checkpoint)
+    replayed = pd.concat(replayed).loc[players.index]
+
+    feature_cols = [col for col in full.columns if col not in players.columns]
+    pd.testing.assert_frame_equal(replayed[feature_cols], full[feature_cols], rtol=1e-9, atol=1e-9)
+    print(f"[INFO] Replayed {len(batches)} batches, {len(feature_cols)} features are equal to the full recompute")
+    print(f"[INFO] Full recompute: {full_time:.3f} s, median batch update "
+          f"({int(np.median([len(batch) for batch in batches]))} rows): {np.median(batch_times) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+    Benchmark of the p1_ / p2_ swap of symmetric_pairs on a synthetic engineered frame (float64 and the compact
+    dtypes of dtype_utils), against a row by row swap (the previous notebook handling, measured on a sample
+    of rows) and a column by column .loc swap. The results must be the same.
+
+    Run from the project root:
+        python -m benchmarks.bench_randomize_players
+"""
+import contextlib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data import synthetic_data
+from src.features import build_features, symmetric_pairs
+from src.pipeline import run_pipeline
+from src.utils import data_utils, dtype_utils, merge_players_data
+
+
+N_SEASONS = 25
+ROW_BY_ROW_SAMPLE = 2_000
+
+
+def make_engineered_data(n_seasons: int):
+    matches = synthetic_data.generate_matches(n_seasons)
+    # parsed like load_data.load_interim_data does
+    matches["tourney_date"] = pd.to_datetime(matches["tourney_date"].astype(str), format="%Y%m%d")
+    with contextlib.redirect_stdout(io.StringIO()):
+        interim = data_utils.fill_na_median(data_utils.drop_hight_na_columns(matches, threshold=0.3))
+        players = build_features.split_players_per_game(build_features.create_statistical_features(interim))
+        players = build_features.compute_rolling_features(players, run_pipeline.ROLLING_SPECS)
+        merged = merge_players_data.merge_players_to_matches(players_df=players, original_df=interim)
+        merged = build_features.rename_cols(merged)
+    merged["is_winner"] = 1
+    # without the duplicated column names of the merge, so the baselines can use .loc
+    return merged.loc[:, ~merged.columns.duplicated()]
+
+
+def _row_by_row(df: pd.DataFrame, mask: np.ndarray, pairs: dict):
+    df = df.copy()
+    first = df.columns[pairs["first"]]
+    second = df.columns[pairs["second"]]
+    for i in np.flatnonzero(mask):
+        row = df.iloc[i]
+        df.loc[df.index[i], list(first) + list(second)] = list(row[second]) + list(row[first])
+        df.loc[df.index[i], "is_winner"] = 0
+    return df
+
+
+def _column_by_column(df: pd.DataFrame, mask: np.ndarray, pairs: dict):
+    df = df.copy()
+    for position_1, position_2 in zip(pairs["first"], pairs["second"]):
+        col_1, col_2 = df.columns[position_1], df.columns[position_2]
+        values_1 = df.loc[mask, col_1].copy()
+        df.loc[mask, col_1] = df.loc[mask, col_2]
+        df.loc[mask, col_2] = values_1
+    df.loc[mask, "is_winner"] = 0
+    return df
+
+
+def _time(func, *args, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _run(label: str, df: pd.DataFrame):
+    pairs = symmetric_pairs.find_player_pairs(df.columns)
+    mask = np.random.default_rng(42).random(len(df)) < symmetric_pairs.DEFAULT_SWAP_RATIO
+    memory = df.memory_usage(deep=True).sum() / 1024 ** 2
+    print(f"[INFO] {label}: {len(df)} rows, {len(pairs['names'])} pairs, {memory:.1f} MB")
+
+    result, elapsed = _time(symmetric_pairs.swap_players, df, mask, pairs)
+    print(f"[INFO] {label}: symmetric_pairs.swap_players: {elapsed:.3f} s")
+
+    expected, column_time = _time(_column_by_column, df, mask, pairs)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    print(f"[INFO] {label}: column by column .loc: {column_time:.3f} s, speedup: {column_time / elapsed:.1f}x")
+
+    sample = df.iloc[:ROW_BY_ROW_SAMPLE]
+    expected, row_time = _time(_row_by_row, sample, mask[:ROW_BY_ROW_SAMPLE], pairs)
+    pd.testing.assert_frame_equal(result.iloc[:ROW_BY_ROW_SAMPLE], expected, check_dtype=False)
+    row_time *= len(df) / len(sample)
+    print(f"[INFO] {label}: row by row (estimated from {len(sample)} rows): {row_time:.1f} s, "
+          f"speedup: {row_time / elapsed:.0f}x")
+
+    _, elapsed = _time(symmetric_pairs.both_orientations, df, pairs)
+    print(f"[INFO] {label}: symmetric_pairs.both_orientations: {elapsed:.3f} s")
+    _, elapsed = _time(symmetric_pairs.add_difference_features, df, pairs)
+    print(f"[INFO] {label}: symmetric_pairs.add_difference_features: {elapsed:.3f} s")
+
+
+def main():
+    df = make_engineered_data(N_SEASONS)
+    _run("float64 / object", df)
+    with contextlib.redirect_stdout(io.StringIO()):
+        compact, _, _ = dtype_utils.optimize_dtypes(df)
+    _run("compact dtypes", compact)
+
+
+if __name__ == "__main__":
+    main()
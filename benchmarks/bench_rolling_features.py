@@ -0,0 +1,68 @@
+"""
+    Benchmark of build_features.compute_rolling_features (one sort, one prefix sum pass for every spec)
+    against one groupby().shift(1).rolling() pass per column and window, as the feature notebook did.
+    The features of both implementations must be equal, with the notebook's 12 specs and with many windows.
+
+    Run from the project root:
+        python -m benchmarks.bench_rolling_features
+"""
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from src.features import build_features
+from benchmarks.bench_merge_players_to_matches import make_data
+
+
+NOTEBOOK_SPECS = [
+    ("ranking", 5), ("rank_points", 5), ("ace", 5), ("df", 5), ("svpt", 5), ("1stin", 5),
+    ("1stwon", 5), ("2ndwon", 5), ("svgms", 5), ("bpsaved", 5), ("bpfaced", 5), ("minutes", 5),
+]
+MANY_WINDOWS = [3, 5, 10, 15, 20, 30, 50, 75, 100]
+
+
+def _legacy_rolling_features(df: pd.DataFrame, specs: list):
+    df = df.sort_values(["id", "tourney_date", "match_num"], kind="stable")
+    for col, windows in specs:
+        for window in np.atleast_1d(windows):
+            shifted = df.groupby("id")[col].shift(1)
+            df[f"{col}_last_{window}_avg"] = (
+                shifted.groupby(df["id"]).rolling(window, min_periods=window).mean().reset_index(level=0, drop=True)
+            )
+    return df.sort_index()
+
+
+def _time(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _compare(players: pd.DataFrame, specs: list, label: str):
+    features, new_time = _time(build_features.compute_rolling_features, players, specs)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+        legacy, legacy_time = _time(_legacy_rolling_features, players, specs)
+
+    feature_cols = [col for col in legacy.columns if col not in players.columns]
+    pd.testing.assert_frame_equal(features[feature_cols], legacy[feature_cols], rtol=1e-9, atol=1e-9)
+    print(f"[INFO] {label}: {len(feature_cols)} features, groupby-rolling per feature: {legacy_time:.2f} s, "
+          f"one pass: {new_time:.2f} s, speedup: {legacy_time / new_time:.1f}x")
+
+
+def main():
+    players, _ = make_data()
+    players = players.drop(columns=[col for col in players.columns if col.endswith("_avg")])
+    # Missing stats as in the real data
+    rng = np.random.default_rng(0)
+    players.loc[rng.random(len(players)) < 0.05, "ace"] = np.nan
+    print(f"[INFO] Player rows: {len(players)}, players: {players['id'].nunique()}")
+
+    _compare(players, NOTEBOOK_SPECS, "Notebook specs")
+    _compare(players, [(col, MANY_WINDOWS) for col, _ in NOTEBOOK_SPECS], "Many windows")
+
+
+if __name__ == "__main__":
+    main()
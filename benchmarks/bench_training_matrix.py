@@ -0,0 +1,82 @@
+"""
+    Benchmark of the training matrix (training_matrix.build_training_matrix + time_split) against the baseline
+    of the EDA notebook (LabelEncoder on a copy of the dataframe, float64 features, random train_test_split),
+    on a synthetic engineered frame: time and tracemalloc peak memory. The encoded values must be the same.
+
+    Run from the project root:
+        python -m benchmarks.bench_training_matrix
+"""
+import contextlib
+import io
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from src.features import symmetric_pairs, training_matrix
+from benchmarks.bench_randomize_players import make_engineered_data
+
+
+N_SEASONS = 25
+
+
+def _notebook_baseline(df: pd.DataFrame, categorical_cols: list):
+    data = df.copy()
+    for col in categorical_cols:
+        data[col] = LabelEncoder().fit_transform(data[col].astype(str))
+    X = data.drop(columns=["is_winner", "tourney_date"])
+    y = data["is_winner"]
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+
+def _matrix(df: pd.DataFrame, code_maps: dict | None):
+    matrix = training_matrix.build_training_matrix(df, code_maps=code_maps)
+    return matrix, training_matrix.time_split(matrix, test_from=matrix["dates"][int(len(df) * 0.8)])
+
+
+def _measure(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak / 1024 ** 2
+
+
+def main():
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = symmetric_pairs.randomize_players(make_engineered_data(N_SEASONS))
+    categorical_cols = df.select_dtypes(include="object").columns.tolist()
+    print(f"[INFO] {len(df)} rows, {df.shape[1]} columns ({len(categorical_cols)} categorical)")
+
+    split, elapsed, peak = _measure(_notebook_baseline, df, categorical_cols)
+    print(f"[INFO] Notebook baseline (LabelEncoder, float64, random split): {elapsed:.3f} s, peak {peak:.1f} MB")
+
+    (matrix, parts), elapsed, peak = _measure(_matrix, df, None)
+    print(f"[INFO] build_training_matrix + time_split (fit codes): {elapsed:.3f} s, peak {peak:.1f} MB, "
+          f"matrix {matrix['X'].nbytes / 1024 ** 2:.1f} MB")
+    _, elapsed, peak = _measure(_matrix, df, matrix["code_maps"])
+    print(f"[INFO] build_training_matrix + time_split (saved codes): {elapsed:.3f} s, peak {peak:.1f} MB")
+
+    # the sorted LabelEncoder codes are the same as the codes of the columns which do not share their categories
+    # (the score is not a feature of the matrix)
+    X_train = split[0]
+    for col in categorical_cols:
+        group = matrix["code_maps"]["groups"].get(col)
+        if group == col:
+            j = matrix["feature_names"].index(col)
+            expected = pd.Series(X_train[col].to_numpy(), index=X_train.index)
+            actual = pd.Series(matrix["X"][:, j], index=matrix["index"])
+            assert np.array_equal(actual[expected.index].to_numpy(), expected.to_numpy()), col
+    assert all(np.shares_memory(X, matrix["X"]) for X, _ in parts.values() if len(X))
+    print("[INFO] The codes are the same and the splits are views of the matrix")
+
+
+if __name__ == "__main__":
+    main()
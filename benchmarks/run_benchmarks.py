@@ -0,0 +1,195 @@
+"""
+    Benchmark suite on synthetic ATP data (src/data/synthetic_data.py): the merges, the cleaning functions,
+    the loaders and the statistics behind the EDA plots. Every case records the best wall time of a few runs,
+    the throughput (rows / s) and the tracemalloc peak memory of a separate run. The results can be saved
+    as JSON and compared with an earlier result, the cases which got slower or use more memory than the
+    threshold are reported as regressions (exit code 1).
+
+    Run from the project root:
+        python -m benchmarks.run_benchmarks --seasons 25 --save benchmarks/results/baseline.json
+        python -m benchmarks.run_benchmarks --seasons 25 --compare benchmarks/results/baseline.json
+        python -m benchmarks.run_benchmarks --filter merge
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.data import load_data, storage, synthetic_data
+from src.features import build_features
+from src.utils import (association_utils, correlation_utils, data_utils, dtype_utils, merge_players_data,
+                       plot_utils, profile_utils)
+
+
+DEFAULT_SEASONS = 25
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 1.25
+
+
+def _make_cases(n_seasons: int, tmp_dir: str):
+    """
+        The benchmark cases: name -> (function without arguments, number of processed rows)
+    """
+    matches, odds = synthetic_data.generate_atp_data(n_seasons, exact_dates=True)
+    odds_match_dates = synthetic_data.generate_odds(matches)
+    stats = matches.rename(columns={"winner_name": "winner", "loser_name": "loser", "tourney_date": "date"})
+    with contextlib.redirect_stdout(io.StringIO()):
+        players = build_features.split_players_per_game(build_features.create_statistical_features(matches))
+        interim = data_utils.fill_na_median(data_utils.drop_hight_na_columns(matches, threshold=0.3))
+        csv_path = os.path.join(tmp_dir, "matches.csv")
+        matches.to_csv(csv_path, index=False)
+        interim_path = os.path.join(tmp_dir, "interim.csv")
+        interim.to_csv(interim_path, index=False)
+        dataset_path = os.path.join(tmp_dir, "interim_dataset")
+        storage.write_partitioned(interim, dataset_path)
+        dtype_schema = dtype_utils.infer_dtype_schema(interim)
+    numeric_cols = interim.select_dtypes(include="number").columns.tolist()
+    categorical_cols = ["surface", "round", "tourney_level", "ioc", "hand", "tourney_name", "score"]
+
+    def _profile():
+        profile_utils.clear_profile_cache()
+        return profile_utils.profile_dataframe(interim)
+
+    return {
+        "merge_on_name_and_date": (lambda: merge_players_data.merge_on_name_and_date(stats, odds), len(stats)),
+        "merge_on_name_and_date (as-of)": (
+            lambda: merge_players_data.merge_on_name_and_date(stats, odds_match_dates, date_window=14), len(stats)
+        ),
+        "merge_players_to_matches": (
+            lambda: merge_players_data.merge_players_to_matches(players_df=players, original_df=matches), len(players)
+        ),
+        "data_utils.drop_hight_na_columns": (lambda: data_utils.drop_hight_na_columns(matches, 0.3), len(matches)),
+        "data_utils.fill_na_median": (lambda: data_utils.fill_na_median(matches), len(matches)),
+        "data_utils.get_missing_values_summary": (
+            lambda: (profile_utils.clear_profile_cache(), data_utils.get_missing_values_summary(matches)), len(matches)
+        ),
+        "data_utils.clean_data_in_chunks": (
+            lambda: data_utils.clean_data_in_chunks(csv_path, os.path.join(tmp_dir, "cleaned.csv"),
+                                                    chunk_size=20_000),
+            len(matches),
+        ),
+        "load_data.load_interim_data (csv)": (lambda: load_data.load_interim_data(interim_path), len(interim)),
+        "load_data.load_interim_data (csv, schema)": (
+            lambda: load_data.load_interim_data(interim_path, dtype_schema=dtype_schema), len(interim)
+        ),
+        "dtype_utils.optimize_dtypes": (lambda: dtype_utils.optimize_dtypes(interim, dtype_schema), len(interim)),
+        "load_data.load_interim_data (parquet)": (lambda: load_data.load_interim_data(dataset_path), len(interim)),
+        "load_data.load_interim_data (columns, dates)": (
+            lambda: load_data.load_interim_data(dataset_path, columns=["winner_id", "w_ace"],
+                                                date_from="2010-01-01"),
+            len(interim),
+        ),
+        "profile_utils.profile_dataframe": (_profile, len(interim)),
+        "plot_utils.numeric_plot_data": (
+            lambda: [plot_utils._numeric_plot_data(col, interim[col].to_numpy(dtype=np.float64, na_value=np.nan),
+                                                   kde_max_rows=10_000) for col in numeric_cols],
+            len(interim),
+        ),
+        "correlation_utils.correlation_matrix": (
+            lambda: correlation_utils.correlation_matrix(interim, numeric_cols), len(interim)
+        ),
+        "association_utils.target_cramers_v": (
+            lambda: association_utils.target_cramers_v(players, "is_winner", categorical_cols), len(players),
+        ),
+    }
+
+
+def _run_case(func, rows: int, repeat: int):
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    best = min(times)
+    return {"rows": rows, "time_s": best, "rows_per_s": rows / best, "peak_mb": peak / 1024 ** 2}
+
+
+def _compare(results: dict, baseline: dict, threshold: float):
+    """
+        Print the ratio of every case to the baseline, return the regressions
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        time_ratio = result["time_s"] / previous["time_s"]
+        memory_ratio = result["peak_mb"] / max(previous["peak_mb"], 1e-9)
+        status = "ok"
+        if time_ratio > threshold or memory_ratio > threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        print(f"[INFO] {name:45s} time {time_ratio:5.2f}x  memory {memory_ratio:5.2f}x  {status}")
+    return regressions
+
+
+def main(argv: list | None = None):
+    parser = argparse.ArgumentParser(description="Benchmark suite on synthetic ATP data")
+    parser.add_argument("--seasons", type=int, default=DEFAULT_SEASONS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--filter", default=None, help="run only the cases whose name contains this text")
+    parser.add_argument("--save", default=None, help="save the results into this JSON file")
+    parser.add_argument("--compare", default=None, help="compare with the results of this JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="time or memory ratio to the baseline above which a case is a regression")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cases = _make_cases(args.seasons, tmp_dir)
+        for name, (func, rows) in cases.items():
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = _run_case(func, rows, args.repeat)
+            result = results[name]
+            print(f"[INFO] {name:45s} {result['time_s']:8.3f} s  {result['rows_per_s']:12,.0f} rows/s  "
+                  f"peak {result['peak_mb']:8.1f} MB")
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "seasons": args.seasons,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"[INFO] Results saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["seasons"] != args.seasons:
+            print(f"[ERROR] The baseline was measured on {baseline['meta']['seasons']} seasons, not {args.seasons}")
+            return 2
+        regressions = _compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"[ERROR] {len(regressions)} regressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,37 +1,328 @@
 import os 
 import requests
+import numpy as np
 import pandas as pd 
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
+from src.utils import api_utils, instrumentation
 load_dotenv()
 
 ATP_MATCH_DATA_URL = os.getenv("ATP_TENNIS_MATCH_BY_YEAR")
 ATP_MATCH_ODDS_URL = os.getenv("ATP_TENNIS_ODDS_BY_YEAR")
+MANIFEST_FILE_NAME = "_manifest.json"
+DEFAULT_MAX_WORKERS = 8
+# the last season of the merged raw files, a later one (e.g. the current season) can be passed as year_to
+DEFAULT_YEAR_TO = 2024
+ATP_RAW_FOLDER = "data/raw/atp_men_2000_2024"
+ODDS_RAW_FOLDER = "data/raw/atp_odds_2001_2024"
 
-def _download_source_data_by_year(url: str, year: int, output_folder: str = "data/raw"):
+def _fetch_year(session: requests.Session, url: str, year: int, output_folder: str, entry: dict | None = None,
+                timeout: float = api_utils.DEFAULT_TIMEOUT):
+    """
+        Download the csv file of a single year into the output folder, unless the file on disk
+        is still the same as on the server (checked with the manifest entry)
+
+        Params: 
+            session: requests.Session
+            url: str
+            year: int 
+            output_folder: str
+            entry: dict | None (manifest entry of the year)
+            timeout: float
+
+        Return:
+            (str, dict | None, bool): path of the csv file, the new manifest entry (None if the download failed)
+                                      and whether the file changed
+    """
+    output_file = os.path.join(output_folder, f"atp_matches_{year}.csv")
+    try:
+        new_entry, changed = api_utils.download_file(session, url, output_file, entry, timeout)
+    except requests.RequestException as e:
+        print(f"[ERROR] Exception: year {year} - {e}")
+        return output_file, None, False
+    if changed:
+        print(f"[INFO] Data from year {year} downloaded")
+    else:
+        print(f"[INFO] Data from year {year} is up to date, download skipped")
+    return output_file, new_entry, changed
+
+def _check_failed_years(failed_years: list[int], manifest: dict | None = None, manifest_path: str | None = None):
+    """
+        Raise one error listing the years whose download failed, instead of using a missing or stale file
+        on disk. The manifest of the other years is saved first, so the next run downloads only the failed
+        years again.
+    """
+    if not failed_years:
+        return
+    if manifest is not None:
+        api_utils.save_manifest(manifest, manifest_path)
+    raise RuntimeError(f"Could not download the data of the years {failed_years}, try again")
+
+def _download_source_data_by_year(url: str, year: int, output_folder: str = "data/raw",
+                                  session: requests.Session | None = None):
     """
         Download a single csv file and return it as a pd.Dataframe from github
         
         Params: 
             year: int 
             output_folder: str
+            session: requests.Session | None (a new one is created if not given)
         
         Return:
             pd.Dataframe
     """
-
-    output_file = os.path.join(output_folder, f"atp_matches_{year}.csv")
     os.makedirs(output_folder, exist_ok=True)
-    response = requests.get(url)
-    if response.status_code == 200: 
-        with open(output_file, "wb") as f :
-            f.write(response.content)
-        print(f"[INFO] Data from year {year} downloaded")
-    else: 
-        print(f"[ERROR] Exception: {response.status_code} - {response.reason}")
+    session = session or api_utils.create_session()
+    output_file, entry, _ = _fetch_year(session, url, year, output_folder)
+    if entry is None:
+        _check_failed_years([year])
     return pd.read_csv(output_file)  
 
-def _download_atp(year_from: int, year_to: int, output_folder: str):
+def _sync_years(url: str, years: list[int], output_folder: str, manifest: dict,
+                max_workers: int = DEFAULT_MAX_WORKERS, read: bool = True):
+    """
+        Download the csv file of the given years with a bounded thread pool which shares one pooled session.
+        Years whose file on disk is still complete (based on the manifest) are not downloaded again.
+        The manifest is updated in place. The years whose download failed are left out of the result
+        (and their file on disk is not read), see _check_failed_years.
+
+        Params:
+            url: str (url template with a {year} placeholder)
+            years: list[int]
+            output_folder: str
+            manifest: dict
+            max_workers: int
+            read: bool (read the csv files into dataframes)
+
+        Return:
+            dict[int, tuple[bool, pd.DataFrame | None]]: whether the file changed and the dataframe of every
+                                                          downloaded year
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    session = api_utils.create_session(pool_size=max_workers)
+
+    def _download_and_read(year):
+        output_file, entry, changed = _fetch_year(
+            session,
+            url.format(year=year),
+            year,
+            output_folder,
+            manifest.get(str(year))
+        )
+        return entry, changed, pd.read_csv(output_file) if read and entry is not None else None
+
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_download_and_read, years))
+
+    synced = {}
+    for year, (entry, changed, df) in zip(years, results):
+        if entry is not None:
+            manifest[str(year)] = {**manifest.get(str(year), {}), **entry}
+            synced[year] = (changed, df)
+    return synced
+
+def _download_years(url: str, year_from: int, year_to: int, output_folder: str,
+                    max_workers: int = DEFAULT_MAX_WORKERS):
+    """
+        Download the csv file of every year (see _sync_years) and save the manifest in the output folder
+
+        Params:
+            url: str (url template with a {year} placeholder)
+            year_from: int
+            year_to: int
+            output_folder: str
+            max_workers: int
+
+        Return:
+            list[pd.DataFrame]: one dataframe per year, in year order
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    manifest_path = os.path.join(output_folder, MANIFEST_FILE_NAME)
+    manifest = api_utils.load_manifest(manifest_path)
+    years = list(range(year_from, year_to + 1))
+    synced = _sync_years(url, years, output_folder, manifest, max_workers)
+    _check_failed_years([year for year in years if year not in synced], manifest, manifest_path)
+    api_utils.save_manifest(manifest, manifest_path)
+    return [df for _, df in synced.values()]
+
+def _read_year_partition(output_folder: str, year: int, date_col: str, entry: dict):
+    """
+        Read the csv of a single year sorted by the date column and record its
+        row count and date range in the manifest entry (in place)
+    """
+    df = pd.read_csv(os.path.join(output_folder, f"atp_matches_{year}.csv"))
+    df = df.sort_values(by=date_col, kind="stable").reset_index(drop=True)
+    dates = pd.to_datetime(df[date_col].astype(str))
+    entry["rows"] = len(df)
+    entry["min_date"] = dates.min().strftime("%Y-%m-%d") if len(df) else None
+    entry["max_date"] = dates.max().strftime("%Y-%m-%d") if len(df) else None
+    return df
+
+def _merged_cut(cuts: list, dates: list):
+    """
+        The last cut of the merged file at or before the earliest of the dates (the last cut if there is
+        no date). The rows before it are not changed by the years of the dates.
+    """
+    dates = [date for date in dates if date is not None]
+    if not dates:
+        return cuts[-1]
+    first_date = min(dates)
+    return [cut for cut in cuts if cut["date"] is None or cut["date"] <= first_date][-1]
+
+def _write_merged_rows(f, df: pd.DataFrame, date_col: str, columns: list, cut_dates: list, row_start: int,
+                       write_index: bool):
+    """
+        Append the rows (sorted by the date column) to the merged file in segments, a new segment starts
+        at every cut date (None: the first row). Return the cuts {"date", "offset", "rows"} of the segments.
+    """
+    df = df.reindex(columns=columns)
+    if write_index:
+        df.index = range(row_start, row_start + len(df))
+    dates = pd.to_datetime(df[date_col].astype(str)).to_numpy()
+    positions = [
+        0 if date is None else int(np.searchsorted(dates, np.datetime64(date), side="left")) for date in cut_dates
+    ]
+    cuts = []
+    for k, date in enumerate(cut_dates):
+        end = positions[k + 1] if k + 1 < len(positions) else len(df)
+        cuts.append({"date": date, "offset": f.tell(), "rows": row_start + positions[k]})
+        df.iloc[positions[k]:end].to_csv(f, header=False, index=write_index)
+    return cuts
+
+def _refresh_merged_raw_data(url: str, year_from: int, year_to: int, output_folder: str, date_col: str,
+                             write_index: bool, years: list[int] | None = None,
+                             max_workers: int = DEFAULT_MAX_WORKERS):
+    """
+        Incremental version of the merged raw file refresh. The manifest keeps the row count, hash and
+        date range of every year, and the byte offset of the first row of every year's first date in the
+        merged csv (the cuts). Only the stale years are downloaded again, and the merged file is truncated
+        at the last cut before the first date of the stale years and rewritten from there: the rows of the
+        stale years and the rows of the other years from that date, sorted by date. So refreshing the current
+        season only rewrites its own rows (and the rows of the years it overlaps with), with the same result
+        as a full rebuild. Falls back to a full rebuild if the merged file was changed outside of this
+        function or the columns changed.
+
+        Params:
+            url: str (url template with a {year} placeholder)
+            year_from: int
+            year_to: int
+            output_folder: str
+            date_col: str (the merged file is sorted by this column)
+            write_index: bool (write the row index as the first column of the merged file)
+            years: list[int] | None (years to check on the server, all years if None)
+            max_workers: int
+
+        Return:
+            list[int]: the years which were rewritten in the merged file
+    """
+    all_years = list(range(year_from, year_to + 1))
+    merged_name = f"all_from_{year_from}_to_{year_to}.csv"
+    merged_file = os.path.join(output_folder, merged_name)
+    manifest_path = os.path.join(output_folder, MANIFEST_FILE_NAME)
+    manifest = api_utils.load_manifest(manifest_path)
+
+    check_years = [year for year in (years or all_years) if year_from <= year <= year_to]
+    # the years without a successful download (no url in the entry) are downloaded again
+    missing_years = [year for year in all_years if not manifest.get(str(year), {}).get("url")]
+    sync_years = sorted(set(check_years) | set(missing_years))
+    synced = _sync_years(url, sync_years, output_folder, manifest, max_workers, read=False)
+    _check_failed_years([year for year in sync_years if year not in synced], manifest, manifest_path)
+
+    partition_dfs = {}
+    for year in all_years:
+        entry = manifest[str(year)]
+        if entry.get("stats_sha256") != entry["sha256"]:
+            partition_dfs[year] = _read_year_partition(output_folder, year, date_col, entry)
+            entry["stats_sha256"] = entry["sha256"]
+
+    merged_info = manifest.get("merged", {}).get(merged_name)
+    is_valid = (
+        merged_info is not None
+        and "cuts" in merged_info
+        and os.path.isfile(merged_file)
+        and os.stat(merged_file).st_size == merged_info["size"]
+        and os.stat(merged_file).st_mtime_ns == merged_info["mtime_ns"]
+    )
+    stale_years = [
+        year for year in all_years
+        if not is_valid
+        or merged_info["partitions"].get(str(year), {}).get("sha256") != manifest[str(year)]["sha256"]
+    ]
+    if not stale_years:
+        print("[INFO] Merged file is up to date")
+        api_utils.save_manifest(manifest, manifest_path)
+        return []
+
+    def _partition(year):
+        if year not in partition_dfs:
+            partition_dfs[year] = _read_year_partition(output_folder, year, date_col, manifest[str(year)])
+        return partition_dfs.pop(year)
+
+    def _rows_from(year, date):
+        df = _partition(year)
+        return df[pd.to_datetime(df[date_col].astype(str)) >= pd.Timestamp(date)] if date is not None else df
+
+    start = None
+    if is_valid:
+        # the new and the previous first date of the stale years, the rows of both are rewritten
+        stale_dates = [manifest[str(year)]["min_date"] for year in stale_years]
+        stale_dates += [merged_info["partitions"].get(str(year), {}).get("min_date") for year in stale_years]
+        start = _merged_cut(merged_info["cuts"], stale_dates)
+        rewrite_years = [
+            year for year in all_years
+            if year in stale_years
+            or (manifest[str(year)]["rows"]
+                and (start["date"] is None or manifest[str(year)]["max_date"] >= start["date"]))
+        ]
+        rewrite_dfs = {year: _rows_from(year, start["date"]) for year in rewrite_years}
+        if any(df.columns.tolist() != merged_info["columns"] for df in rewrite_dfs.values()):
+            start = None
+
+    if start is None:
+        print(f"[INFO] Rebuild merged file {merged_name}")
+        rewrite_years = all_years
+        rewrite_dfs = {year: _partition(year) for year in all_years}
+        columns = pd.concat([df.head(0) for df in rewrite_dfs.values()]).columns.tolist()
+        with open(merged_file, "w", newline="") as f:
+            pd.DataFrame(columns=columns).to_csv(f, index=write_index)
+            start = {"date": None, "offset": f.tell(), "rows": 0}
+        cuts = []
+    else:
+        print(f"[INFO] Refresh merged file {merged_name} from {start['date'] or 'the first row'}")
+        columns = merged_info["columns"]
+        cuts = merged_info["cuts"][:merged_info["cuts"].index(start)]
+        os.truncate(merged_file, start["offset"])
+
+    df_tail = pd.concat(rewrite_dfs.values(), ignore_index=True)
+    df_tail = df_tail.sort_values(by=date_col, kind="stable").reset_index(drop=True)
+    # a cut at the first date of every year, so the refresh of a year can start there
+    cut_dates = sorted({
+        manifest[str(year)]["min_date"] for year in all_years
+        if manifest[str(year)]["rows"] and (start["date"] is None or manifest[str(year)]["min_date"] > start["date"])
+    })
+    with open(merged_file, "a", newline="") as f:
+        cuts += _write_merged_rows(f, df_tail, date_col, columns, [start["date"]] + cut_dates, start["rows"],
+                                   write_index)
+    rows = start["rows"] + len(df_tail)
+
+    stat = os.stat(merged_file)
+    manifest.setdefault("merged", {})[merged_name] = {
+        "columns": columns,
+        "partitions": {
+            str(year): {"sha256": manifest[str(year)]["sha256"], "min_date": manifest[str(year)]["min_date"]}
+            for year in all_years
+        },
+        "cuts": cuts,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    api_utils.save_manifest(manifest, manifest_path)
+    print(f"[INFO] Save merged dataframe. Length of dataframe: {rows}")
+    return rewrite_years
+
+def _download_atp(year_from: int, year_to: int, output_folder: str, url: str = ATP_MATCH_DATA_URL,
+                  max_workers: int = DEFAULT_MAX_WORKERS):
     """
         Download and merge all the csv file into one csv and return it as a pd.Dataframe
         csv files will be saved in the output folder. If not exist, will be created
@@ -40,19 +331,14 @@ def _download_atp(year_from: int, year_to: int, output_folder: str):
             year_from: int 
             year_to: int 
             output_folder: str
+            url: str (url template with a {year} placeholder)
+            max_workers: int (number of parallel downloads)
 
         Retrun: 
             pd.Datafolder
     """
     print(f"[INFO] Download ATP source data from {year_from} to {year_to}")
-    dfs = [
-        _download_source_data_by_year(
-            ATP_MATCH_DATA_URL.format(year=year), 
-            year, 
-            output_folder
-        )
-        for year in range(year_from, year_to + 1)
-    ]
+    dfs = _download_years(url, year_from, year_to, output_folder, max_workers)
 
     print(f"[INFO] Concat {len(dfs)} of dataframes")
     df_all = pd.concat(dfs, ignore_index=True)
@@ -62,7 +348,8 @@ def _download_atp(year_from: int, year_to: int, output_folder: str):
     return df_all
 
 
-def _download_atp_odds(year_from: int, year_to: int, output_folder: str): 
+def _download_atp_odds(year_from: int, year_to: int, output_folder: str, url: str = ATP_MATCH_ODDS_URL,
+                       max_workers: int = DEFAULT_MAX_WORKERS): 
     """
         Download ATP men's odds data
 
@@ -70,19 +357,14 @@ def _download_atp_odds(year_from: int, year_to: int, output_folder: str):
             year_from: int 
             year_to: int 
             output_folder: str
+            url: str (url template with a {year} placeholder)
+            max_workers: int (number of parallel downloads)
 
         Return: 
             pd.DataFrame
     """
 
-    dfs = [
-        _download_source_data_by_year(
-            ATP_MATCH_ODDS_URL.format(year=year),
-            year,
-            output_folder
-        )
-        for year in range(year_from, year_to + 1)
-    ]
+    dfs = _download_years(url, year_from, year_to, output_folder, max_workers)
 
     df_all = pd.concat(dfs, ignore_index=True)
     df_all = df_all.sort_values(by="Date").reset_index(drop=True)
@@ -90,9 +372,56 @@ def _download_atp_odds(year_from: int, year_to: int, output_folder: str):
     return df_all
 
 
-def download_all_atp_odds_raw_data():
-    _download_atp(year_from=2000,year_to=2024, output_folder="data/raw/atp_men_2000_2024")
-    _download_atp_odds(year_from=2001,year_to=2024, output_folder="data/raw/atp_odds_2001_2024")
+@instrumentation.instrument
+def download_all_atp_odds_raw_data(year_to: int = DEFAULT_YEAR_TO):
+    _download_atp(year_from=2000,year_to=year_to, output_folder=ATP_RAW_FOLDER)
+    _download_atp_odds(year_from=2001,year_to=year_to, output_folder=ODDS_RAW_FOLDER)
+
+@instrumentation.instrument
+def download_all_atp_raw_data(year_to: int = DEFAULT_YEAR_TO):
+    _download_atp(year_from=2000,year_to=year_to, output_folder=ATP_RAW_FOLDER)
 
-def download_all_atp_raw_data():
-    _download_atp(year_from=2000,year_to=2024, output_folder="data/raw/atp_men_2000_2024")
\ No newline at end of file
+@instrumentation.instrument
+def refresh_atp_raw_data(years: list[int] | None = None, year_to: int = DEFAULT_YEAR_TO):
+    """
+        Incremental refresh of the merged ATP match raw file (see _refresh_merged_raw_data)
+
+        Params:
+            years: list[int] | None (years to check on the server, e.g. the current season. All years if None)
+            year_to: int (last season of the merged file, e.g. the current one)
+
+        Return:
+            str: path of the merged csv
+    """
+    _refresh_merged_raw_data(ATP_MATCH_DATA_URL, 2000, year_to, ATP_RAW_FOLDER, "tourney_date",
+                             write_index=True, years=years)
+    return os.path.join(ATP_RAW_FOLDER, f"all_from_2000_to_{year_to}.csv")
+
+@instrumentation.instrument
+def refresh_odds_raw_data(years: list[int] | None = None, year_to: int = DEFAULT_YEAR_TO):
+    """
+        Incremental refresh of the merged ATP odds raw file (see _refresh_merged_raw_data)
+
+        Params:
+            years: list[int] | None (years to check on the server, e.g. the current season. All years if None)
+            year_to: int (last season of the merged file, e.g. the current one)
+
+        Return:
+            str: path of the merged csv
+    """
+    _refresh_merged_raw_data(ATP_MATCH_ODDS_URL, 2001, year_to, ODDS_RAW_FOLDER, "Date",
+                             write_index=False, years=years)
+    return os.path.join(ODDS_RAW_FOLDER, f"all_from_2001_to_{year_to}.csv")
+
+@instrumentation.instrument
+def refresh_atp_odds_raw_data(years: list[int] | None = None, year_to: int = DEFAULT_YEAR_TO):
+    """
+        Incremental refresh of the merged ATP and odds raw files. Only the years which changed on the
+        server are downloaded and only the rows from their first date are rewritten in the merged files.
+
+        Params:
+            years: list[int] | None (years to check on the server, e.g. the current season. All years if None)
+            year_to: int (last season of the merged files, e.g. the current one)
+    """
+    refresh_atp_raw_data(years, year_to)
+    refresh_odds_raw_data(years, year_to)
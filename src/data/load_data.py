@@ -1,21 +1,82 @@
-import pandas as pd 
+import pandas as pd
 import os
 from dotenv import load_dotenv
 
+from src.data import storage
+from src.utils import dtype_utils
+
 
 load_dotenv()
-DEFAULT_ATP_INTERIM_DATA_PATH = os.getenv("DEFAULT_ATP_INTERIM_DATA_PATH")
-DEFAULT_ATP_ENGINEERED_DATA_PATH = os.getenv("DEFAULT_ATP_ENGINEERED_DATA_PATH")
+# the year partitioned datasets written by the pipeline (a csv path of the .env points to the dataset next to it)
+DEFAULT_ATP_INTERIM_DATA_PATH = storage.dataset_path(
+    os.getenv("DEFAULT_ATP_INTERIM_DATA_PATH", "data_storage/interim/atp_interim_data")
+)
+DEFAULT_ATP_ENGINEERED_DATA_PATH = storage.dataset_path(
+    os.getenv("DEFAULT_ATP_ENGINEERED_DATA_PATH", "data_storage/features/atp_engineered_features")
+)
+
+def _resolve_path(url: str):
+    """
+        The year partitioned dataset is preferred: a csv path is read from the dataset next to it if it exists,
+        a dataset path from the csv file next to it if only that exists (data saved before the datasets)
+    """
+    dataset = storage.dataset_path(url)
+    if os.path.isdir(dataset):
+        return dataset
+    if os.path.isfile(dataset + ".csv"):
+        return dataset + ".csv"
+    return url
+
+def _dtype_schema(url: str, dtype_schema):
+    """
+        The dtype schema of the loader: the schema file next to the data ("auto", if it exists),
+        a schema file path, a schema dict or None
+    """
+    if isinstance(dtype_schema, str) and dtype_schema == "auto":
+        path = dtype_utils.schema_path(url)
+        return dtype_utils.load_dtype_schema(path) if os.path.isfile(path) else None
+    if isinstance(dtype_schema, str):
+        return dtype_utils.load_dtype_schema(dtype_schema)
+    return dtype_schema
 
-def load_interim_data(url: str = DEFAULT_ATP_INTERIM_DATA_PATH):
-    if os.path.isfile(url):
-        return pd.read_csv(url, parse_dates=["tourney_date"], low_memory=False).sort_values(by="tourney_date").reset_index(drop=True)
-    else: 
+def _load_data(url: str, columns: list[str] | None = None, date_from=None, date_to=None, dtype_schema=None):
+    """
+        Load a csv file or a year partitioned Parquet/Feather dataset (folder) sorted by tourney_date.
+        For the partitioned datasets the column projection and the date range are pushed down to the reader.
+        If a dtype schema is given ("auto": the schema file next to the data, see dtype_utils), its compact dtypes
+        are applied, the categoricals and the floats of a csv file already by the parser. The string columns
+        are categoricals then, not object columns.
+    """
+    schema = _dtype_schema(url, dtype_schema)
+    if os.path.isdir(url):
+        df = storage.read_partitioned(url, columns=columns, date_from=date_from, date_to=date_to)
+        return df if schema is None else dtype_utils.apply_dtype_schema(df, schema)
+
+    usecols = None if columns is None else list(dict.fromkeys(columns + ["tourney_date"]))
+    dtype = None if schema is None else dtype_utils.csv_dtypes(schema, usecols)
+    df = pd.read_csv(url, usecols=usecols, parse_dates=["tourney_date"], dtype=dtype, low_memory=False)
+    if date_from is not None:
+        df = df[df["tourney_date"] >= pd.Timestamp(date_from)]
+    if date_to is not None:
+        df = df[df["tourney_date"] <= pd.Timestamp(date_to)]
+    df = df.sort_values(by="tourney_date").reset_index(drop=True)
+    if schema is not None:
+        df = dtype_utils.apply_dtype_schema(df, schema)
+    return df if columns is None else df[columns]
+
+def load_interim_data(url: str = DEFAULT_ATP_INTERIM_DATA_PATH, columns: list[str] | None = None,
+                      date_from=None, date_to=None, dtype_schema=None):
+    url = _resolve_path(url)
+    if os.path.isfile(url) or os.path.isdir(url):
+        return _load_data(url, columns, date_from, date_to, dtype_schema)
+    else:
         print("[ERROR] Interim file do not exist")
 
 
-def load_features_data(url: str = DEFAULT_ATP_ENGINEERED_DATA_PATH):
-    if os.path.isfile(url):
-        return pd.read_csv(url, parse_dates=["tourney_date"], low_memory=False).sort_values(by="tourney_date").reset_index(drop=True)
-    else: 
-        print("[ERROR] Interim file do not exist")
\ No newline at end of file
+def load_features_data(url: str = DEFAULT_ATP_ENGINEERED_DATA_PATH, columns: list[str] | None = None,
+                       date_from=None, date_to=None, dtype_schema=None):
+    url = _resolve_path(url)
+    if os.path.isfile(url) or os.path.isdir(url):
+        return _load_data(url, columns, date_from, date_to, dtype_schema)
+    else:
+        print("[ERROR] Interim file do not exist")
@@ -0,0 +1,167 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from src.utils import dtype_utils
+
+
+PARTITION_COL = "year"
+FILE_FORMATS = {"parquet": "parquet", "feather": "ipc"}
+
+
+def _dates(values: pd.Series):
+    """
+        The date column as datetime64, the raw YYYYMMDD integers are converted
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        values = pd.to_datetime(values.astype("Int64").astype(str), format="%Y%m%d", errors="coerce")
+    return pd.to_datetime(values)
+
+
+def dataset_path(path: str):
+    """
+        Folder of the year partitioned dataset of a csv path (the same path without .csv)
+    """
+    return path[:-len(".csv")] if path.endswith(".csv") else path
+
+
+def _unique_columns(columns):
+    """
+        The column names made unique the way pd.read_csv does (x, x.1, x.2, ...), as Parquet/Feather
+        need unique names and the engineered data may have duplicated ones
+    """
+    names = []
+    for col in columns:
+        name, k = col, 0
+        while name in names:
+            k += 1
+            name = f"{col}.{k}"
+        names.append(name)
+    return names
+
+
+def write_partitioned(df: pd.DataFrame, path: str, date_col: str = "tourney_date", file_format: str = "parquet",
+                      dtype_schema: dict | None = None):
+    """
+        Write the dataframe into a year partitioned Parquet or Feather dataset (path/year=YYYY/part-0.*).
+        The date column is converted to datetime and the compact dtypes of the dtype schema (see dtype_utils)
+        are applied before writing, the schema is saved next to the dataset (<path>.schema.json), so the loaders
+        can reuse it with dtype_schema="auto". An existing dataset in the path is replaced. Every row needs
+        a date (ValueError otherwise). Duplicated column names get a .1, .2, ... suffix, like when the data
+        is written into a csv and read back.
+
+        Params:
+            df: pd.DataFrame
+            path: str (folder of the dataset)
+            date_col: str (the partition year is taken from this column)
+            file_format: str ("parquet" or "feather")
+            dtype_schema: dict | None (made by dtype_utils.infer_dtype_schema, inferred from the dataframe if None)
+    """
+    if df.columns.duplicated().any():
+        df = df.set_axis(_unique_columns(df.columns), axis=1)
+    df = df.assign(**{date_col: _dates(df[date_col])})
+    dtype_schema = dtype_utils.infer_dtype_schema(df) if dtype_schema is None else dtype_schema
+    df = dtype_utils.apply_dtype_schema(df, dtype_schema)
+    # a missing date would be written into a year=0 partition, which the date filters of the reader skip
+    missing_dates = int(df[date_col].isna().sum())
+    if missing_dates:
+        raise ValueError(f"{missing_dates} rows have no {date_col}, they cannot be written into a year partition")
+    df = df.sort_values(by=date_col, kind="stable").reset_index(drop=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.append_column(PARTITION_COL, pa.array(df[date_col].dt.year.to_numpy(dtype=np.int16)))
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    ds.write_dataset(
+        table,
+        path,
+        format=FILE_FORMATS[file_format],
+        partitioning=ds.partitioning(pa.schema([(PARTITION_COL, pa.int16())]), flavor="hive"),
+        basename_template="part-{i}." + file_format,
+    )
+    dtype_utils.save_dtype_schema(dtype_schema, dtype_utils.schema_path(path))
+    print(f"[INFO] Data saved into {path}. Number of rows: {len(df)}")
+
+
+def _detect_file_format(path: str):
+    for _, _, files in os.walk(path):
+        for file in files:
+            for file_format in FILE_FORMATS:
+                if file.endswith("." + file_format):
+                    return file_format
+    raise FileNotFoundError(f"No parquet or feather file in {path}")
+
+
+def read_partitioned(path: str, columns: list[str] | None = None, date_from=None, date_to=None,
+                     date_col: str = "tourney_date"):
+    """
+        Read a year partitioned dataset written by write_partitioned. Only the requested columns are read
+        and the date range is pushed down to the reader, so the partitions out of the range are skipped.
+
+        Params:
+            path: str (folder of the dataset)
+            columns: list[str] | None (all columns if None)
+            date_from: str | pd.Timestamp | None (inclusive)
+            date_to: str | pd.Timestamp | None (inclusive)
+            date_col: str
+
+        Return:
+            pd.DataFrame
+    """
+    dataset = ds.dataset(path, format=FILE_FORMATS[_detect_file_format(path)], partitioning="hive")
+
+    predicate = None
+    for bound, op in ((date_from, "ge"), (date_to, "le")):
+        if bound is None:
+            continue
+        bound = pd.Timestamp(bound)
+        year_field = ds.field(PARTITION_COL)
+        date_field = ds.field(date_col)
+        if op == "ge":
+            condition = (year_field >= bound.year) & (date_field >= pa.scalar(bound, type=pa.timestamp("ns")))
+        else:
+            condition = (year_field <= bound.year) & (date_field <= pa.scalar(bound, type=pa.timestamp("ns")))
+        predicate = condition if predicate is None else predicate & condition
+
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != PARTITION_COL]
+    # the date is read for the ordering even if it is not requested, like the csv path of load_data
+    read_columns = columns
+    if date_col in dataset.schema.names and date_col not in columns:
+        read_columns = columns + [date_col]
+    df = dataset.to_table(columns=read_columns, filter=predicate).to_pandas()
+    if date_col in df.columns:
+        df = df.sort_values(by=date_col, kind="stable").reset_index(drop=True)
+    return df if read_columns is columns else df[columns]
+
+
+def iter_chunks(path: str, columns: list[str] | None = None, chunk_size: int = 100_000, dtype: dict | None = None):
+    """
+        Read a csv file, a Parquet/Feather file or a partitioned dataset (folder) chunk by chunk,
+        so only one chunk is in memory at a time
+
+        Params:
+            path: str
+            columns: list[str] | None (all columns if None)
+            chunk_size: int (rows per chunk)
+            dtype: dict | None (dtypes of the csv columns)
+
+        Yield:
+            pd.DataFrame
+    """
+    if os.path.isdir(path) or path.endswith(tuple("." + file_format for file_format in FILE_FORMATS)):
+        if os.path.isdir(path):
+            dataset = ds.dataset(path, format=FILE_FORMATS[_detect_file_format(path)], partitioning="hive")
+        else:
+            dataset = ds.dataset(path, format=FILE_FORMATS[os.path.splitext(path)[1][1:]])
+        if columns is None:
+            columns = [name for name in dataset.schema.names if name != PARTITION_COL]
+        for batch in dataset.to_batches(columns=columns, batch_size=chunk_size):
+            if batch.num_rows:
+                yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size, dtype=dtype, low_memory=False)
@@ -0,0 +1,413 @@
+# ATP formájú szintetikus meccs- és oddsadatok generálása (offline tesztekhez és benchmarkokhoz)
+
+import numpy as np
+import pandas as pd
+
+
+# Active players of a season and the new players joining the tour every season
+ACTIVE_PLAYERS = 600
+NEW_PLAYERS_PER_SEASON = 90
+MAX_RANK = 1500
+
+# (level, draw size, best of, number of tournaments per season)
+CALENDAR = [
+    ("G", 128, 5, 4),
+    ("M", 64, 3, 9),
+    ("A", 32, 3, 51),
+    ("F", 8, 3, 1),
+]
+SERIES = {"G": "Grand Slam", "M": "Masters 1000", "A": "ATP250", "F": "Masters Cup"}
+SLAM_WEEKS = {0: 3, 1: 21, 2: 26, 3: 35}
+SLAM_SURFACES = {0: "Hard", 1: "Clay", 2: "Grass", 3: "Hard"}
+SURFACES = ["Hard", "Clay", "Grass", "Carpet"]
+SURFACE_WEIGHTS = [0.6, 0.3, 0.07, 0.03]
+
+ROUND_NAMES = {128: "R128", 64: "R64", 32: "R32", 16: "R16", 8: "QF", 4: "SF", 2: "F"}
+ODDS_ROUND_NAMES = {"R128": "1st Round", "R64": "2nd Round", "R32": "3rd Round", "R16": "4th Round",
+                    "QF": "Quarterfinals", "SF": "Semifinals", "F": "The Final", "RR": "Round Robin"}
+# Day of the round after the tournament start (tourney_date), by the draw size
+ROUND_DAYS = {
+    128: {"R128": 0, "R64": 2, "R32": 4, "R16": 6, "QF": 8, "SF": 10, "F": 13},
+    64: {"R64": 0, "R32": 2, "R16": 4, "QF": 5, "SF": 6, "F": 7},
+    32: {"R32": 0, "R16": 2, "QF": 4, "SF": 5, "F": 6},
+    8: {"RR": 0, "SF": 5, "F": 6},
+}
+
+FIRST_NAMES = ["Alex", "Andrea", "Andy", "Carlos", "Casper", "David", "Denis", "Dominic", "Felix", "Fernando",
+               "Gael", "Grigor", "Hubert", "Ivan", "Jack", "Jan", "Jannik", "John", "Karen", "Kei", "Lorenzo",
+               "Marin", "Mario", "Mark", "Matteo", "Maxime", "Milos", "Nick", "Nicolas", "Novak", "Pablo", "Paul",
+               "Rafael", "Richard", "Roberto", "Roger", "Sam", "Sebastian", "Stan", "Stefanos", "Taylor", "Thomas",
+               "Tomas", "Ugo", "Viktor", "Yoshihito"]
+DOUBLE_FIRST_NAMES = ["Juan Martin", "Jo Wilfried", "Pierre Hugues", "Juan Carlos", "Jan Lennard"]
+SURNAME_SYLLABLES = ["ba", "ber", "ca", "del", "di", "do", "fer", "ga", "gor", "ka", "ko", "li", "lo", "ma", "mar",
+                     "mi", "mo", "na", "nov", "pa", "po", "ra", "ri", "ro", "sa", "se", "sto", "ta", "to", "va",
+                     "ve", "vic", "za", "zo", "rer", "nez", "ski", "ler", "son", "man"]
+PARTICLES = ["De", "Del", "Van", "Von", "Da"]
+COUNTRIES = ["ESP", "FRA", "USA", "ARG", "ITA", "GER", "AUS", "RUS", "SRB", "CRO", "GBR", "CZE", "SUI", "JPN",
+             "CAN", "BEL", "NED", "CHI", "AUT", "SWE"]
+COUNTRY_WEIGHTS = [12, 11, 11, 8, 8, 7, 6, 5, 4, 4, 4, 4, 3, 3, 3, 2, 2, 2, 2, 2]
+STAT_COLS = ["ace", "df", "svpt", "1stIn", "1stWon", "2ndWon", "SvGms", "bpSaved", "bpFaced"]
+
+
+def _surnames(rng: np.random.Generator, n: int):
+    """
+        n distinct surnames of 2-3 syllables, a few of them with a particle (De Minaur, Van De Zandschulp)
+    """
+    names = set()
+    while len(names) < n:
+        syllables = rng.choice(SURNAME_SYLLABLES, rng.integers(2, 4))
+        names.add("".join(syllables).title())
+    names = np.array(sorted(names))
+    rng.shuffle(names)
+    with_particle = rng.random(n) < 0.04
+    names[with_particle] = [f"{particle} {name}" for particle, name in
+                            zip(rng.choice(PARTICLES, with_particle.sum()), names[with_particle])]
+    return names
+
+
+def generate_players(n_seasons: int = 25, start_year: int = 2000, seed: int = 42):
+    """
+        Create the players of n_seasons seasons: ATP style ids, full names, hand, height, country, birth date,
+        the first and last season of the career and a latent skill per season
+
+        Return:
+            tuple[pd.DataFrame, np.ndarray]: the players and their (players x seasons) skill, NaN outside the career
+    """
+    rng = np.random.default_rng(seed)
+    n_players = ACTIVE_PLAYERS + NEW_PLAYERS_PER_SEASON * n_seasons
+    # the initial players are in the middle of their careers, the new ones join every season
+    first_season = np.r_[-rng.integers(0, 10, ACTIVE_PLAYERS), np.repeat(np.arange(n_seasons), NEW_PLAYERS_PER_SEASON)]
+    career = np.clip(rng.geometric(1 / 7, n_players), 1, 20)
+    last_season = np.maximum(first_season + career, np.r_[np.full(ACTIVE_PLAYERS, 1), np.zeros(n_players - ACTIVE_PLAYERS, int)])
+    birth_year = start_year + first_season - rng.integers(18, 23, n_players)
+
+    first_names = rng.choice(FIRST_NAMES, n_players)
+    double = rng.random(n_players) < 0.03
+    first_names[double] = rng.choice(DOUBLE_FIRST_NAMES, double.sum())
+    surnames = _surnames(rng, n_players)
+    players = pd.DataFrame({
+        "id": 100000 + np.arange(n_players),
+        "first_name": first_names,
+        "last_name": surnames,
+        "name": np.char.add(np.char.add(first_names.astype(str), " "), surnames.astype(str)),
+        "hand": rng.choice(["R", "L", "U"], n_players, p=[0.84, 0.15, 0.01]),
+        "ht": np.where(rng.random(n_players) < 0.1, np.nan, rng.normal(186, 7, n_players).round()),
+        "ioc": rng.choice(COUNTRIES, n_players, p=np.array(COUNTRY_WEIGHTS) / sum(COUNTRY_WEIGHTS)),
+        "birth_date": pd.to_datetime(birth_year * 10000 + rng.integers(1, 13, n_players) * 100
+                                     + rng.integers(1, 29, n_players), format="%Y%m%d"),
+        "first_season": start_year + first_season,
+        "last_season": start_year + last_season - 1,
+    })
+
+    # skill: a random walk over the career, rising in the first seasons
+    seasons = np.arange(n_seasons)
+    steps = rng.normal(0, 0.25, (n_players, n_seasons))
+    skill = rng.normal(0, 1, n_players)[:, None] + np.cumsum(steps, axis=1)
+    skill += np.minimum(seasons[None, :] - first_season[:, None], 4) * 0.15
+    active = (seasons[None, :] >= first_season[:, None]) & (seasons[None, :] < last_season[:, None])
+    skill[~active] = np.nan
+    return players, skill
+
+
+def _calendar(rng: np.random.Generator, year: int):
+    """
+        The tournaments of a season: (code, level, draw size, best of, surface, start date)
+    """
+    tournaments, code = [], 0
+    for level, draw_size, best_of, count in CALENDAR:
+        for i in range(count):
+            code += 1
+            if level == "G":
+                week, surface = SLAM_WEEKS[i], SLAM_SURFACES[i]
+            elif level == "F":
+                week, surface = 46, "Hard"
+            else:
+                week = int(rng.integers(1, 45))
+                surface = SURFACES[int(np.flatnonzero(rng.multinomial(1, SURFACE_WEIGHTS))[0])]
+            first_monday = pd.Timestamp(year, 1, 1) + pd.offsets.Week(weekday=0)
+            tournaments.append((code, level, draw_size, best_of, surface, first_monday + pd.Timedelta(weeks=week - 1)))
+    return sorted(tournaments, key=lambda t: (t[5], t[0]))
+
+
+def _play(rng: np.random.Generator, skill: np.ndarray, player_1: np.ndarray, player_2: np.ndarray):
+    """
+        Winners and losers of the matches of two player arrays (logistic in the skill difference)
+    """
+    p_win = 1 / (1 + np.exp(-1.2 * (skill[player_1] - skill[player_2])))
+    first_wins = rng.random(len(player_1)) < p_win
+    return np.where(first_wins, player_1, player_2), np.where(first_wins, player_2, player_1)
+
+
+def _draw(rng: np.random.Generator, skill: np.ndarray, entrants: np.ndarray, draw_size: int):
+    """
+        Matches of a tournament: a knock-out draw, or two round robin groups and a knock-out of the
+        group winners for the 8 player finals. Return (round, winner, loser) tuples in order.
+    """
+    matches = []
+    if draw_size == 8:
+        semifinalists = []
+        for group in (entrants[:4], entrants[4:]):
+            wins = dict.fromkeys(group.tolist(), 0)
+            pairs = np.array([(group[i], group[j]) for i in range(4) for j in range(i + 1, 4)])
+            winners, losers = _play(rng, skill, pairs[:, 0], pairs[:, 1])
+            for winner, loser in zip(winners, losers):
+                wins[winner] += 1
+                matches.append(("RR", winner, loser))
+            semifinalists += sorted(wins, key=lambda player: -wins[player])[:2]
+        entrants = np.array([semifinalists[0], semifinalists[3], semifinalists[2], semifinalists[1]])
+
+    players = entrants
+    while len(players) > 1:
+        round_name = ROUND_NAMES[len(players)]
+        winners, losers = _play(rng, skill, players[0::2], players[1::2])
+        matches += [(round_name, winner, loser) for winner, loser in zip(winners, losers)]
+        players = winners
+    return matches
+
+
+def _scores(rng: np.random.Generator, best_of: np.ndarray):
+    """
+        Score strings, number of games of the winner and of the loser. The winner wins the last set,
+        the sets of the loser are placed randomly before it.
+    """
+    n = len(best_of)
+    sets_to_win = (best_of + 1) // 2
+    lost_sets = rng.integers(0, sets_to_win)
+    n_sets = sets_to_win + lost_sets
+    positions = np.arange(5)[None, :]
+    keys = rng.random((n, 5))
+    keys[positions >= (n_sets - 1)[:, None]] = np.inf
+    loser_won = np.argsort(np.argsort(keys, axis=1), axis=1) < lost_sets[:, None]
+    played = positions < n_sets[:, None]
+
+    set_scores = np.array([(6, 0), (6, 1), (6, 2), (6, 3), (6, 4), (7, 5), (7, 6)])
+    games = set_scores[rng.choice(len(set_scores), (n, 5), p=np.array([2, 5, 10, 14, 16, 9, 12]) / 68)]
+    winner_set_games = np.where(played, np.where(loser_won, games[..., 1], games[..., 0]), 0)
+    loser_set_games = np.where(played, np.where(loser_won, games[..., 0], games[..., 1]), 0)
+    tiebreaks = rng.integers(0, 10, (n, 5))
+
+    scores = [
+        " ".join(
+            f"{w}-{l}" + (f"({t})" if w + l == 13 else "")
+            for w, l, t in zip(w_row[:k], l_row[:k], t_row[:k])
+        )
+        for w_row, l_row, t_row, k in zip(winner_set_games.tolist(), loser_set_games.tolist(), tiebreaks.tolist(),
+                                          n_sets.tolist())
+    ]
+    return scores, winner_set_games.sum(axis=1), loser_set_games.sum(axis=1)
+
+
+def _serve_stats(rng: np.random.Generator, games: np.ndarray, won: bool):
+    """
+        Serve statistics (STAT_COLS) of one side of the matches from its number of service games
+    """
+    n = len(games)
+    svpt = np.maximum(np.round(games * rng.normal(6.3, 0.5, n)), games)
+    first_in = np.round(svpt * rng.beta(31, 19, n))
+    first_won = np.round(first_in * rng.beta(75 if won else 68, 25 if won else 32, n))
+    double_faults = np.minimum(rng.poisson(svpt * 0.035), svpt - first_in)
+    second_won = np.round((svpt - first_in - double_faults) * rng.beta(55 if won else 48, 45 if won else 52, n))
+    bp_faced = rng.poisson(games * (0.45 if won else 0.75))
+    return {
+        "ace": np.minimum(rng.poisson(first_in * 0.12), first_won),
+        "df": double_faults,
+        "svpt": svpt,
+        "1stIn": first_in,
+        "1stWon": first_won,
+        "2ndWon": second_won,
+        "SvGms": games,
+        "bpSaved": rng.binomial(bp_faced, 0.65 if won else 0.55),
+        "bpFaced": bp_faced,
+    }
+
+
+def generate_matches(n_seasons: int = 25, start_year: int = 2000, seed: int = 42, missing_stats_ratio: float = 0.03):
+    """
+        Create an ATP shaped match table (the columns of the raw yearly files: tournament, players, score,
+        serve statistics and rankings) of n_seasons simulated seasons. Every season has about 2700 matches
+        of Grand Slams, Masters, ATP 250 tournaments (level A) and the finals, played by about 600 active players
+        whose skill changes over their careers. The rankings follow the skill, the ranking points a power law.
+
+        Params:
+            n_seasons: int
+            start_year: int
+            seed: int
+            missing_stats_ratio: float (share of the matches without serve statistics)
+
+        Return:
+            pd.DataFrame: one row per match, sorted by tourney_date and match_num
+    """
+    rng = np.random.default_rng(seed)
+    players, skill = generate_players(n_seasons, start_year, seed)
+    rows = []
+    for season in range(n_seasons):
+        year = start_year + season
+        active = np.flatnonzero(~np.isnan(skill[:, season]))
+        season_skill = np.nan_to_num(skill[:, season], nan=-10.0)
+        ranks = np.full(len(players), np.nan)
+        ranks[active[np.argsort(-season_skill[active], kind="stable")]] = np.arange(1, len(active) + 1)
+        entry_weights = 1 / ranks[active] ** 0.4
+
+        for code, level, draw_size, best_of, surface, start in _calendar(rng, year):
+            if level in ("G", "M", "F"):
+                # the best players enter the big tournaments, the rest of the draw is random
+                direct = active[np.argsort(ranks[active])][:draw_size // 2 if level != "F" else draw_size]
+                others = np.setdiff1d(active, direct)
+                others = rng.choice(others, draw_size - len(direct), replace=False,
+                                    p=entry_weights[np.isin(active, others)] / entry_weights[np.isin(active, others)].sum())
+                entrants = np.r_[direct, others]
+            else:
+                entrants = rng.choice(active, draw_size, replace=False, p=entry_weights / entry_weights.sum())
+            rng.shuffle(entrants)
+            for match_num, (round_name, winner, loser) in enumerate(_draw(rng, season_skill, entrants, draw_size), 1):
+                rows.append((f"{year}-{code:04d}", f"Tournament {code}", surface, draw_size, level,
+                             int(start.strftime("%Y%m%d")), match_num, winner, loser, best_of, round_name, start))
+
+    matches = pd.DataFrame(rows, columns=["tourney_id", "tourney_name", "surface", "draw_size", "tourney_level",
+                                          "tourney_date", "match_num", "winner", "loser", "best_of", "round", "start"])
+    n = len(matches)
+    winner, loser = matches.pop("winner").to_numpy(), matches.pop("loser").to_numpy()
+    start = matches.pop("start")
+    season = pd.DatetimeIndex(start).year.to_numpy() - start_year
+
+    scores, winner_games, loser_games = _scores(rng, matches["best_of"].to_numpy())
+    total_games = winner_games + loser_games
+    columns = {}
+    for side, player in (("winner", winner), ("loser", loser)):
+        columns[f"{side}_id"] = players["id"].to_numpy()[player]
+        columns[f"{side}_seed"] = np.where(rng.random(n) < 0.25, rng.integers(1, 33, n), np.nan)
+        columns[f"{side}_entry"] = np.where(rng.random(n) < 0.1, rng.choice(["Q", "WC", "LL"], n), None)
+        columns[f"{side}_name"] = players["name"].to_numpy()[player]
+        columns[f"{side}_hand"] = players["hand"].to_numpy()[player]
+        columns[f"{side}_ht"] = players["ht"].to_numpy()[player]
+        columns[f"{side}_ioc"] = players["ioc"].to_numpy()[player]
+        columns[f"{side}_age"] = ((start - pd.Series(players["birth_date"].to_numpy()[player])).dt.days / 365.25).round(1).to_numpy()
+    columns["score"] = scores
+    columns["minutes"] = np.round(total_games * rng.normal(6.0, 0.8, n))
+
+    has_stats = rng.random(n) >= missing_stats_ratio
+    for prefix, won in (("w_", True), ("l_", False)):
+        # the service games are about half of the games
+        service_games = (np.ceil(total_games / 2) if won else np.floor(total_games / 2)).astype(int)
+        for col, values in _serve_stats(rng, service_games, won).items():
+            columns[prefix + col] = np.where(has_stats, values, np.nan)
+    columns["minutes"] = np.where(has_stats, columns["minutes"], np.nan)
+
+    # the season ranking with some weekly noise, a few missing values and power law ranking points
+    season_ranks = np.argsort(np.argsort(-np.nan_to_num(skill, nan=-10.0), axis=0, kind="stable"), axis=0) + 1
+    for side, player in (("winner", winner), ("loser", loser)):
+        rank = season_ranks[player, season] * np.exp(rng.normal(0, 0.1, n))
+        rank = np.clip(np.round(rank), 1, MAX_RANK)
+        rank[rng.random(n) < 0.01] = np.nan
+        columns[f"{side}_rank"] = rank
+        columns[f"{side}_rank_points"] = np.round(12000 * rank ** -0.75)
+
+    matches = pd.concat([matches, pd.DataFrame(columns)], axis=1)
+    return matches.sort_values(["tourney_date", "match_num"], kind="stable").reset_index(drop=True)
+
+
+def _abbreviated_names(names: pd.Series):
+    """
+        Odds style names: surname and initials (Juan Martin Del Potro -> Del Potro J.M.)
+    """
+    def _abbreviate(name):
+        parts = name.split()
+        start = next((i for i in range(1, len(parts)) if parts[i] in PARTICLES), len(parts) - 1)
+        initials = "".join(f"{part[0]}." for part in parts[:start])
+        return f"{' '.join(parts[start:])} {initials}"
+
+    codes, uniques = pd.factorize(names)
+    return np.array([_abbreviate(name) for name in uniques], dtype=object)[codes]
+
+
+def generate_odds(matches: pd.DataFrame, seed: int = 42, coverage: float = 0.95, swapped_ratio: float = 0.1,
+                  exact_dates: bool = False):
+    """
+        Create an odds table (tennis-data.co.uk layout) of an ATP shaped match table: abbreviated names
+        (Surname I.), the actual date of the match (tourney_date + the day of the round) instead of the
+        tournament start, set scores, rankings and bookmaker odds from the ranking points. Part of the
+        matches is missing and in a part of the rows the winner and the loser are swapped.
+
+        Params:
+            matches: pd.DataFrame (e.g. generate_matches output)
+            seed: int
+            coverage: float (share of the matches in the odds table)
+            swapped_ratio: float (share of the rows with swapped winner / loser)
+            exact_dates: bool (use the tourney_date as the match date)
+
+        Return:
+            pd.DataFrame: sorted by Date
+    """
+    rng = np.random.default_rng(seed)
+    matches = matches[rng.random(len(matches)) < coverage]
+    n = len(matches)
+
+    start = pd.to_datetime(matches["tourney_date"].astype(str), format="%Y%m%d")
+    day = np.zeros(n, dtype=int)
+    if not exact_dates:
+        for draw_size, round_days in ROUND_DAYS.items():
+            in_draw = (matches["draw_size"] == draw_size).to_numpy()
+            day[in_draw] = matches["round"][in_draw].map(round_days).fillna(0).to_numpy(dtype=int)
+        # the early rounds are played on two days
+        day += (matches["round"].isin(["R128", "R64", "R32", "RR"]).to_numpy() & (rng.random(n) < 0.5)).astype(int)
+    dates = start + pd.to_timedelta(day, unit="D")
+
+    # win probability of the winner from the ranking points, the odds have a 5% margin
+    points_w = matches["winner_rank_points"].fillna(1).to_numpy()
+    points_l = matches["loser_rank_points"].fillna(1).to_numpy()
+    p_win = np.clip(points_w ** 0.8 / (points_w ** 0.8 + points_l ** 0.8) + rng.normal(0, 0.03, n), 0.02, 0.98)
+
+    sets = matches["score"].str.findall(r"(\d+)-(\d+)")
+    set_cols = {}
+    for i in range(5):
+        set_cols[f"W{i + 1}"] = [float(s[i][0]) if len(s) > i else np.nan for s in sets]
+        set_cols[f"L{i + 1}"] = [float(s[i][1]) if len(s) > i else np.nan for s in sets]
+    set_wins = np.array([[w > l for w, l in zip(set_cols[f"W{i + 1}"], set_cols[f"L{i + 1}"])] for i in range(5)])
+
+    odds = pd.DataFrame({
+        "ATP": pd.factorize(matches["tourney_id"])[0] + 1,
+        "Location": matches["tourney_name"].str.replace("Tournament", "City").to_numpy(),
+        "Tournament": matches["tourney_name"].to_numpy(),
+        "Date": dates.dt.strftime("%Y-%m-%d").to_numpy(),
+        "Series": matches["tourney_level"].map(SERIES).to_numpy(),
+        "Court": np.where(rng.random(n) < 0.8, "Outdoor", "Indoor"),
+        "Surface": matches["surface"].to_numpy(),
+        "Round": matches["round"].map(ODDS_ROUND_NAMES).to_numpy(),
+        "Best of": matches["best_of"].to_numpy(),
+        "Winner": _abbreviated_names(matches["winner_name"]),
+        "Loser": _abbreviated_names(matches["loser_name"]),
+        "WRank": matches["winner_rank"].to_numpy(),
+        "LRank": matches["loser_rank"].to_numpy(),
+        "WPts": matches["winner_rank_points"].to_numpy(),
+        "LPts": matches["loser_rank_points"].to_numpy(),
+        **set_cols,
+        "Wsets": set_wins.sum(axis=0),
+        "Lsets": (~set_wins & ~np.isnan(np.array([set_cols[f"L{i + 1}"] for i in range(5)]))).sum(axis=0),
+        "Comment": "Completed",
+    })
+    for bookmaker, noise in (("B365", 0.02), ("PS", 0.01), ("Max", 0.0), ("Avg", 0.015)):
+        margin = 1.0 if bookmaker == "Max" else 1.05
+        p = np.clip(p_win + rng.normal(0, noise, n), 0.01, 0.99)
+        odds[f"{bookmaker}W"] = np.round(1 / (p * margin), 2)
+        odds[f"{bookmaker}L"] = np.round(1 / ((1 - p) * margin), 2)
+
+    # swapped rows: every winner / loser column pair is exchanged
+    swapped = rng.random(n) < swapped_ratio
+    pairs = [("Winner", "Loser"), ("WRank", "LRank"), ("WPts", "LPts"), ("Wsets", "Lsets")]
+    pairs += [(f"W{i + 1}", f"L{i + 1}") for i in range(5)]
+    pairs += [(f"{bookmaker}W", f"{bookmaker}L") for bookmaker in ("B365", "PS", "Max", "Avg")]
+    for col_w, col_l in pairs:
+        values_w, values_l = odds[col_w].to_numpy(copy=True), odds[col_l].to_numpy(copy=True)
+        odds[col_w], odds[col_l] = np.where(swapped, values_l, values_w), np.where(swapped, values_w, values_l)
+    return odds.sort_values("Date", kind="stable").reset_index(drop=True)
+
+
+def generate_atp_data(n_seasons: int = 25, start_year: int = 2000, seed: int = 42, **odds_options):
+    """
+        Match and odds tables of n_seasons simulated seasons (see generate_matches and generate_odds)
+
+        Return:
+            tuple[pd.DataFrame, pd.DataFrame]: matches, odds
+    """
+    matches = generate_matches(n_seasons, start_year, seed)
+    return matches, generate_odds(matches, seed, **odds_options)
@@ -0,0 +1,316 @@
+# Feature generáló függvények
+
+import numpy as np
+import pandas as pd
+
+from src.features import symmetric_pairs
+
+
+PLAYER_PREFIXES = {"winner_": "w_", "loser_": "l_"}
+KEY_STAT_COLS = ["ace", "df", "svpt", "1stWon", "2ndWon", "bpSaved", "bpFaced"]
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray):
+    """
+        numerator / denominator, where a division by zero gives NaN instead of inf
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.asarray(numerator / denominator, dtype=np.float64)
+    ratio[np.isinf(ratio)] = np.nan
+    return ratio
+
+
+def statistical_feature_arrays(stats: dict):
+    """
+        The rates of create_statistical_features from the key stat arrays (e.g. stats["w_ace"]),
+        in the order w_dfp, l_dfp, w_a, l_a, w_d, l_d, w_bpsvd, l_bpsvd. Row-wise, so any subset of
+        the rows gives the same values.
+
+        Params:
+            stats: dict (w_ / l_ key stat column -> np.ndarray)
+
+        Return:
+            dict: feature name -> np.ndarray
+    """
+    features = {}
+    for p in ("w_", "l_"):
+        features[f"{p}dfp_double_fault_rate"] = _ratio(stats[f"{p}df"], stats[f"{p}svpt"])
+    for p in ("w_", "l_"):
+        features[f"{p}a_ace_rate"] = _ratio(stats[f"{p}ace"], stats[f"{p}svpt"])
+    for p, opp in (("w_", "l_"), ("l_", "w_")):
+        return_won = _ratio(stats[f"{opp}svpt"] - stats[f"{opp}1stWon"] - stats[f"{opp}2ndWon"], stats[f"{opp}svpt"])
+        serve_lost = _ratio(stats[f"{p}svpt"] - stats[f"{p}1stWon"] - stats[f"{p}2ndWon"], stats[f"{p}svpt"])
+        features[f"{p}d_dominance_ratio"] = _ratio(return_won, serve_lost)
+    for p in ("w_", "l_"):
+        features[f"{p}bpsvd_break_point_opp_saved"] = _ratio(stats[f"{p}bpSaved"], stats[f"{p}bpFaced"])
+    return features
+
+
+def create_statistical_features(df: pd.DataFrame):
+    """
+        Create the match statistic rates of the winner (w_) and the loser (l_):
+          - dfp_double_fault_rate: double faults / serve points
+          - a_ace_rate: aces / serve points
+          - d_dominance_ratio: return points won % / serve points lost %
+          - bpsvd_break_point_opp_saved: break points saved / break points faced
+
+        Params:
+            df: pd.DataFrame (match data, one row per match)
+
+        Return:
+            pd.DataFrame: a new dataframe with the feature columns
+    """
+    print(f"[INFO] Create statistical features on the def. Def length: {len(df)}. Number of cols: {len(df.columns)}")
+    key_cols = [prefix + col for prefix in ("w_", "l_") for col in KEY_STAT_COLS]
+    df = df.dropna(subset=key_cols)
+    print(f"[INFO] Remove Nan colums from the key features. Def length: {len(df)}")
+
+    print("[INFO] Calculate double fault rate, ace rate, dominance ratio and break point opportunities")
+    features = statistical_feature_arrays({col: df[col].to_numpy(dtype=np.float64) for col in key_cols})
+    df = df.drop(columns=[col for col in features if col in df.columns])
+    df = pd.concat([df, pd.DataFrame(features, index=df.index)], axis=1)
+
+    print(f"[INFO] New statustical features created successfully. Number of cols: {len(df.columns)}")
+    return df
+
+
+def _player_col_name(col: str, prefix: str):
+    name = col[len(prefix):]
+    if name == "name":
+        return "player_name"
+    if name == "rank":
+        return "ranking"
+    return name.lower() if prefix in PLAYER_PREFIXES.values() else name
+
+
+def split_players_per_game(df: pd.DataFrame):
+    """
+        Split every match into two rows, one for the winner and one for the loser player.
+        The winner_ / loser_ / w_ / l_ columns become player columns (winner_name -> player_name,
+        winner_rank -> ranking, w_ace -> ace), the match columns are kept for both rows.
+
+        Params:
+            df: pd.DataFrame (match data, one row per match)
+
+        Return:
+            pd.DataFrame: one row per player and match, with the is_winner column
+    """
+    print("[INFO] Remove all the Nan values")
+    df = df.dropna(subset=["winner_name", "loser_name"])
+    df = df.drop(columns=[col for col in df.columns if col.startswith("Unnamed")])
+
+    player_prefixes = tuple(PLAYER_PREFIXES) + tuple(PLAYER_PREFIXES.values())
+    match_cols = [col for col in df.columns if not col.startswith(player_prefixes)]
+
+    print("[INFO] Split winner and loser")
+    players = []
+    for is_winner, prefixes in ((1, ("winner_", "w_")), (0, ("loser_", "l_"))):
+        player_cols = {
+            col: _player_col_name(col, prefix)
+            for prefix in prefixes
+            for col in df.columns if col.startswith(prefix)
+        }
+        player = df[match_cols + list(player_cols)].rename(columns=player_cols)
+        player["is_winner"] = is_winner
+        players.append(player)
+    print(f"[INFO] Number of winners: {len(players[0])}")
+    print(f"[INFO] Number of losers: {len(players[1])}")
+
+    players = pd.concat(players, ignore_index=True)
+    print(f"[INFO] Number of players afther merge: {len(players)}")
+    return players
+
+
+def parse_rolling_specs(specs: list):
+    """
+        Normalize the rolling specs into (column, [windows], options) tuples.
+        A spec is (column, window or windows) or (column, window or windows, options), the options are
+        drop_col (drop the source column after the features are created) and min_periods
+        (minimal number of values in the window, the window size by default).
+
+        Params:
+            specs: list (e.g. [("a_ace_rate", [5, 10], {"drop_col": True}), ("ranking", 5)])
+
+        Return:
+            list[tuple]
+    """
+    parsed = []
+    for spec in specs:
+        col, windows = spec[0], spec[1]
+        options = spec[2] if len(spec) > 2 else {}
+        windows = [windows] if np.isscalar(windows) else list(windows)
+        parsed.append((col, windows, options))
+    return parsed
+
+
+def group_starts(group_codes: np.ndarray):
+    """
+        For every row of a frame sorted by group, the position of the first row of its group
+
+        Params:
+            group_codes: np.ndarray (group of every row, sorted)
+
+        Return:
+            np.ndarray
+    """
+    n = len(group_codes)
+    starts = np.flatnonzero(np.r_[True, group_codes[1:] != group_codes[:-1]]) if n else np.array([], dtype=np.int64)
+    return np.repeat(starts, np.diff(np.r_[starts, n]))
+
+
+def rolling_centers(values: np.ndarray):
+    """
+        Mean of the non-missing values of every column (0 for the empty columns)
+
+        Params:
+            values: np.ndarray (2-D, one column per feature)
+
+        Return:
+            np.ndarray
+    """
+    valid = np.isfinite(values)
+    centers = np.zeros(values.shape[1])
+    has_values = valid.any(axis=0)
+    centers[has_values] = np.nanmean(np.where(valid, values, np.nan)[:, has_values], axis=0)
+    return centers
+
+
+def rolling_prefix_sums(values: np.ndarray, centers: np.ndarray | None = None):
+    """
+        Prefix sums and prefix counts of the non-missing values of every column (2-D array sorted by group).
+        The columns are centered first (by their means if centers is None), so the prefix sums stay small
+        and the window sums keep their precision.
+
+        Params:
+            values: np.ndarray (2-D, one column per feature)
+            centers: np.ndarray | None (see rolling_centers)
+
+        Return:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: sums, counts (one more row than values), centers
+    """
+    valid = np.isfinite(values)
+    if centers is None:
+        centers = rolling_centers(values)
+    centered = np.where(valid, values - centers, 0.0)
+
+    sums = np.zeros((len(values) + 1, values.shape[1]))
+    counts = np.zeros((len(values) + 1, values.shape[1]), dtype=np.int64)
+    np.cumsum(centered, axis=0, out=sums[1:])
+    np.cumsum(valid, axis=0, out=counts[1:])
+    return sums, counts, centers
+
+
+def rolling_window_means(sums: np.ndarray, counts: np.ndarray, centers: np.ndarray, group_start: np.ndarray,
+                         window: int, min_periods: np.ndarray, start: int = 0, stop: int | None = None):
+    """
+        Mean of the previous `window` values of every row (the row itself excluded, so there is no leakage),
+        restricted to the group of the row. Rows with less than min_periods values in the window are NaN.
+
+        Params:
+            sums, counts, centers: np.ndarray (see rolling_prefix_sums)
+            group_start: np.ndarray (see group_starts)
+            window: int
+            min_periods: np.ndarray (per column)
+            start, stop: int (the rows to compute, all rows by default)
+
+        Return:
+            np.ndarray: (stop - start) x columns
+    """
+    stop = len(group_start) if stop is None else stop
+    hi = np.arange(start, stop)
+    lo = np.maximum(group_start[start:stop], hi - window)
+    window_sums = sums[hi] - sums[lo]
+    window_counts = counts[hi] - counts[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = window_sums / window_counts + centers
+    means[window_counts < min_periods] = np.nan
+    return means
+
+
+def compute_rolling_features(df: pd.DataFrame, specs: list, group_col: str = "id",
+                             order_cols: tuple = ("tourney_date", "match_num")):
+    """
+        Create the rolling average features of many columns and windows in one pass.
+        The frame is sorted by player and date only once, the prefix sums of every column are computed
+        once, and every window is two lookups into them, so adding windows costs no extra groupby-rolling.
+        The feature of a row is the average of the player's previous matches (shift by one, no leakage),
+        named <col>_last_<window>_avg.
+
+        Params:
+            df: pd.DataFrame (one row per player and match, e.g. split_players_per_game output)
+            specs: list (e.g. [("a_ace_rate", [5, 10], {"drop_col": True}), ("ranking", 5)])
+            group_col: str (player column)
+            order_cols: tuple (the matches of a player are ordered by these columns)
+
+        Return:
+            pd.DataFrame: a new dataframe with the feature columns, in the original row order
+    """
+    specs = parse_rolling_specs(specs)
+    cols = list(dict.fromkeys(col for col, _, _ in specs))
+    group_codes, _ = pd.factorize(df[group_col])
+    order = np.lexsort([df[col].to_numpy() for col in reversed(order_cols)] + [group_codes])
+    group_start = group_starts(group_codes[order])
+
+    values = np.column_stack([df[col].to_numpy(dtype=np.float64, na_value=np.nan)[order] for col in cols])
+    sums, counts, centers = rolling_prefix_sums(values)
+
+    # (column, window) -> min_periods of every requested feature
+    features = {}
+    for col, spec_windows, options in specs:
+        for window in spec_windows:
+            features[(col, window)] = options.get("min_periods", window)
+
+    new_cols = {}
+    for window in sorted({window for _, window in features}):
+        min_periods = np.array([features.get((col, window), window) for col in cols])
+        means = rolling_window_means(sums, counts, centers, group_start, window, min_periods)
+        for col_idx, col in enumerate(cols):
+            if (col, window) in features:
+                feature = np.empty(len(df))
+                feature[order] = means[:, col_idx]
+                new_cols[f"{col}_last_{window}_avg"] = feature
+
+    df = df.drop(columns=[col for col in new_cols if col in df.columns])
+    df = pd.concat([df, pd.DataFrame(new_cols, index=df.index)], axis=1)
+    drop_cols = [col for col, _, options in specs if options.get("drop_col")]
+    print(f"[INFO] Created {len(new_cols)} rolling features")
+    return df.drop(columns=list(dict.fromkeys(drop_cols)))
+
+
+def create_rolling_features(df: pd.DataFrame, col: str, window: int, drop_col: bool = False):
+    """
+        Create the <col>_last_<window>_avg feature: the average of the player's previous `window` matches.
+        Use compute_rolling_features to create many features in one pass.
+
+        Params:
+            df: pd.DataFrame (one row per player and match)
+            col: str
+            window: int
+            drop_col: bool (drop the source column)
+
+        Return:
+            pd.DataFrame
+    """
+    return compute_rolling_features(df, [(col, window, {"drop_col": drop_col})])
+
+
+def rename_cols(df: pd.DataFrame):
+    """
+        Rename the winner_ / w_ columns to p1_ and the loser_ / l_ columns to p2_
+    """
+    renames = {}
+    for col in df.columns:
+        for prefix, new_prefix in (("winner_", "p1_"), ("w_", "p1_"), ("loser_", "p2_"), ("l_", "p2_")):
+            if col.startswith(prefix):
+                renames[col] = new_prefix + col[len(prefix):]
+                break
+    print("[INFO] Successfully renamed features")
+    return df.rename(columns=renames)
+
+
+def randomize_players(df: pd.DataFrame, seed: int = 42):
+    """
+        Swap the p1_ and p2_ columns on a random half of the rows and set is_winner to 0 there
+        (see symmetric_pairs.randomize_players)
+    """
+    return symmetric_pairs.randomize_players(df, seed=seed)
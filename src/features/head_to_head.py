@@ -0,0 +1,183 @@
+# Egymás elleni (head-to-head) mérleg index játékospárokra
+
+import numpy as np
+import pandas as pd
+
+
+def _day_numbers(dates):
+    """
+        Dates as day numbers (int64). Accepts datetimes, date strings and YYYYMMDD integers
+    """
+    dates = pd.Series(np.atleast_1d(dates))
+    if pd.api.types.is_integer_dtype(dates) or pd.api.types.is_float_dtype(dates):
+        dates = pd.to_datetime(dates.astype("Int64").astype(str), format="%Y%m%d", errors="coerce")
+    else:
+        dates = pd.to_datetime(dates)
+    return dates.to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+def _pair_keys(index: dict, player_a: np.ndarray, player_b: np.ndarray):
+    """
+        Unordered pair keys of the players (-1 if one of the players is not in the index) and whether
+        player_a is the player with the lower code of the pair
+    """
+    player_ids = index["player_ids"]
+    codes = []
+    for players in (player_a, player_b):
+        positions = np.searchsorted(player_ids, players).clip(0, max(len(player_ids) - 1, 0))
+        found = (player_ids[positions] == players) if len(player_ids) else np.zeros(len(players), dtype=bool)
+        codes.append(np.where(found, positions, -1))
+    code_a, code_b = codes
+    a_is_low = code_a <= code_b
+    low, high = np.minimum(code_a, code_b), np.maximum(code_a, code_b)
+    keys = np.where(low >= 0, low * len(player_ids) + high, -1)
+    return keys, a_is_low
+
+
+def build_h2h_index(df: pd.DataFrame, winner_col: str = "winner_id", loser_col: str = "loser_id",
+                    date_col: str = "tourney_date"):
+    """
+        Build the head-to-head index of the matches: one sort by (player pair, date), after it every pair
+        is a contiguous block of its match dates and outcomes, with the cumulative number of wins of the
+        lower id player, so any record before a date is two binary searches and a subtraction.
+
+        Params:
+            df: pd.DataFrame (one row per match, e.g. load_interim_data output)
+            winner_col: str
+            loser_col: str
+            date_col: str
+
+        Return:
+            dict: the index (numpy arrays)
+    """
+    df = df.dropna(subset=[winner_col, loser_col, date_col])
+    winners = df[winner_col].to_numpy()
+    losers = df[loser_col].to_numpy()
+    player_ids = np.unique(np.concatenate([winners, losers]))
+    if player_ids.dtype == object:
+        player_ids = player_ids.astype(str)
+    index = {"player_ids": player_ids}
+
+    keys, winner_is_low = _pair_keys(index, winners, losers)
+    days = _day_numbers(df[date_col].to_numpy())
+    order = np.lexsort((days, keys))
+    keys, days, low_won = keys[order], days[order], winner_is_low[order]
+
+    pair_keys, pair_starts = np.unique(keys, return_index=True)
+    pair_rank = np.repeat(np.arange(len(pair_keys)), np.diff(np.r_[pair_starts, len(keys)]))
+    day_span = int(days.max() - days.min()) + 2 if len(days) else 2
+
+    index.update({
+        "pair_keys": pair_keys,
+        "pair_offsets": np.r_[pair_starts, len(keys)].astype(np.int64),
+        "days": days,
+        "low_won": low_won,
+        "low_wins_cum": np.r_[0, np.cumsum(low_won)].astype(np.int64),
+        "min_day": np.int64(days.min() if len(days) else 0),
+        "day_span": np.int64(day_span),
+    })
+    # Composite (pair, day) sort key of every match for the vectorized searches
+    index["composite_keys"] = pair_rank * day_span + (days - index["min_day"])
+    print(f"[INFO] Head-to-head index created. Matches: {len(keys)}, player pairs: {len(pair_keys)}")
+    return index
+
+
+def _h2h_positions(index: dict, player_a: np.ndarray, player_b: np.ndarray, dates):
+    """
+        Block start of the pair and the position of its first match on or after the date for every query
+        (start == position if the players have not met before the date)
+    """
+    keys, a_is_low = _pair_keys(index, np.asarray(player_a), np.asarray(player_b))
+    pair_rank = np.searchsorted(index["pair_keys"], keys)
+    found = (keys >= 0) & (pair_rank < len(index["pair_keys"]))
+    found[found] = index["pair_keys"][pair_rank[found]] == keys[found]
+    pair_rank = np.where(found, pair_rank, 0)
+
+    starts = index["pair_offsets"][pair_rank]
+    day_offsets = (_day_numbers(dates) - index["min_day"]).clip(0, index["day_span"] - 1)
+    positions = np.searchsorted(index["composite_keys"], pair_rank * index["day_span"] + day_offsets, side="left")
+    positions = np.maximum(positions, starts)
+    positions = np.where(found, positions, starts)
+    return starts, positions, a_is_low
+
+
+def query_h2h(index: dict, player_a, player_b, date, last_k: int = 5):
+    """
+        Head-to-head record of player_a against player_b strictly before the date
+
+        Params:
+            index: dict (built by build_h2h_index)
+            player_a: player id
+            player_b: player id
+            date: date (datetime, string or YYYYMMDD integer)
+            last_k: int
+
+        Return:
+            dict: matches, wins, losses (of player_a) and last_results (1 = player_a won, oldest first)
+    """
+    starts, positions, a_is_low = _h2h_positions(index, np.array([player_a]), np.array([player_b]), date)
+    start, position, a_is_low = int(starts[0]), int(positions[0]), bool(a_is_low[0])
+    low_won = index["low_won"][max(start, position - last_k):position]
+    low_wins = int(index["low_wins_cum"][position] - index["low_wins_cum"][start])
+    matches = position - start
+    wins = low_wins if a_is_low else matches - low_wins
+    last_results = low_won if a_is_low else ~low_won
+    return {"matches": matches, "wins": wins, "losses": matches - wins, "last_results": last_results.astype(int).tolist()}
+
+
+def attach_h2h_features(df: pd.DataFrame, index: dict, player_cols: tuple = ("winner_id", "loser_id"),
+                        date_col: str = "tourney_date", last_k: int = 5):
+    """
+        Attach the head-to-head record before the match date to every row, from the view of the first player
+        column: h2h_matches, h2h_wins, h2h_win_rate (NaN without previous meeting) and h2h_last_<k>_wins
+        (wins in the last k meetings). Matches of the same date are not counted, so the features of a match
+        never contain its own result.
+
+        Params:
+            df: pd.DataFrame
+            index: dict (built by build_h2h_index)
+            player_cols: tuple (e.g. ("winner_id", "loser_id") or ("p1_id", "p2_id"))
+            date_col: str
+            last_k: int
+
+        Return:
+            pd.DataFrame: a new dataframe with the head-to-head columns
+    """
+    player_a, player_b = (df[col].to_numpy() for col in player_cols)
+    starts, positions, a_is_low = _h2h_positions(index, player_a, player_b, df[date_col].to_numpy())
+    low_wins_cum = index["low_wins_cum"]
+    matches = positions - starts
+    low_wins = low_wins_cum[positions] - low_wins_cum[starts]
+
+    last_starts = np.maximum(starts, positions - last_k)
+    last_matches = positions - last_starts
+    last_low_wins = low_wins_cum[positions] - low_wins_cum[last_starts]
+
+    wins = np.where(a_is_low, low_wins, matches - low_wins)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        win_rate = np.where(matches > 0, wins / matches, np.nan)
+    new_cols = {
+        "h2h_matches": matches,
+        "h2h_wins": wins,
+        "h2h_win_rate": win_rate,
+        f"h2h_last_{last_k}_wins": np.where(a_is_low, last_low_wins, last_matches - last_low_wins),
+    }
+    print(f"[INFO] Head-to-head features attached. Rows with previous meetings: {(matches > 0).sum()}")
+    df = df.drop(columns=[col for col in new_cols if col in df.columns])
+    return pd.concat([df, pd.DataFrame(new_cols, index=df.index)], axis=1)
+
+
+def save_h2h_index(index: dict, path: str):
+    """
+        Save the index (.npz)
+    """
+    np.savez(path, **index)
+    print(f"[INFO] Head-to-head index saved into {path}")
+
+
+def load_h2h_index(path: str):
+    """
+        Load an index saved by save_h2h_index
+    """
+    with np.load(path, allow_pickle=False) as saved:
+        return {key: saved[key] for key in saved.files}
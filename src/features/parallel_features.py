@@ -0,0 +1,239 @@
+# Feature generálás több processzen: szezononként (statisztikák) és játékosonként (gördülő átlagok), megosztott memóriával
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.features import build_features
+
+
+# The rolling shards are cut at the first player boundary after every SHARD_ROWS rows, so the shards
+# (and the results) do not depend on the number of workers
+DEFAULT_SHARD_ROWS = 16_384
+
+_worker_arrays = None
+_worker_options = None
+
+
+def _to_shared(array: np.ndarray):
+    """
+        Copy the array into a new shared memory block
+
+        Return:
+            tuple: the shared memory (the caller closes and unlinks it) and its (name, shape, dtype) descriptor
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _empty_shared(shape: tuple, dtype=np.float64):
+    return _to_shared(np.full(shape, np.nan, dtype=dtype))
+
+
+def _attach(descriptor: tuple):
+    name, shape, dtype = descriptor
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _init_worker(descriptors: dict, options: dict):
+    """
+        Attach the shared arrays once per process, the tasks are only (start, stop) row ranges
+    """
+    global _worker_arrays, _worker_options
+    _worker_arrays = {key: _attach(descriptor) for key, descriptor in descriptors.items()}
+    _worker_options = options
+
+
+def _run_shards(func, descriptors: dict, options: dict, shards: list, max_workers: int | None):
+    global _worker_arrays
+    if max_workers == 1 or len(shards) < 2:
+        _init_worker(descriptors, options)
+        try:
+            for shard in shards:
+                func(shard)
+        finally:
+            # the views have to be released before the blocks are closed
+            shms = [shm for shm, _ in _worker_arrays.values()]
+            _worker_arrays = None
+            for shm in shms:
+                shm.close()
+        return
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(descriptors, options)) as executor:
+        list(executor.map(func, shards))
+
+
+def _release(shms: list):
+    for shm in shms:
+        shm.close()
+        shm.unlink()
+
+
+def _season_years(dates: pd.Series):
+    """
+        Season of every row, from a datetime or a YYYYMMDD integer column
+    """
+    if pd.api.types.is_numeric_dtype(dates):
+        return dates.to_numpy() // 10000
+    return pd.to_datetime(dates).dt.year.to_numpy()
+
+
+def _statistical_shard(shard: tuple):
+    start, stop = shard
+    stats, out = _worker_arrays["stats"][1], _worker_arrays["out"][1]
+    key_cols = _worker_options["key_cols"]
+    features = build_features.statistical_feature_arrays(
+        {col: stats[start:stop, i] for i, col in enumerate(key_cols)}
+    )
+    for i, values in enumerate(features.values()):
+        out[start:stop, i] = values
+
+
+def create_statistical_features_parallel(df: pd.DataFrame, date_col: str = "tourney_date", max_workers: int | None = None):
+    """
+        Parallel version of build_features.create_statistical_features: the rows are sharded by season and the
+        seasons are processed in a process pool. Only the key stat columns are copied into a shared memory block,
+        the workers write the rates into a shared output block, so no frame is pickled. The result is the same as
+        create_statistical_features for any number of workers.
+
+        Params:
+            df: pd.DataFrame (match data, one row per match)
+            date_col: str (datetime or YYYYMMDD integer column of the season)
+            max_workers: int | None (number of processes, 1 computes in the current process)
+
+        Return:
+            pd.DataFrame: a new dataframe with the feature columns
+    """
+    key_cols = [prefix + col for prefix in ("w_", "l_") for col in build_features.KEY_STAT_COLS]
+    df = df.dropna(subset=key_cols)
+    order = np.argsort(_season_years(df[date_col]), kind="stable")
+    seasons = _season_years(df[date_col])[order]
+    bounds = np.flatnonzero(np.r_[True, seasons[1:] != seasons[:-1], True]) if len(df) else np.array([0])
+    shards = [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    feature_cols = list(build_features.statistical_feature_arrays(
+        {col: np.empty(0) for col in key_cols}
+    ))
+    stats = np.column_stack([df[col].to_numpy(dtype=np.float64)[order] for col in key_cols])
+    shms = []
+    try:
+        stats_shm, stats_descriptor = _to_shared(stats)
+        shms.append(stats_shm)
+        del stats
+        out_shm, out_descriptor = _empty_shared((len(df), len(feature_cols)))
+        shms.append(out_shm)
+        _run_shards(_statistical_shard, {"stats": stats_descriptor, "out": out_descriptor},
+                    {"key_cols": key_cols}, shards, max_workers)
+        out = np.ndarray((len(df), len(feature_cols)), dtype=np.float64, buffer=out_shm.buf)
+        features = np.empty_like(out)
+        features[order] = out
+        del out
+    finally:
+        _release(shms)
+
+    print(f"[INFO] Created statistical features of {len(shards)} seasons")
+    df = df.drop(columns=[col for col in feature_cols if col in df.columns])
+    return pd.concat([df, pd.DataFrame(features, index=df.index, columns=feature_cols)], axis=1)
+
+
+def _player_shards(sorted_codes: np.ndarray, shard_rows: int):
+    """
+        (start, stop) row ranges of about shard_rows rows, cut only between two players
+    """
+    n = len(sorted_codes)
+    if n == 0:
+        return []
+    firsts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    cuts = firsts[np.r_[True, np.diff(firsts // shard_rows) > 0]]
+    bounds = np.r_[cuts, n]
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def _rolling_shard(shard: tuple):
+    start, stop = shard
+    values, group_start = _worker_arrays["values"][1], _worker_arrays["group_start"][1]
+    out = _worker_arrays["out"][1]
+    centers, features = _worker_options["centers"], _worker_options["features"]
+
+    sums, counts, _ = build_features.rolling_prefix_sums(values[start:stop], centers)
+    local_start = group_start[start:stop] - start
+    for window in sorted({window for _, window, _ in features}):
+        positions = [i for i, (_, feature_window, _) in enumerate(features) if feature_window == window]
+        min_periods = np.full(values.shape[1], np.iinfo(np.int64).max)
+        for i in positions:
+            min_periods[features[i][0]] = features[i][2]
+        means = build_features.rolling_window_means(sums, counts, centers, local_start, window, min_periods)
+        for i in positions:
+            out[start:stop, i] = means[:, features[i][0]]
+
+
+def compute_rolling_features_parallel(df: pd.DataFrame, specs: list, group_col: str = "id",
+                                      order_cols: tuple = ("tourney_date", "match_num"),
+                                      max_workers: int | None = None, shard_rows: int = DEFAULT_SHARD_ROWS):
+    """
+        Parallel version of build_features.compute_rolling_features: the rows sorted by player and date are
+        sharded by player (a player is never split) and the shards are processed in a process pool.
+        The sorted value matrix is shared with the workers through shared memory, every shard computes its own
+        prefix sums with the global column centers and writes its features into a shared output block.
+        The shards depend only on shard_rows, so the result is the same for any number of workers
+        (and equal to compute_rolling_features up to floating point rounding).
+
+        Params:
+            df: pd.DataFrame (one row per player and match, e.g. split_players_per_game output)
+            specs: list (e.g. [("a_ace_rate", [5, 10], {"drop_col": True}), ("ranking", 5)])
+            group_col: str (player column)
+            order_cols: tuple (the matches of a player are ordered by these columns)
+            max_workers: int | None (number of processes, 1 computes in the current process)
+            shard_rows: int
+
+        Return:
+            pd.DataFrame: a new dataframe with the feature columns, in the original row order
+    """
+    specs = build_features.parse_rolling_specs(specs)
+    cols = list(dict.fromkeys(col for col, _, _ in specs))
+    group_codes, _ = pd.factorize(df[group_col])
+    order = np.lexsort([df[col].to_numpy() for col in reversed(order_cols)] + [group_codes])
+    sorted_codes = group_codes[order]
+    shards = _player_shards(sorted_codes, shard_rows)
+
+    # (column index, window, min_periods) of every feature, in the column order of compute_rolling_features
+    requested = {}
+    for col, spec_windows, options in specs:
+        for window in spec_windows:
+            requested[(col, window)] = options.get("min_periods", window)
+    features = [
+        (col_idx, window, requested[(col, window)])
+        for window in sorted({window for _, window in requested})
+        for col_idx, col in enumerate(cols) if (col, window) in requested
+    ]
+    feature_cols = [f"{cols[col_idx]}_last_{window}_avg" for col_idx, window, _ in features]
+
+    values = np.column_stack([df[col].to_numpy(dtype=np.float64, na_value=np.nan)[order] for col in cols])
+    options = {"centers": build_features.rolling_centers(values), "features": features}
+    shms = []
+    try:
+        values_shm, values_descriptor = _to_shared(values)
+        shms.append(values_shm)
+        del values
+        start_shm, start_descriptor = _to_shared(build_features.group_starts(sorted_codes))
+        shms.append(start_shm)
+        out_shm, out_descriptor = _empty_shared((len(df), len(features)))
+        shms.append(out_shm)
+        descriptors = {"values": values_descriptor, "group_start": start_descriptor, "out": out_descriptor}
+        _run_shards(_rolling_shard, descriptors, options, shards, max_workers)
+        out = np.ndarray((len(df), len(features)), dtype=np.float64, buffer=out_shm.buf)
+        new_values = np.empty_like(out)
+        new_values[order] = out
+        del out
+    finally:
+        _release(shms)
+
+    df = df.drop(columns=[col for col in feature_cols if col in df.columns])
+    df = pd.concat([df, pd.DataFrame(new_values, index=df.index, columns=feature_cols)], axis=1)
+    drop_cols = [col for col, _, options in specs if options.get("drop_col")]
+    print(f"[INFO] Created {len(feature_cols)} rolling features in {len(shards)} player shards")
+    return df.drop(columns=list(dict.fromkeys(drop_cols)))
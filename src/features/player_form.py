@@ -0,0 +1,134 @@
+# Játékosonkénti forma állapot új meccsek inkrementális feldolgozásához
+
+import numpy as np
+import pandas as pd
+
+from src.features.build_features import group_starts
+
+
+def create_form_store(stats: list, windows: list):
+    """
+        Create an empty player form store. For every player it holds a ring buffer with the last
+        max(windows) values of every stat, and the running sums and counts of the non-missing values
+        of every window, so the rolling averages of a new match need no history.
+
+        Params:
+            stats: list (tracked columns, e.g. ["ace", "df", "a_ace_rate"])
+            windows: list (e.g. [5, 10])
+
+        Return:
+            dict: the store (numpy arrays, see save_form_store)
+    """
+    windows = sorted(set(np.atleast_1d(windows).tolist()))
+    return {
+        "stats": np.array(stats, dtype=str),
+        "windows": np.array(windows, dtype=np.int64),
+        "player_ids": np.array([], dtype=np.int64),
+        "n_matches": np.zeros(0, dtype=np.int64),
+        "buffers": np.full((0, windows[-1], len(stats)), np.nan),
+        "sums": np.zeros((0, len(windows), len(stats))),
+        "counts": np.zeros((0, len(windows), len(stats)), dtype=np.int64),
+    }
+
+
+def _player_slots(store: dict, ids: np.ndarray):
+    """
+        Position of every player in the store arrays, new players are appended with empty state
+    """
+    slots = pd.Index(store["player_ids"]).get_indexer(ids)
+    new_ids = pd.unique(ids[slots == -1])
+    if len(new_ids):
+        n_new = len(new_ids)
+        player_ids = np.concatenate([store["player_ids"], new_ids])
+        if player_ids.dtype == object:
+            player_ids = player_ids.astype(str)
+        store["player_ids"] = player_ids
+        store["n_matches"] = np.concatenate([store["n_matches"], np.zeros(n_new, dtype=np.int64)])
+        for key, fill in (("buffers", np.nan), ("sums", 0), ("counts", 0)):
+            shape = (n_new,) + store[key].shape[1:]
+            store[key] = np.concatenate([store[key], np.full(shape, fill, dtype=store[key].dtype)])
+        slots = pd.Index(store["player_ids"]).get_indexer(ids)
+    return slots
+
+
+def _update_players(store: dict, slots: np.ndarray, values: np.ndarray):
+    """
+        Push one new match (values: one row per player) into the state of distinct players
+    """
+    size = store["buffers"].shape[1]
+    position = store["n_matches"][slots]
+    valid = np.isfinite(values)
+    for window_idx, window in enumerate(store["windows"]):
+        leaving = store["buffers"][slots, (position - window) % size]
+        has_leaving = (position >= window)[:, None] & np.isfinite(leaving)
+        store["sums"][slots, window_idx] += np.where(valid, values, 0.0) - np.where(has_leaving, leaving, 0.0)
+        store["counts"][slots, window_idx] += valid.astype(np.int64) - has_leaving
+    store["buffers"][slots, position % size] = values
+    store["n_matches"][slots] += 1
+
+
+def update_form_store(store: dict, df: pd.DataFrame, group_col: str = "id",
+                      order_cols: tuple = ("tourney_date", "match_num")):
+    """
+        Add a batch of new matches to the store and return their pre-match rolling features
+        (<col>_last_<window>_avg, the same values as build_features.compute_rolling_features on the whole
+        history). The cost depends only on the batch size. The batches have to be added in time order,
+        every match of a batch must be later than the matches already in the store.
+
+        Params:
+            store: dict (created by create_form_store or load_form_store, updated in place)
+            df: pd.DataFrame (new matches, one row per player and match)
+            group_col: str
+            order_cols: tuple
+
+        Return:
+            pd.DataFrame: df with the feature columns
+    """
+    stats = store["stats"].tolist()
+    windows = store["windows"]
+    slots = _player_slots(store, df[group_col].to_numpy())
+
+    # The k-th match of every player in the batch is processed in the k-th round,
+    # so in a round every player appears only once and the update is vectorized
+    order = np.lexsort([df[col].to_numpy() for col in reversed(order_cols)] + [slots])
+    sorted_slots = slots[order]
+    rank = np.arange(len(order)) - group_starts(sorted_slots)
+    by_rank = np.argsort(rank, kind="stable")
+    bounds = np.searchsorted(rank[by_rank], np.arange(rank.max() + 2 if len(rank) else 1))
+
+    values = np.column_stack([df[col].to_numpy(dtype=np.float64, na_value=np.nan) for col in stats])[order]
+    features = np.empty((len(df), len(windows), len(stats)))
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        rows = by_rank[start:stop]
+        player_slots = sorted_slots[rows]
+        counts = store["counts"][player_slots]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = store["sums"][player_slots] / counts
+        means[counts < windows[None, :, None]] = np.nan
+        features[order[rows]] = means
+        _update_players(store, player_slots, values[rows])
+
+    new_cols = {
+        f"{col}_last_{window}_avg": features[:, window_idx, col_idx]
+        for window_idx, window in enumerate(windows)
+        for col_idx, col in enumerate(stats)
+    }
+    print(f"[INFO] Player form store updated with {len(df)} rows. Players: {len(store['player_ids'])}")
+    df = df.drop(columns=[col for col in new_cols if col in df.columns])
+    return pd.concat([df, pd.DataFrame(new_cols, index=df.index)], axis=1)
+
+
+def save_form_store(store: dict, path: str):
+    """
+        Save the store as a checkpoint (.npz)
+    """
+    np.savez(path, **store)
+    print(f"[INFO] Player form store saved into {path}")
+
+
+def load_form_store(path: str):
+    """
+        Load a store saved by save_form_store
+    """
+    with np.load(path, allow_pickle=False) as checkpoint:
+        return {key: checkpoint[key] for key in checkpoint.files}
@@ -0,0 +1,170 @@
+# Elo pontszámok (összesített és borításonkénti) a meccstörténet alapján
+
+import numpy as np
+import pandas as pd
+
+
+INITIAL_RATING = 1500.0
+ELO_COLS = ["winner_elo", "loser_elo", "winner_surface_elo", "loser_surface_elo"]
+
+
+def create_rating_state(initial_rating: float = INITIAL_RATING):
+    """
+        Create an empty rating state: the overall and the per surface ratings and match counts of the players
+
+        Return:
+            dict: the state (numpy arrays, see save_rating_state)
+    """
+    return {
+        "initial_rating": np.array(initial_rating),
+        "player_ids": np.array([], dtype=np.int64),
+        "surfaces": np.array([], dtype=str),
+        "ratings": np.zeros(0),
+        "counts": np.zeros(0, dtype=np.int64),
+        "surface_ratings": np.zeros((0, 0)),
+        "surface_counts": np.zeros((0, 0), dtype=np.int64),
+    }
+
+
+def _codes(state: dict, key: str, values: np.ndarray):
+    """
+        Position of every value in state[key], the new values are appended to it
+    """
+    codes = pd.Index(state[key]).get_indexer(values)
+    new_values = pd.unique(values[(codes == -1) & pd.notna(values)])
+    if len(new_values):
+        values_all = np.concatenate([state[key], new_values])
+        state[key] = values_all.astype(str) if values_all.dtype == object else values_all
+        codes = pd.Index(state[key]).get_indexer(values)
+    return codes
+
+
+def _grow_state(state: dict):
+    """
+        Extend the rating arrays with the initial rating of the new players and surfaces
+    """
+    n_players, n_surfaces = len(state["player_ids"]), len(state["surfaces"])
+    initial_rating = float(state["initial_rating"])
+    for key, fill in (("ratings", initial_rating), ("counts", 0)):
+        grown = np.full(n_players, fill, dtype=state[key].dtype)
+        grown[:len(state[key])] = state[key]
+        state[key] = grown
+    for key, fill in (("surface_ratings", initial_rating), ("surface_counts", 0)):
+        grown = np.full((n_players, n_surfaces), fill, dtype=state[key].dtype)
+        grown[:state[key].shape[0], :state[key].shape[1]] = state[key]
+        state[key] = grown
+
+
+def _elo_pass(winners: np.ndarray, losers: np.ndarray, ratings: np.ndarray, counts: np.ndarray,
+              k_factor: float | None):
+    """
+        One chronological pass over the matches (integer player positions), the ratings and counts are
+        updated in place. A match depends on the previous matches of both players, so the loop is sequential,
+        but it works only on the compact arrays.
+
+        Return:
+            tuple[np.ndarray, np.ndarray]: the pre-match ratings of the winners and the losers
+    """
+    winner_ratings = np.empty(len(winners))
+    loser_ratings = np.empty(len(winners))
+    rating_list = ratings.tolist()
+    count_list = counts.tolist()
+    use_constant_k = k_factor is not None
+    for i, (winner, loser) in enumerate(zip(winners.tolist(), losers.tolist())):
+        winner_rating, loser_rating = rating_list[winner], rating_list[loser]
+        winner_ratings[i], loser_ratings[i] = winner_rating, loser_rating
+        expected = 1.0 / (1.0 + 10.0 ** ((loser_rating - winner_rating) / 400.0))
+        winner_k = k_factor if use_constant_k else 250.0 / (count_list[winner] + 5.0) ** 0.4
+        loser_k = k_factor if use_constant_k else 250.0 / (count_list[loser] + 5.0) ** 0.4
+        rating_list[winner] = winner_rating + winner_k * (1.0 - expected)
+        rating_list[loser] = loser_rating - loser_k * (1.0 - expected)
+        count_list[winner] += 1
+        count_list[loser] += 1
+    ratings[:] = rating_list
+    counts[:] = count_list
+    return winner_ratings, loser_ratings
+
+
+def update_ratings(state: dict, df: pd.DataFrame, winner_col: str = "winner_id", loser_col: str = "loser_id",
+                   surface_col: str = "surface", order_cols: tuple = ("tourney_date", "match_num"),
+                   k_factor: float | None = None):
+    """
+        Add new matches to the rating state and return them with the pre-match ratings of the players:
+        winner_elo, loser_elo, winner_surface_elo and loser_surface_elo. The matches are processed in
+        chronological order; every match has to be later than the matches already in the state.
+        Matches without player ids get NaN ratings and do not change the state.
+
+        Params:
+            state: dict (created by create_rating_state or load_rating_state, updated in place)
+            df: pd.DataFrame (one row per match, e.g. load_interim_data output)
+            winner_col: str
+            loser_col: str
+            surface_col: str
+            order_cols: tuple
+            k_factor: float | None (constant K factor, by default it decreases with the player's matches)
+
+        Return:
+            pd.DataFrame: df with the rating columns
+    """
+    winners = _codes(state, "player_ids", df[winner_col].to_numpy())
+    losers = _codes(state, "player_ids", df[loser_col].to_numpy())
+    surfaces = _codes(state, "surfaces", df[surface_col].to_numpy())
+    _grow_state(state)
+
+    order = np.lexsort([df[col].to_numpy() for col in reversed(order_cols)])
+    order = order[(winners[order] >= 0) & (losers[order] >= 0)]
+    elo = {col: np.full(len(df), np.nan) for col in ELO_COLS}
+
+    elo["winner_elo"][order], elo["loser_elo"][order] = _elo_pass(
+        winners[order], losers[order], state["ratings"], state["counts"], k_factor
+    )
+
+    # Every surface is an independent chronological pass over the matches played on it
+    for surface_code in range(len(state["surfaces"])):
+        surface_order = order[surfaces[order] == surface_code]
+        if len(surface_order) == 0:
+            continue
+        ratings = state["surface_ratings"][:, surface_code].copy()
+        counts = state["surface_counts"][:, surface_code].copy()
+        elo["winner_surface_elo"][surface_order], elo["loser_surface_elo"][surface_order] = _elo_pass(
+            winners[surface_order], losers[surface_order], ratings, counts, k_factor
+        )
+        state["surface_ratings"][:, surface_code] = ratings
+        state["surface_counts"][:, surface_code] = counts
+
+    print(f"[INFO] Ratings updated with {len(order)} matches. Players: {len(state['player_ids'])}")
+    df = df.drop(columns=[col for col in ELO_COLS if col in df.columns])
+    return pd.concat([df, pd.DataFrame(elo, index=df.index)], axis=1)
+
+
+def compute_elo_ratings(df: pd.DataFrame, k_factor: float | None = None, **kwargs):
+    """
+        Pre-match overall and surface Elo ratings of the whole match history (e.g. load_interim_data output)
+
+        Params:
+            df: pd.DataFrame
+            k_factor: float | None
+            kwargs: column names, see update_ratings
+
+        Return:
+            tuple[pd.DataFrame, dict]: df with the rating columns and the rating state after the last match
+    """
+    state = create_rating_state()
+    df = update_ratings(state, df, k_factor=k_factor, **kwargs)
+    return df, state
+
+
+def save_rating_state(state: dict, path: str):
+    """
+        Save the rating state as a checkpoint (.npz)
+    """
+    np.savez(path, **state)
+    print(f"[INFO] Rating state saved into {path}")
+
+
+def load_rating_state(path: str):
+    """
+        Load a rating state saved by save_rating_state
+    """
+    with np.load(path, allow_pickle=False) as checkpoint:
+        return {key: checkpoint[key] for key in checkpoint.files}
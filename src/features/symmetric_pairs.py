@@ -0,0 +1,247 @@
+# A p1_/p2_ oszloppárok szimmetrikus kezelése: játékosok véletlen cseréje, mindkét irány és különbség feature-ök
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_SWAP_RATIO = 0.5
+DEFAULT_LABEL_COL = "is_winner"
+
+
+def find_player_pairs(columns, prefixes: tuple = ("p1_", "p2_")):
+    """
+        Positions of the p1_<x> / p2_<x> column pairs. The engineered data may have duplicated column names,
+        the k-th p1_<x> column is paired with the k-th p2_<x> column. The pairs can be found once and reused
+        for every frame with the same columns.
+
+        Params:
+            columns: the columns of the dataframe
+            prefixes: tuple (prefix of the first and of the second player)
+
+        Return:
+            dict: {"names": the <x> of every pair, "first": positions of p1_<x>, "second": positions of p2_<x>}
+    """
+    first, second = prefixes
+    second_positions = {}
+    for i, col in enumerate(columns):
+        if col.startswith(second):
+            second_positions.setdefault(col[len(second):], []).append(i)
+
+    names, first_cols, second_cols, used = [], [], [], {}
+    for i, col in enumerate(columns):
+        if not col.startswith(first):
+            continue
+        name = col[len(first):]
+        k = used.get(name, 0)
+        if k < len(second_positions.get(name, [])):
+            names.append(name)
+            first_cols.append(i)
+            second_cols.append(second_positions[name][k])
+            used[name] = k + 1
+    return {"names": names, "first": np.array(first_cols, dtype=int), "second": np.array(second_cols, dtype=int)}
+
+
+def _group_pairs(df: pd.DataFrame, pairs: dict):
+    """
+        Group the pairs into blocks which can be stored in one 2-D array: the numpy columns by dtype,
+        the categoricals with the same categories by the dtype of their codes. The other pairs (nullable
+        extension dtypes, different dtypes of the two players) are swapped one by one.
+
+        Return:
+            dict: (kind, dtype) -> list of (pair index, first position, second position)
+    """
+    blocks = {}
+    for k, (position_1, position_2) in enumerate(zip(pairs["first"], pairs["second"])):
+        dtype_1, dtype_2 = df.dtypes.iloc[position_1], df.dtypes.iloc[position_2]
+        if dtype_1 != dtype_2:
+            key = ("other", None)
+        elif isinstance(dtype_1, pd.CategoricalDtype):
+            key = ("codes", df.iloc[:, position_1].cat.codes.dtype)
+        elif isinstance(dtype_1, np.dtype) and dtype_1 != object:
+            key = ("values", dtype_1)
+        else:
+            key = ("other", None)
+        blocks.setdefault(key, []).append((k, position_1, position_2))
+    return blocks
+
+
+def _read_block(df: pd.DataFrame, kind: str, dtype, members: list):
+    """
+        The values (or the category codes) of the pairs of a block as one (2, pairs, rows) array,
+        so every column is a contiguous row of it
+    """
+    block = np.empty((2, len(members), len(df)), dtype=dtype)
+    for side in (0, 1):
+        positions = [member[1 + side] for member in members]
+        if kind == "values":
+            block[side] = df.iloc[:, positions].to_numpy().T
+        else:
+            for j, position in enumerate(positions):
+                block[side, j] = df.iloc[:, position].cat.codes.to_numpy()
+    return block
+
+
+def _block_column(df: pd.DataFrame, kind: str, position: int, values: np.ndarray):
+    if kind == "codes":
+        return pd.Categorical.from_codes(values, dtype=df.dtypes.iloc[position])
+    return values
+
+
+def _pair_arrays(df: pd.DataFrame, position_1: int, position_2: int):
+    array_1, array_2 = df.iloc[:, position_1].array, df.iloc[:, position_2].array
+    if array_1.dtype != array_2.dtype:
+        array_1, array_2 = np.asarray(array_1, dtype=object), np.asarray(array_2, dtype=object)
+    return array_1, array_2
+
+
+def _flip_label(df: pd.DataFrame, label_col: str, mask: np.ndarray):
+    labels = df[label_col].to_numpy()
+    return np.where(mask, 1 - labels, labels).astype(labels.dtype)
+
+
+def swap_players(df: pd.DataFrame, mask: np.ndarray, pairs: dict | None = None,
+                 label_col: str | None = DEFAULT_LABEL_COL):
+    """
+        Swap the p1_ and p2_ values of the rows of the mask. The pairs of the same dtype are swapped
+        in one fancy indexing operation over a (2, pairs, rows) block, only the swapped columns are new arrays.
+        The label (1 - label) of the swapped rows is flipped.
+
+        Params:
+            df: pd.DataFrame
+            mask: np.ndarray (bool, the rows to swap)
+            pairs: dict | None (made by find_player_pairs, found from the columns if None)
+            label_col: str | None (the label of the p1 player, e.g. is_winner, None if there is no label)
+
+        Return:
+            pd.DataFrame: a new dataframe
+    """
+    pairs = find_player_pairs(df.columns) if pairs is None else pairs
+    mask = np.asarray(mask, dtype=bool)
+    result = df.copy(deep=False)
+    for (kind, dtype), members in _group_pairs(df, pairs).items():
+        if kind == "other":
+            for _, position_1, position_2 in members:
+                array_1, array_2 = _pair_arrays(df, position_1, position_2)
+                swapped_1, swapped_2 = array_1.copy(), array_2.copy()
+                swapped_1[mask], swapped_2[mask] = array_2[mask], array_1[mask]
+                result.isetitem(position_1, swapped_1)
+                result.isetitem(position_2, swapped_2)
+            continue
+        block = _read_block(df, kind, dtype, members)
+        block[:, :, mask] = block[::-1, :, mask]
+        for j, (_, position_1, position_2) in enumerate(members):
+            result.isetitem(position_1, _block_column(df, kind, position_1, block[0, j]))
+            result.isetitem(position_2, _block_column(df, kind, position_2, block[1, j]))
+    if label_col is not None and label_col in df.columns:
+        result[label_col] = _flip_label(df, label_col, mask)
+    return result
+
+
+def randomize_players(df: pd.DataFrame, seed: int = 42, swap_ratio: float = DEFAULT_SWAP_RATIO,
+                      pairs: dict | None = None, label_col: str | None = DEFAULT_LABEL_COL):
+    """
+        Swap the p1_ and p2_ players on random rows (see swap_players), so the p1 player is not always
+        the winner. The same seed swaps the same rows.
+
+        Params:
+            df: pd.DataFrame
+            seed: int
+            swap_ratio: float (probability of swapping a row)
+            pairs: dict | None (made by find_player_pairs)
+            label_col: str | None
+
+        Return:
+            pd.DataFrame
+    """
+    mask = np.random.default_rng(seed).random(len(df)) < swap_ratio
+    result = swap_players(df, mask, pairs, label_col)
+    print(f"[INFO] Successfully randomized players, swapped {mask.sum()} of {len(df)} rows")
+    return result
+
+
+def both_orientations(df: pd.DataFrame, pairs: dict | None = None, label_col: str | None = DEFAULT_LABEL_COL):
+    """
+        Augment the data with the swapped version of every row: the original rows first, then the same rows
+        with p1_ and p2_ swapped (and flipped label). The output columns are filled directly, without
+        a swapped copy of the whole dataframe.
+
+        Params:
+            df: pd.DataFrame
+            pairs: dict | None (made by find_player_pairs)
+            label_col: str | None
+
+        Return:
+            pd.DataFrame: 2 * len(df) rows with a new RangeIndex
+    """
+    pairs = find_player_pairs(df.columns) if pairs is None else pairs
+    n = len(df)
+    columns = {}
+    for (kind, dtype), members in _group_pairs(df, pairs).items():
+        if kind == "other":
+            for _, position_1, position_2 in members:
+                array_1, array_2 = _pair_arrays(df, position_1, position_2)
+                columns[position_1] = pd.concat([pd.Series(array_1), pd.Series(array_2)], ignore_index=True).array
+                columns[position_2] = pd.concat([pd.Series(array_2), pd.Series(array_1)], ignore_index=True).array
+            continue
+        block = _read_block(df, kind, dtype, members)
+        output = np.empty((2, len(members), 2 * n), dtype=block.dtype)
+        output[:, :, :n] = block
+        output[:, :, n:] = block[::-1]
+        for j, (_, position_1, position_2) in enumerate(members):
+            columns[position_1] = _block_column(df, kind, position_1, output[0, j])
+            columns[position_2] = _block_column(df, kind, position_2, output[1, j])
+
+    for i in range(df.shape[1]):
+        if i not in columns:
+            values = df.iloc[:, i]
+            columns[i] = pd.concat([values, values], ignore_index=True).array
+    result = pd.DataFrame({i: columns[i] for i in range(df.shape[1])})
+    result.columns = df.columns
+    if label_col is not None and label_col in df.columns:
+        result[label_col] = _flip_label(result, label_col, np.arange(2 * n) >= n)
+    print(f"[INFO] Added the swapped orientation of {n} rows")
+    return result
+
+
+def add_difference_features(df: pd.DataFrame, pairs: dict | None = None, suffix: str = "_diff",
+                            drop_pairs: bool = False):
+    """
+        Add the p1_<x> - p2_<x> difference of every numerical pair as <x><suffix>. The differences of
+        the pairs of the same dtype are computed in one operation over their (2, pairs, rows) block.
+
+        Params:
+            df: pd.DataFrame
+            pairs: dict | None (made by find_player_pairs)
+            suffix: str
+            drop_pairs: bool (drop the p1_ and p2_ columns of the differences)
+
+        Return:
+            pd.DataFrame
+    """
+    pairs = find_player_pairs(df.columns) if pairs is None else pairs
+    new_cols, used_positions = {}, []
+    for (kind, dtype), members in _group_pairs(df, pairs).items():
+        if kind == "codes":
+            continue
+        if kind == "values" and pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            block = _read_block(df, kind, dtype, members)
+            differences = block[0] - block[1]
+        else:
+            members = [
+                member for member in members
+                if all(pd.api.types.is_numeric_dtype(df.dtypes.iloc[p]) and not pd.api.types.is_bool_dtype(
+                    df.dtypes.iloc[p]) for p in member[1:])
+            ]
+            differences = [
+                df.iloc[:, position_1].to_numpy(dtype=np.float64, na_value=np.nan)
+                - df.iloc[:, position_2].to_numpy(dtype=np.float64, na_value=np.nan)
+                for _, position_1, position_2 in members
+            ]
+        for j, (k, position_1, position_2) in enumerate(members):
+            new_cols[pairs["names"][k] + suffix] = differences[j]
+            used_positions += [position_1, position_2]
+
+    pair_cols = list(dict.fromkeys(df.columns[used_positions])) if drop_pairs else []
+    df = df.drop(columns=[col for col in new_cols if col in df.columns] + pair_cols)
+    print(f"[INFO] Created {len(new_cols)} difference features")
+    return pd.concat([df, pd.DataFrame(new_cols, index=df.index)], axis=1)
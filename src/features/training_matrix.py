@@ -0,0 +1,255 @@
+# Modellezésre kész float32 mátrix a feature-ökből, mentett kategória kódokkal és idő szerinti felosztással
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data import load_data
+from src.utils import dtype_utils
+
+
+DEFAULT_LABEL_COL = "is_winner"
+DEFAULT_DATE_COL = "tourney_date"
+CODE_MAPS_SUFFIX = ".codes.json"
+CHUNK_ROWS = 16_384
+# The outcome of the match itself, which is only known after it: the score, the length and the serve statistics
+# of the two players and the rates of build_features computed from them. Their rolling averages
+# (<x>_last_<N>_avg) use only the earlier matches of the player, so they are features.
+MATCH_OUTCOME_COLS = [
+    "score", "minutes", "ace", "df", "svpt", "1stin", "1stwon", "2ndwon", "svgms", "bpsaved", "bpfaced",
+    "dfp_double_fault_rate", "a_ace_rate", "d_dominance_ratio", "bpsvd_break_point_opp_saved",
+]
+
+
+def _categorical_positions(df: pd.DataFrame, exclude: set):
+    return [
+        i for i, col in enumerate(df.columns)
+        if col not in exclude
+        and not pd.api.types.is_numeric_dtype(df.dtypes.iloc[i])
+        and not pd.api.types.is_datetime64_any_dtype(df.dtypes.iloc[i])
+    ]
+
+
+def match_outcome_cols(columns, label_col: str = DEFAULT_LABEL_COL):
+    """
+        The columns of the outcome of the match (MATCH_OUTCOME_COLS and the label), with any player prefix
+        (w_ace, p1_ace, p1_1stwon), the .1 suffix of a duplicated name and the _diff suffix of the difference
+        features of symmetric_pairs
+
+        Return:
+            list[str]
+    """
+    outcome = set(MATCH_OUTCOME_COLS) | {label_col.lower()}
+    cols = []
+    for col in columns:
+        name = dtype_utils.base_col_name(col).split(".")[0].lower()
+        name = name[:-len("_diff")] if name.endswith("_diff") else name
+        if name in outcome:
+            cols.append(col)
+    return cols
+
+
+def _dates(values: pd.Series):
+    """
+        The dates as datetime64, the raw YYYYMMDD integers are converted
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        values = pd.to_datetime(values.astype("Int64").astype(str), format="%Y%m%d", errors="coerce")
+    return pd.to_datetime(values).to_numpy()
+
+
+def fit_code_maps(df: pd.DataFrame, categorical_cols: list | None = None):
+    """
+        Fit the integer codes of the categorical columns (the non-numerical columns if None). The columns of the
+        same attribute of the two players (e.g. p1_ioc and p2_ioc) share the codes, so they stay comparable
+        when the players are swapped.
+
+        Params:
+            df: pd.DataFrame
+            categorical_cols: list | None
+
+        Return:
+            dict: {"groups": {col: group}, "categories": {group: categories}}, the code is the position
+                  in the categories
+    """
+    if categorical_cols is None:
+        positions = _categorical_positions(df, {DEFAULT_DATE_COL})
+    else:
+        categorical_cols = set(categorical_cols)
+        positions = [i for i, col in enumerate(df.columns) if col in categorical_cols]
+    code_maps = {"groups": {}, "categories": {}}
+    values = {}
+    for i in positions:
+        col = df.columns[i]
+        group = dtype_utils.group_key(col)
+        code_maps["groups"][col] = group
+        column = df.iloc[:, i]
+        column = column.cat.categories if isinstance(column.dtype, pd.CategoricalDtype) else column.dropna()
+        values.setdefault(group, set()).update(str(value) for value in pd.unique(column))
+    code_maps["categories"] = {group: sorted(group_values) for group, group_values in values.items()}
+    print(f"[INFO] Fitted the codes of {len(code_maps['groups'])} categorical columns")
+    return code_maps
+
+
+def save_code_maps(code_maps: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(code_maps, f)
+    print(f"[INFO] Category codes saved into {path}")
+
+
+def load_code_maps(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def encode_column(values: pd.Series, categories: list):
+    """
+        Codes of the values (position in the categories), -1 for missing and unseen values
+    """
+    if not isinstance(values.dtype, pd.CategoricalDtype) and pd.api.types.infer_dtype(values, skipna=True) != "string":
+        values = values.where(values.isna(), values.astype(str))
+    return pd.Categorical(values, categories=categories).codes
+
+
+def build_training_matrix(df: pd.DataFrame, label_col: str = DEFAULT_LABEL_COL, date_col: str = DEFAULT_DATE_COL,
+                          code_maps: dict | None = None, drop_cols: list | None = None, memmap_path: str | None = None):
+    """
+        Build a contiguous (C order) float32 feature matrix and the label vector, with the rows ordered
+        by date, so the time based splits are slices (views) of it. Only the data known before the match
+        are features, the outcome of the match is left out. The numerical columns are converted
+        chunk by chunk (missing values are NaN, booleans 0 / 1), the categorical columns are encoded with
+        the code maps. The input dataframe is not copied.
+
+        Params:
+            df: pd.DataFrame (e.g. load_data.load_features_data())
+            label_col: str
+            date_col: str
+            code_maps: dict | None (made by fit_code_maps, fitted on df if None)
+            drop_cols: list | None (columns which are not features besides the label, the date and the outcome
+                                    of the match (see match_outcome_cols: score, minutes, p1_ace, p2_1stWon,
+                                    p1_<label_col>, ...), which are always left out; the <x>_last_<N>_avg
+                                    features are kept)
+            memmap_path: str | None (write the matrix into this .npy file and return it memory mapped)
+
+        Return:
+            dict: {"X", "y", "dates", "feature_names", "code_maps", "index" (the df index of the rows)}
+    """
+    # the stats of the match itself (and p1_is_winner / p2_is_winner) would leak the result into the features
+    exclude = {label_col, date_col, *match_outcome_cols(df.columns, label_col), *(drop_cols or [])}
+    if code_maps is None:
+        code_maps = fit_code_maps(df, [df.columns[i] for i in _categorical_positions(df, exclude)])
+    positions = [i for i, col in enumerate(df.columns) if col not in exclude]
+    categorical = [i for i in positions if df.columns[i] in code_maps["groups"]]
+    numerical = [i for i in positions if df.columns[i] not in code_maps["groups"]]
+    unknown = [df.columns[i] for i in numerical if not pd.api.types.is_numeric_dtype(df.dtypes.iloc[i])]
+    if unknown:
+        raise ValueError(f"Columns without category codes: {unknown}")
+
+    dates = _dates(df[date_col])
+    order = np.argsort(dates, kind="stable")
+    is_sorted = bool(np.all(order == np.arange(len(df))))
+
+    n_rows, n_cols = len(df), len(positions)
+    if memmap_path is None:
+        X = np.empty((n_rows, n_cols), dtype=np.float32)
+    else:
+        os.makedirs(os.path.dirname(memmap_path) or ".", exist_ok=True)
+        X = np.lib.format.open_memmap(memmap_path, mode="w+", dtype=np.float32, shape=(n_rows, n_cols))
+
+    # the features keep the column order of df
+    column_of = {position: j for j, position in enumerate(positions)}
+    numerical_cols = [column_of[i] for i in numerical]
+    for start in range(0, n_rows, CHUNK_ROWS):
+        rows = slice(start, start + CHUNK_ROWS) if is_sorted else order[start:start + CHUNK_ROWS]
+        X[start:start + CHUNK_ROWS, numerical_cols] = df.iloc[rows, numerical].to_numpy(
+            dtype=np.float32, na_value=np.nan
+        )
+    for i in categorical:
+        col = df.columns[i]
+        codes = encode_column(df.iloc[:, i], code_maps["categories"][code_maps["groups"][col]])
+        X[:, column_of[i]] = codes if is_sorted else codes[order]
+    if memmap_path is not None:
+        X.flush()
+        print(f"[INFO] Training matrix saved into {memmap_path}")
+
+    y = df[label_col].to_numpy()
+    print(f"[INFO] Training matrix: {n_rows} rows, {n_cols} features ({len(categorical)} categorical), "
+          f"{X.nbytes / 1024 ** 2:.1f} MB")
+    return {
+        "X": X,
+        "y": y if is_sorted else y[order],
+        "dates": dates if is_sorted else dates[order],
+        "feature_names": [df.columns[i] for i in positions],
+        "code_maps": code_maps,
+        "index": df.index.to_numpy() if is_sorted else df.index.to_numpy()[order],
+    }
+
+
+def training_matrix_from_features(url: str = load_data.DEFAULT_ATP_ENGINEERED_DATA_PATH,
+                                  code_maps_path: str | None = None, **kwargs):
+    """
+        Load the engineered features (load_data.load_features_data, with the compact dtypes of the schema file
+        next to them if it exists) and build the training matrix. The code maps are fitted at the first call
+        and saved next to the features (<file>.codes.json), the next calls load them, so the codes stay
+        the same between the sessions.
+
+        Params:
+            url: str
+            code_maps_path: str | None (<url>.codes.json if None)
+            kwargs: the options of build_training_matrix (label_col, date_col, drop_cols, memmap_path)
+
+        Return:
+            dict: see build_training_matrix
+    """
+    df = load_data.load_features_data(url, dtype_schema="auto")
+    if df is None:
+        return None
+    code_maps_path = code_maps_path or url.rstrip("/\\") + CODE_MAPS_SUFFIX
+    code_maps = load_code_maps(code_maps_path) if os.path.isfile(code_maps_path) else None
+    matrix = build_training_matrix(df, code_maps=code_maps, **kwargs)
+    if code_maps is None:
+        save_code_maps(matrix["code_maps"], code_maps_path)
+    return matrix
+
+
+def time_split(matrix: dict, test_from, valid_from=None):
+    """
+        Split the training matrix by date: train before valid_from (or test_from), validation between
+        valid_from and test_from, test from test_from. The parts are views of the matrix, not copies.
+
+        Params:
+            matrix: dict (made by build_training_matrix)
+            test_from: str | pd.Timestamp
+            valid_from: str | pd.Timestamp | None
+
+        Return:
+            dict: part name -> (X, y)
+    """
+    dates = matrix["dates"]
+    test_start = np.searchsorted(dates, np.datetime64(pd.Timestamp(test_from)), side="left")
+    train_end = test_start
+    if valid_from is not None:
+        train_end = np.searchsorted(dates, np.datetime64(pd.Timestamp(valid_from)), side="left")
+    parts = {"train": slice(0, train_end), "test": slice(test_start, len(dates))}
+    if valid_from is not None:
+        parts["valid"] = slice(train_end, test_start)
+    for name, rows in parts.items():
+        print(f"[INFO] {name}: {rows.stop - rows.start} rows")
+    return {name: (matrix["X"][rows], matrix["y"][rows]) for name, rows in parts.items()}
+
+
+def expanding_time_splits(matrix: dict, test_years: list[int]):
+    """
+        Walk forward splits: for every test year the train part is every earlier row (views of the matrix)
+
+        Yield:
+            tuple[int, tuple, tuple]: year, (X_train, y_train), (X_test, y_test)
+    """
+    dates = matrix["dates"]
+    for year in test_years:
+        start = np.searchsorted(dates, np.datetime64(pd.Timestamp(year=year, month=1, day=1)), side="left")
+        end = np.searchsorted(dates, np.datetime64(pd.Timestamp(year=year + 1, month=1, day=1)), side="left")
+        yield year, (matrix["X"][:start], matrix["y"][:start]), (matrix["X"][start:end], matrix["y"][start:end])
@@ -0,0 +1,143 @@
+# A notebookok lépései (letöltés, tisztítás, feature-ök, mentés) parancssorból futtatható pipeline-ként
+
+import argparse
+import os
+
+import pandas as pd
+
+from src.data import fetch_data, load_data, storage
+from src.features import build_features, symmetric_pairs
+from src.utils import data_utils, dtype_utils, instrumentation, merge_players_data, pipeline_utils
+
+
+DEFAULT_CACHE_DIR = "data_storage/cache/pipeline"
+DEFAULT_INTERIM_PATH = load_data.DEFAULT_ATP_INTERIM_DATA_PATH
+DEFAULT_FEATURES_PATH = load_data.DEFAULT_ATP_ENGINEERED_DATA_PATH
+DEFAULT_ODDS_PATH = "data_storage/interim/atp_odds_data"
+# the odds are dated by the match day, the statistics by the first day of the tournament
+ODDS_DATE_WINDOW = 14
+
+# The rolling features of the feature notebook
+ROLLING_SPECS = [
+    ("dfp_double_fault_rate", [5, 10], {"drop_col": True}),
+    ("a_ace_rate", [5, 10], {"drop_col": True}),
+    ("d_dominance_ratio", [5, 10], {"drop_col": True}),
+    ("bpsvd_break_point_opp_saved", [5, 10], {"drop_col": True}),
+    ("is_winner", [5, 10]),
+    ("ranking", [5, 10]),
+]
+
+
+def _download_atp(years: list[int] | None = None, year_to: int = fetch_data.DEFAULT_YEAR_TO):
+    return fetch_data.refresh_atp_raw_data(years, year_to)
+
+
+def _download_odds(years: list[int] | None = None, year_to: int = fetch_data.DEFAULT_YEAR_TO):
+    return fetch_data.refresh_odds_raw_data(years, year_to)
+
+
+def _clean(raw_path: str, drop_threshold: float, fill_threshold: float):
+    df = pd.read_csv(raw_path, low_memory=False)
+    df = data_utils.drop_hight_na_columns(df=df, threshold=drop_threshold)
+    return data_utils.fill_na_median(df, threshold=fill_threshold)
+
+
+def _save_dataset(df: pd.DataFrame, path: str):
+    # year partitioned Parquet with the compact dtypes, the schema file is saved next to it
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    storage.write_partitioned(df, path)
+    return path
+
+
+def _merge_odds(interim_path: str, odds_path: str, date_window: int):
+    # the matches of the interim data with the bookmaker odds of the same players (missing if not found)
+    matches = load_data.load_interim_data(interim_path)
+    stats = matches.rename(columns={"winner_name": "winner", "loser_name": "loser", "tourney_date": "date"})
+    odds = pd.read_csv(odds_path, low_memory=False)
+    merged = merge_players_data.merge_on_name_and_date(stats, odds, date_window=date_window)
+    return merged.rename(columns={"winner": "winner_name", "loser": "loser_name", "date": "tourney_date"})
+
+
+def _player_features(interim_path: str, rolling_specs: list):
+    df = load_data.load_interim_data(interim_path)
+    df = build_features.create_statistical_features(df)
+    df = build_features.split_players_per_game(df)
+    return build_features.compute_rolling_features(df, rolling_specs)
+
+
+def _match_features(players_df: pd.DataFrame, interim_path: str):
+    original_df = load_data.load_interim_data(interim_path)
+    merged = merge_players_data.merge_players_to_matches(players_df=players_df, original_df=original_df)
+    merged = build_features.rename_cols(merged)
+    merged["is_winner"] = 1  # the p1 is always the winner
+    return merged
+
+
+def build_stages(interim_path: str = DEFAULT_INTERIM_PATH, features_path: str = DEFAULT_FEATURES_PATH,
+                 years: list[int] | None = None, year_to: int = fetch_data.DEFAULT_YEAR_TO,
+                 odds_path: str = DEFAULT_ODDS_PATH):
+    """
+        The stages of the download, cleaning and feature notebooks as a DAG:
+
+            download_atp -> clean -> save_interim -> player_features -> match_features -> randomize_players
+                                                                                               -> save_features
+                                     save_interim, download_odds -> merge_odds -> save_odds
+
+        Params:
+            interim_path: str (folder of the year partitioned interim dataset)
+            features_path: str (folder of the year partitioned features dataset)
+            odds_path: str (folder of the year partitioned dataset of the matches with their odds)
+            years: list[int] | None (years to check on the server by the downloads, all years if None)
+            year_to: int (last season of the downloads, e.g. the current one)
+
+        Return:
+            list[dict]
+    """
+    make_stage = pipeline_utils.make_stage
+    return [
+        make_stage("download_atp", _download_atp, params={"years": years, "year_to": year_to}, volatile=True),
+        make_stage("download_odds", _download_odds, params={"years": years, "year_to": year_to}, volatile=True),
+        make_stage("clean", _clean, deps=["download_atp"], params={"drop_threshold": 0.3, "fill_threshold": 0.3},
+                   modules=[data_utils]),
+        make_stage("save_interim", _save_dataset, deps=["clean"], params={"path": interim_path},
+                   outputs=[interim_path, dtype_utils.schema_path(interim_path)], modules=[storage, dtype_utils]),
+        make_stage("merge_odds", _merge_odds, deps=["save_interim", "download_odds"],
+                   params={"date_window": ODDS_DATE_WINDOW}, modules=[load_data, merge_players_data]),
+        make_stage("save_odds", _save_dataset, deps=["merge_odds"], params={"path": odds_path},
+                   outputs=[odds_path, dtype_utils.schema_path(odds_path)], modules=[storage, dtype_utils]),
+        make_stage("player_features", _player_features, deps=["save_interim"],
+                   params={"rolling_specs": ROLLING_SPECS}, modules=[load_data, build_features]),
+        make_stage("match_features", _match_features, deps=["player_features", "save_interim"],
+                   modules=[load_data, merge_players_data, build_features]),
+        make_stage("randomize_players", symmetric_pairs.randomize_players, deps=["match_features"],
+                   params={"seed": 42}, modules=[symmetric_pairs]),
+        make_stage("save_features", _save_dataset, deps=["randomize_players"], params={"path": features_path},
+                   outputs=[features_path, dtype_utils.schema_path(features_path)], modules=[storage, dtype_utils]),
+    ]
+
+
+def main(argv: list | None = None):
+    parser = argparse.ArgumentParser(description="Run the ATP data pipeline, only the stale stages are executed")
+    parser.add_argument("targets", nargs="*", help="stages to build (all stages by default)")
+    parser.add_argument("--force", nargs="+", default=[], help="run these stages and the ones after them again")
+    parser.add_argument("--years", nargs="+", type=int, help="years to check on the server (all years by default)")
+    parser.add_argument("--year-to", type=int, default=fetch_data.DEFAULT_YEAR_TO,
+                        help="last season of the downloads, e.g. the current one")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--interim-path", default=DEFAULT_INTERIM_PATH)
+    parser.add_argument("--features-path", default=DEFAULT_FEATURES_PATH)
+    parser.add_argument("--odds-path", default=DEFAULT_ODDS_PATH)
+    parser.add_argument("--max-workers", type=int, default=pipeline_utils.DEFAULT_MAX_WORKERS)
+    args = parser.parse_args(argv)
+
+    stages = build_stages(args.interim_path, args.features_path, args.years, args.year_to, args.odds_path)
+    results = pipeline_utils.run_pipeline(stages, args.cache_dir, targets=args.targets or None, force=args.force,
+                                          max_workers=args.max_workers)
+    executed = [name for name, result in results.items() if result["status"] == "run"]
+    print(f"[INFO] Pipeline finished, executed stages: {', '.join(executed) or 'none'}")
+    instrumentation.print_summary()
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,121 @@
-# API/külső hívások
\ No newline at end of file
+# API/külső hívások
+
+import hashlib
+import json
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_TIMEOUT = 30
+
+
+def create_session(max_retries: int = 5, backoff_factor: float = 0.5, pool_size: int = 8):
+    """
+        Create a pooled HTTP session which retries the failed requests with exponential backoff
+
+        Params:
+            max_retries: int
+            backoff_factor: float (sleep between retries: backoff_factor * 2 ** (retry - 1))
+            pool_size: int (number of keep-alive connections per host)
+
+        Return:
+            requests.Session
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20):
+    """
+        Return the sha256 hex digest of a file on disk
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path: str):
+    """
+        Load a download manifest (json) or return an empty one if it does not exist
+    """
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: str):
+    """
+        Save the download manifest atomically, so an interrupted run never leaves a broken file
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def download_file(session: requests.Session, url: str, output_file: str, entry: dict | None = None,
+                  timeout: float = DEFAULT_TIMEOUT):
+    """
+        Download the url into output_file. If the manifest entry of the file is still valid
+        (the file on disk has the recorded hash) a conditional request is sent with the recorded
+        ETag / Last-Modified headers and the file is not downloaded again on 304.
+
+        Params:
+            session: requests.Session
+            url: str
+            output_file: str
+            entry: dict | None (manifest entry of the previous download)
+            timeout: float
+
+        Return:
+            (dict, bool): the new manifest entry and whether the file content changed
+    """
+    entry = entry or {}
+    headers = {}
+    is_complete = (
+        os.path.isfile(output_file)
+        and entry.get("url") == url
+        and entry.get("sha256") == file_sha256(output_file)
+    )
+    if is_complete:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = session.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and is_complete:
+        return entry, False
+    response.raise_for_status()
+
+    sha256 = hashlib.sha256(response.content).hexdigest()
+    changed = not (is_complete and sha256 == entry.get("sha256"))
+    if changed:
+        tmp_file = output_file + ".part"
+        with open(tmp_file, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp_file, output_file)
+
+    new_entry = {
+        "url": url,
+        "sha256": sha256,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    return new_entry, changed
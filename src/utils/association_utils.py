@@ -0,0 +1,158 @@
+# Kategorikus változók közötti kapcsolat (Cramér-féle V) vektorizáltan
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+# Above this many cells the contingency table is built only from its non-empty cells
+DENSE_TABLE_LIMIT = 1_000_000
+
+_worker_codes = None
+
+
+def _factorize(series: pd.Series):
+    """
+        Integer codes (-1 for missing values) and the number of categories of a column
+    """
+    codes, uniques = pd.factorize(series)
+    return codes.astype(np.int64), len(uniques)
+
+
+def _chi2(codes_x: np.ndarray, n_x: int, codes_y: np.ndarray, n_y: int):
+    """
+        Pearson chi-squared statistic of the contingency table of two coded columns, like
+        scipy.stats.chi2_contingency: the rows with a missing value and the empty categories are left out,
+        and the Yates correction is applied if the table has one degree of freedom.
+
+        Return:
+            tuple[float, int, int, int]: chi2, number of observations, rows and columns of the table
+    """
+    valid = (codes_x >= 0) & (codes_y >= 0)
+    combined = codes_x[valid] * n_y + codes_y[valid]
+    n = len(combined)
+    if n == 0:
+        return np.nan, 0, 0, 0
+
+    if n_x * n_y <= DENSE_TABLE_LIMIT:
+        table = np.bincount(combined, minlength=n_x * n_y).reshape(n_x, n_y)
+        table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0].astype(np.float64)
+        r, k = table.shape
+        if (r - 1) * (k - 1) == 0:
+            return 0.0, n, r, k
+        expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / n
+        if (r - 1) * (k - 1) == 1:
+            diff = expected - table
+            table = table + np.sign(diff) * np.minimum(0.5, np.abs(diff))
+        return float(((table - expected) ** 2 / expected).sum()), n, r, k
+
+    # Sparse table: chi2 = n * sum(observed^2 / (row_sum * col_sum)) - n over the non-empty cells
+    cells, counts = np.unique(combined, return_counts=True)
+    rows, cols = cells // n_y, cells % n_y
+    row_sums = np.bincount(rows, counts, minlength=n_x)
+    col_sums = np.bincount(cols, counts, minlength=n_y)
+    r, k = int((row_sums > 0).sum()), int((col_sums > 0).sum())
+    if (r - 1) * (k - 1) == 0:
+        return 0.0, n, r, k
+    chi2 = n * (counts.astype(np.float64) ** 2 / (row_sums[rows] * col_sums[cols])).sum() - n
+    return float(max(chi2, 0.0)), n, r, k
+
+
+def _cramers_v_from_codes(codes_x: np.ndarray, n_x: int, codes_y: np.ndarray, n_y: int):
+    """
+        Bias corrected Cramér's V of two coded columns
+    """
+    chi2, n, r, k = _chi2(codes_x, n_x, codes_y, n_y)
+    if n < 2:
+        return np.nan
+    phi2 = chi2 / n
+    phi2corr = max(0, phi2 - ((k - 1) * (r - 1)) / (n - 1))
+    rcorr = r - ((r - 1) ** 2) / (n - 1)
+    kcorr = k - ((k - 1) ** 2) / (n - 1)
+    denominator = min((kcorr - 1), (rcorr - 1))
+    if denominator <= 0:
+        return np.nan
+    return float(np.sqrt(phi2corr / denominator))
+
+
+def cramers_v(x: pd.Series, y: pd.Series):
+    """
+        Bias corrected Cramér's V of two categorical columns
+
+        Params:
+            x: pd.Series
+            y: pd.Series
+
+        Return:
+            float (NaN if one of the columns has only one category)
+    """
+    return _cramers_v_from_codes(*_factorize(x), *_factorize(y))
+
+
+def _init_worker(codes: list):
+    global _worker_codes
+    _worker_codes = codes
+
+
+def _pair_cramers_v(pair: tuple):
+    i, j = pair
+    return _cramers_v_from_codes(*_worker_codes[i], *_worker_codes[j])
+
+
+def _pairs_cramers_v(codes: list, pairs: list, max_workers: int | None):
+    """
+        Cramér's V of the (i, j) column pairs. With more workers the coded columns are sent to every
+        process only once and the tasks are only the pair indices.
+    """
+    if max_workers == 1 or len(pairs) < 2:
+        _init_worker(codes)
+        return [_pair_cramers_v(pair) for pair in pairs]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(codes,)) as executor:
+        return list(executor.map(_pair_cramers_v, pairs, chunksize=max(1, len(pairs) // 64)))
+
+
+def target_cramers_v(df: pd.DataFrame, target_col: str, cols: list | None = None, max_workers: int | None = 1):
+    """
+        Cramér's V of every categorical column with the target column. Every column is factorized once
+        and the contingency tables are built with np.bincount on the combined codes.
+
+        Params:
+            df: pd.DataFrame
+            target_col: str
+            cols: list | None (the object and category columns if None)
+            max_workers: int | None (number of processes, 1 computes in the current process)
+
+        Return:
+            list[tuple[str, float]]: (column, Cramér's V) sorted in descending order
+    """
+    if cols is None:
+        cols = [col for col in df.select_dtypes(include=["object", "category"]) if col != target_col]
+    codes = [_factorize(df[col]) for col in cols] + [_factorize(df[target_col])]
+    values = _pairs_cramers_v(codes, [(i, len(cols)) for i in range(len(cols))], max_workers)
+    return sorted(zip(cols, values), key=lambda x: x[1], reverse=True)
+
+
+def cramers_v_matrix(df: pd.DataFrame, cols: list | None = None, max_workers: int | None = 1):
+    """
+        Symmetric Cramér's V matrix of the categorical columns (feature x feature association)
+
+        Params:
+            df: pd.DataFrame
+            cols: list | None (the object and category columns if None)
+            max_workers: int | None (number of processes, 1 computes in the current process)
+
+        Return:
+            pd.DataFrame: the matrix, with 1 in the diagonal
+    """
+    if cols is None:
+        cols = df.select_dtypes(include=["object", "category"]).columns.tolist()
+    codes = [_factorize(df[col]) for col in cols]
+    pairs = [(i, j) for i in range(len(cols)) for j in range(i + 1, len(cols))]
+    values = _pairs_cramers_v(codes, pairs, max_workers)
+
+    matrix = np.eye(len(cols))
+    for (i, j), value in zip(pairs, values):
+        matrix[i, j] = matrix[j, i] = value
+    print(f"[INFO] Cramér's V matrix of {len(cols)} columns computed")
+    return pd.DataFrame(matrix, index=cols, columns=cols)
@@ -0,0 +1,153 @@
+# Korreláció számítás mátrixszorzással: célváltozó szerint, blokkokban és inkrementálisan
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_BLOCK_SIZE = 256
+
+
+def _masked_values(df: pd.DataFrame, cols: list, shift: np.ndarray, dtype):
+    """
+        Shifted values of the columns with 0 for the missing values, and the mask of the valid values
+    """
+    values = np.empty((len(df), len(cols)), dtype=dtype)
+    valid = np.empty((len(df), len(cols)), dtype=dtype)
+    for i, col in enumerate(cols):
+        column = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        is_valid = ~np.isnan(column)
+        values[:, i] = np.where(is_valid, column - shift[i], 0.0)
+        valid[:, i] = is_valid
+    return values, valid
+
+
+def _pearson(n, sum_x, sum_y, sum_xx, sum_yy, sum_xy):
+    """
+        Pearson correlation from the (pairwise complete) sums, NaN for constant or too short columns
+    """
+    n, sum_x, sum_y, sum_xx, sum_yy, sum_xy = (
+        np.asarray(value, dtype=np.float64) for value in (n, sum_x, sum_y, sum_xx, sum_yy, sum_xy)
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = n * sum_xy - sum_x * sum_y
+        var_x = n * sum_xx - sum_x ** 2
+        var_y = n * sum_yy - sum_y ** 2
+        corr = cov / (np.sqrt(var_x) * np.sqrt(var_y))
+    corr = np.where((n > 1) & (var_x > 0) & (var_y > 0), corr, np.nan)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def target_correlations(df: pd.DataFrame, target_col: str, cols: list | None = None):
+    """
+        Pearson correlation of every numerical column with the target column, without the full matrix:
+        the sums of the pairwise complete observations come from a few products of the centered
+        (n x columns) matrix with the target vector, so the cost is linear in the number of columns.
+        Missing values are handled like pd.DataFrame.corr (pairwise complete observations).
+
+        Params:
+            df: pd.DataFrame
+            target_col: str
+            cols: list | None (the numerical columns without the target if None)
+
+        Return:
+            pd.Series: the correlations sorted in descending order
+    """
+    if cols is None:
+        cols = [col for col in df.select_dtypes(include="number") if col != target_col]
+    means = df[cols + [target_col]].mean().to_numpy(dtype=np.float64)
+    x, x_valid = _masked_values(df, cols, means[:-1], np.float64)
+    y, y_valid = _masked_values(df, [target_col], means[-1:], np.float64)
+    y, y_valid = y[:, 0], y_valid[:, 0]
+
+    corr = _pearson(
+        n=x_valid.T @ y_valid,
+        sum_x=x.T @ y_valid,
+        sum_y=x_valid.T @ y,
+        sum_xx=(x * x).T @ y_valid,
+        sum_yy=x_valid.T @ (y * y),
+        sum_xy=x.T @ y,
+    )
+    return pd.Series(corr, index=cols, name=target_col).sort_values(ascending=False)
+
+
+def create_correlation_state(cols: list, shift: np.ndarray | None = None, dtype=np.float32):
+    """
+        Create an empty correlation state: the pairwise complete running sums of every column pair.
+        The values are shifted (by the means of the first partition by default) before they are summed,
+        so the sums stay small and the correlations keep their precision.
+
+        Params:
+            cols: list
+            shift: np.ndarray | None
+            dtype: numpy dtype of the sums (float32 halves the memory of the blocks)
+
+        Return:
+            dict: the state
+    """
+    n_cols = len(cols)
+    state = {"columns": np.array(cols, dtype=str), "shift": shift}
+    for key in ("n", "sum_x", "sum_xx", "sum_xy"):
+        state[key] = np.zeros((n_cols, n_cols), dtype=dtype)
+    return state
+
+
+def update_correlation_state(state: dict, df: pd.DataFrame, block_size: int = DEFAULT_BLOCK_SIZE):
+    """
+        Add a partition (new rows) to the running sums. The column pairs are processed in blocks of
+        block_size columns, so only a (rows x block_size) part of the products is in memory at a time.
+        sum_x[i, j] is the sum of column i over the rows where both i and j are valid.
+
+        Params:
+            state: dict (created by create_correlation_state, updated in place)
+            df: pd.DataFrame (the new partition, with the columns of the state)
+            block_size: int
+    """
+    cols = state["columns"].tolist()
+    dtype = state["n"].dtype
+    if state["shift"] is None:
+        state["shift"] = df[cols].mean().fillna(0).to_numpy(dtype=np.float64)
+    x, valid = _masked_values(df, cols, state["shift"], dtype)
+    x_squared = x * x
+    for start in range(0, len(cols), block_size):
+        block = slice(start, start + block_size)
+        state["n"][block] += valid[:, block].T @ valid
+        state["sum_x"][block] += x[:, block].T @ valid
+        state["sum_xx"][block] += x_squared[:, block].T @ valid
+        state["sum_xy"][block] += x[:, block].T @ x
+
+
+def state_correlation_matrix(state: dict):
+    """
+        Correlation matrix of the rows added to the state so far
+
+        Return:
+            pd.DataFrame
+    """
+    corr = _pearson(state["n"], state["sum_x"], state["sum_x"].T, state["sum_xx"], state["sum_xx"].T,
+                    state["sum_xy"])
+    cols = state["columns"].tolist()
+    # the diagonal is exactly 1 (NaN for constant columns, like pd.DataFrame.corr)
+    corr[np.diag_indices(len(cols))] = np.where(np.isnan(np.diag(corr)), np.nan, 1.0)
+    return pd.DataFrame(corr, index=cols, columns=cols)
+
+
+def correlation_matrix(df: pd.DataFrame, cols: list | None = None, block_size: int = DEFAULT_BLOCK_SIZE,
+                       dtype=np.float32):
+    """
+        Pearson correlation matrix of the numerical columns (pairwise complete observations, like
+        pd.DataFrame.corr), computed in column blocks on float32 by default
+
+        Params:
+            df: pd.DataFrame
+            cols: list | None (the numerical columns if None)
+            block_size: int
+            dtype: numpy dtype
+
+        Return:
+            pd.DataFrame
+    """
+    if cols is None:
+        cols = df.select_dtypes(include="number").columns.tolist()
+    state = create_correlation_state(cols, dtype=dtype)
+    update_correlation_state(state, df, block_size)
+    return state_correlation_matrix(state)
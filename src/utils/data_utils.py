@@ -1,8 +1,29 @@
 # Adattisztító függvények
 
-import pandas as pd 
+import os
 
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
+from src.data import storage
+from src.utils import instrumentation, profile_utils
+
+
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_SKETCH_BINS = 2048
+
+
+def _columns_to_drop(na_ratio: pd.Series, threshold: float):
+    return na_ratio[na_ratio > threshold].index
+
+
+def _columns_to_fill(na_ratio: pd.Series, threshold: float):
+    return na_ratio[na_ratio < threshold].index
+
+
+@instrumentation.instrument
 def drop_hight_na_columns(df: pd.DataFrame, threshold: int = 0.6):
     """
         Removes columns where missing values are evaluated by the appropriate threshold.
@@ -16,40 +37,188 @@ def drop_hight_na_columns(df: pd.DataFrame, threshold: int = 0.6):
     """
     na_ratio = df.isna().mean()
     print(f"[INFO] Threshold: {threshold}")
-    columns_to_drop = na_ratio[na_ratio > threshold].index
+    columns_to_drop = _columns_to_drop(na_ratio, threshold)
     print(f"[INFO] Droping features {columns_to_drop}")
     return df.drop(columns=columns_to_drop)
 
 
+@instrumentation.instrument
 def fill_na_median(df: pd.DataFrame, threshold: int = 0.3):
     """
         Fill the numerical columns with there median if the NA ration reaches the threshold
-        Parameters: 
+        Parameters:
         df (pd.DataFrame): The input data frame
         threshold (float): The proportion of missing values (e.g. 0.4 = 40%)
 
         Returns:
-        pd.DataFrame: The new data frame, with the filled columns
+        pd.DataFrame: The new data frame, with the filled columns (the input is not modified)
     """
     numerical_df = df.select_dtypes(include="number")
 
     na_ratio = numerical_df.isna().mean()
-    columns_to_drop = na_ratio[na_ratio < threshold].index
-    print(f"[INFO] Columns which will be filled with there median: {columns_to_drop}")
-    df[columns_to_drop] = df[columns_to_drop].fillna(df[columns_to_drop].median())
-    return df
-    
+    columns_to_fill = _columns_to_fill(na_ratio, threshold)
+    print(f"[INFO] Columns which will be filled with there median: {columns_to_fill}")
+    return df.fillna(numerical_df[columns_to_fill].median())
+
 
+@instrumentation.instrument
 def get_missing_values_summary(df: pd.DataFrame):
     """
         Creates a Dataframe with the summary of missing values and their percentiage
     """
-    missing_values = df.isnull().sum()
+    profile = profile_utils.profile_dataframe(df)["columns"]
+    missing_values = profile["missing_count"]
     missing_values = missing_values[missing_values > 0].sort_values(ascending=False)
 
-    missing_percent = (df.isnull().mean() * 100).sort_values(ascending=False)
     missing_df = pd.DataFrame({
         "missing_count": missing_values,
-        "missing_percent": missing_percent[missing_values.index].round(2)
+        "missing_percent": profile["missing_pct"][missing_values.index].round(2)
     })
-    return missing_df
\ No newline at end of file
+    return missing_df
+
+
+def _sketch_update(sketch: tuple | None, values: np.ndarray, max_bins: int):
+    """
+        Add values to a quantile sketch: sorted centroids with weights. While the column has at most max_bins
+        distinct values the sketch is exact, above it neighbour centroids of equal total weight are merged,
+        so the memory is bounded and the rank error of a quantile is at most about 1 / max_bins.
+    """
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return sketch
+    centroids, weights = np.unique(values, return_counts=True)
+    weights = weights.astype(np.float64)
+    if sketch is not None:
+        centroids, inverse = np.unique(np.concatenate([sketch[0], centroids]), return_inverse=True)
+        weights = np.bincount(inverse, np.concatenate([sketch[1], weights]))
+
+    if len(centroids) > max_bins:
+        bins = ((np.cumsum(weights) - weights) / weights.sum() * max_bins).astype(np.int64)
+        merged_weights = np.bincount(bins, weights)
+        merged_centroids = np.bincount(bins, centroids * weights)
+        used = merged_weights > 0
+        centroids, weights = merged_centroids[used] / merged_weights[used], merged_weights[used]
+    return centroids, weights
+
+
+def _sketch_median(sketch: tuple | None):
+    """
+        Median of the sketch, interpolated between the two middle values like pd.Series.median
+    """
+    if sketch is None:
+        return np.nan
+    centroids, weights = sketch
+    rank = (weights.sum() - 1) / 2
+    upper_ranks = np.cumsum(weights)
+    low = np.searchsorted(upper_ranks, np.floor(rank), side="right")
+    high = np.searchsorted(upper_ranks, np.ceil(rank), side="right")
+    fraction = rank - np.floor(rank)
+    return centroids[low] * (1 - fraction) + centroids[high] * fraction
+
+
+@instrumentation.instrument
+def scan_cleaning_stats(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, max_bins: int = DEFAULT_SKETCH_BINS):
+    """
+        First pass of the streaming cleaning: read the data chunk by chunk and gather the NA ratio of every
+        column and the approximate median of the numerical columns. Only one chunk and a bounded sketch per
+        column is in memory, independently of the number of rows.
+
+        Params:
+            path: str (csv file, Parquet/Feather file or partitioned dataset)
+            chunk_size: int
+            max_bins: int (size of the median sketch of a column)
+
+        Return:
+            dict: rows, na_ratio (pd.Series), medians (pd.Series of the numerical columns)
+                  and csv_dtypes (numerical columns which have to be read as float in every chunk)
+    """
+    rows = 0
+    na_counts = {}
+    sketches = {}
+    non_numeric = set()
+    float_cols = set()
+    for chunk in storage.iter_chunks(path, chunk_size=chunk_size):
+        rows += len(chunk)
+        chunk_na = chunk.isna()
+        for col, count in chunk_na.sum().items():
+            na_counts[col] = na_counts.get(col, 0) + int(count)
+
+        for col in chunk.columns:
+            series = chunk[col]
+            all_missing = chunk_na[col].all()
+            is_numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+            if col in non_numeric or not (is_numeric or all_missing):
+                non_numeric.add(col)
+                continue
+            if all_missing or pd.api.types.is_float_dtype(series):
+                float_cols.add(col)
+            sketches[col] = _sketch_update(
+                sketches.get(col), series.to_numpy(dtype=np.float64, na_value=np.nan), max_bins
+            )
+
+    numeric_cols = [col for col in na_counts if col not in non_numeric]
+    print(f"[INFO] Scanned {rows} rows, {len(na_counts)} columns ({len(numeric_cols)} numerical)")
+    return {
+        "rows": rows,
+        "na_ratio": pd.Series(na_counts, dtype=np.float64) / max(rows, 1),
+        "medians": pd.Series({col: _sketch_median(sketches.get(col)) for col in numeric_cols}, dtype=np.float64),
+        "csv_dtypes": {col: np.float64 for col in numeric_cols if col in float_cols},
+    }
+
+
+def _write_chunk(chunk: pd.DataFrame, output_path: str, writer):
+    """
+        Append a chunk to the csv or parquet output. Returns the writer of the next chunk
+        (the parquet writer, or True after the first csv chunk)
+    """
+    if not output_path.endswith(".parquet"):
+        chunk.to_csv(output_path, mode="a" if writer else "w", header=not writer, index=False)
+        return True
+    if writer is None:
+        schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+        for i, field in enumerate(schema):
+            if pa.types.is_null(field.type):
+                schema = schema.set(i, field.with_type(pa.string()))
+        writer = pq.ParquetWriter(output_path, schema)
+    writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False))
+    return writer
+
+
+@instrumentation.instrument
+def clean_data_in_chunks(path: str, output_path: str, drop_threshold: float = 0.6, fill_threshold: float = 0.3,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE, max_bins: int = DEFAULT_SKETCH_BINS):
+    """
+        Streaming version of drop_hight_na_columns + fill_na_median for data which does not fit in memory.
+        The first pass gathers the NA ratios and the approximate medians (scan_cleaning_stats), the second
+        pass drops the columns, fills the missing values and writes the output chunk by chunk,
+        so the peak memory depends on the chunk size and not on the number of rows.
+
+        Params:
+            path: str (csv file, Parquet/Feather file or partitioned dataset)
+            output_path: str (.csv or .parquet file)
+            drop_threshold: float (columns with more missing values are dropped)
+            fill_threshold: float (numerical columns with less missing values are filled with the median)
+            chunk_size: int
+            max_bins: int
+
+        Return:
+            dict: the statistics of the first pass with the dropped and the filled columns
+    """
+    stats = scan_cleaning_stats(path, chunk_size, max_bins)
+    columns_to_drop = _columns_to_drop(stats["na_ratio"], drop_threshold)
+    print(f"[INFO] Droping features {columns_to_drop}")
+    numeric_cols = [col for col in stats["medians"].index if col not in columns_to_drop]
+    columns_to_fill = _columns_to_fill(stats["na_ratio"][numeric_cols], fill_threshold)
+    print(f"[INFO] Columns which will be filled with there median: {columns_to_fill}")
+    medians = stats["medians"][columns_to_fill]
+
+    columns = [col for col in stats["na_ratio"].index if col not in columns_to_drop]
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    writer = None
+    for chunk in storage.iter_chunks(path, columns=columns, chunk_size=chunk_size, dtype=stats["csv_dtypes"]):
+        writer = _write_chunk(chunk[columns].fillna(medians), output_path, writer)
+    if isinstance(writer, pq.ParquetWriter):
+        writer.close()
+    print(f"[INFO] Cleaned data saved into {output_path}. Number of rows: {stats['rows']}")
+    return {**stats, "dropped_columns": list(columns_to_drop), "filled_columns": list(columns_to_fill)}
@@ -0,0 +1,259 @@
+# Oszlopok memóriatakarékos típusai: biztonságos downcast, közös p1/p2 kategóriák és újrahasználható séma
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_MAX_UNIQUE_RATIO = 0.5
+DEFAULT_FLOAT_TOLERANCE = 1e-6
+SCHEMA_SUFFIX = ".schema.json"
+INT_DTYPES = ["int8", "int16", "int32", "int64"]
+# a nullable Int needs one more byte per row for its mask, so only the small ones are worth it over float32
+NULLABLE_INT_DTYPES = ["Int8", "Int16"]
+PLAYER_PREFIXES = ("winner_", "loser_", "p1_", "p2_", "w_", "l_")
+
+
+def base_col_name(col: str):
+    """
+        The name of the column without the player prefix (winner_/loser_, w_/l_, p1_/p2_)
+    """
+    for prefix in PLAYER_PREFIXES:
+        if col.startswith(prefix):
+            return col[len(prefix):]
+    return col
+
+
+def group_key(col: str):
+    """
+        The columns of the same stat of the two players (winner_/loser_, w_/l_, p1_/p2_) share their dtype,
+        so they can be compared, subtracted or swapped without casting
+    """
+    base = base_col_name(col)
+    return f"*_{base}" if base != col else col
+
+
+def _numeric_stats(series: pd.Series, float_tolerance: float):
+    """
+        Range, missing values and representability of a numerical column
+    """
+    if pd.api.types.is_integer_dtype(series):
+        valid = series.dropna()
+        return {
+            "integer": True,
+            "low": int(valid.min()) if len(valid) else 0,
+            "high": int(valid.max()) if len(valid) else 0,
+            "has_na": len(valid) < len(series),
+            "float32": bool(len(valid) == 0 or max(abs(int(valid.min())), abs(int(valid.max()))) <= 2 ** 24),
+        }
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = values[~np.isnan(values)]
+    finite = np.isfinite(valid).all()
+    integer = bool(finite and np.array_equal(valid, np.round(valid)))
+    with np.errstate(over="ignore", invalid="ignore"):
+        values_32 = valid.astype(np.float32).astype(np.float64)
+        error = np.abs(values_32 - valid)
+        float32 = bool(((error <= float_tolerance * np.abs(valid)) | (values_32 == valid)).all())
+    return {
+        "integer": integer,
+        "low": float(valid.min()) if integer and len(valid) else 0,
+        "high": float(valid.max()) if integer and len(valid) else 0,
+        "has_na": len(valid) < len(values),
+        "float32": float32,
+    }
+
+
+def _combine_stats(stats: list):
+    return {
+        "integer": all(item["integer"] for item in stats),
+        "low": min(item["low"] for item in stats),
+        "high": max(item["high"] for item in stats),
+        "has_na": any(item["has_na"] for item in stats),
+        "float32": all(item["float32"] for item in stats),
+    }
+
+
+def _fits(dtype: str, low, high):
+    # twice the range, so the sum or difference of two columns (e.g. p1_ - p2_) cannot overflow
+    info = np.iinfo(dtype.lower())
+    return info.min <= 2 * low and 2 * high <= info.max
+
+
+def _dtype_from_stats(stats: dict):
+    """
+        The smallest dtype which holds every value: an int if every value is integer (a small nullable Int
+        if some are missing), float32 if it keeps the values within the tolerance, float64 otherwise
+    """
+    if stats["integer"]:
+        candidates = NULLABLE_INT_DTYPES if stats["has_na"] else INT_DTYPES
+        dtype = next((dtype for dtype in candidates if _fits(dtype, stats["low"], stats["high"])), None)
+        if dtype is not None:
+            return dtype
+    return "float32" if stats["float32"] else "float64"
+
+
+def infer_dtype_schema(df: pd.DataFrame, max_unique_ratio: float = DEFAULT_MAX_UNIQUE_RATIO,
+                       float_tolerance: float = DEFAULT_FLOAT_TOLERANCE):
+    """
+        Infer the compact dtypes of the dataframe. The columns of the same stat of the two players
+        (winner_/loser_, w_/l_, p1_/p2_ prefixes) get the same dtype, the string columns with few distinct
+        values become categoricals with the same categories for the two players.
+
+        Params:
+            df: pd.DataFrame
+            max_unique_ratio: float (string columns with more distinct values per row are kept as object)
+            float_tolerance: float (largest relative error of the float32 conversion)
+
+        Return:
+            dict: {"dtypes": {col: dtype}, "categories": {group: categories}, "groups": {col: group}}
+    """
+    # by position, the engineered data may have duplicated column names
+    groups = {}
+    for i, col in enumerate(df.columns):
+        groups.setdefault(group_key(col), []).append(i)
+
+    schema = {"dtypes": {}, "categories": {}, "groups": {}}
+    for group, positions in groups.items():
+        columns = [df.iloc[:, i] for i in positions]
+        names = [df.columns[i] for i in positions]
+        if all(pd.api.types.is_bool_dtype(values) for values in columns):
+            continue
+        if all(pd.api.types.is_numeric_dtype(values) for values in columns):
+            stats = _combine_stats([_numeric_stats(values, float_tolerance) for values in columns])
+            for col in names:
+                schema["dtypes"][col] = _dtype_from_stats(stats)
+        elif all(pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty") for values in columns):
+            categories = pd.unique(np.concatenate([values.dropna().astype(str).to_numpy() for values in columns]))
+            if len(categories) > max_unique_ratio * len(df) * len(columns):
+                continue
+            schema["categories"][group] = sorted(categories)
+            for col in names:
+                schema["dtypes"][col] = "category"
+                schema["groups"][col] = group
+    return schema
+
+
+def _categorical(values: pd.Series, categories: list):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.set_categories(categories)
+    return pd.Series(pd.Categorical(values, categories=categories), index=values.index, name=values.name)
+
+
+def apply_dtype_schema(df: pd.DataFrame, schema: dict):
+    """
+        Convert the columns of the dataframe to the dtypes of the schema (columns out of the schema are kept).
+        The ints are checked against the actual values, a column which does not fit into the dtype of the
+        schema gets the smallest dtype which holds it. New values of the categoricals are appended to the
+        categories, shared by the two players.
+
+        Params:
+            df: pd.DataFrame
+            schema: dict (made by infer_dtype_schema)
+
+        Return:
+            pd.DataFrame: a new dataframe with the converted columns
+    """
+    categories = {group: list(values) for group, values in schema["categories"].items()}
+    for i, col in enumerate(df.columns):
+        group = schema["groups"].get(col)
+        if group is None:
+            continue
+        values = df.iloc[:, i]
+        values = values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype) else values.dropna()
+        new_values = {str(value) for value in pd.unique(values)} - set(categories[group])
+        categories[group] += sorted(new_values)
+
+    result = df.copy(deep=False)
+    for i, col in enumerate(df.columns):
+        dtype = schema["dtypes"].get(col)
+        values = df.iloc[:, i]
+        if dtype is None:
+            continue
+        if dtype == "category":
+            result.isetitem(i, _categorical(values, categories[schema["groups"][col]]))
+            continue
+        if str(values.dtype) == dtype or not pd.api.types.is_numeric_dtype(values):
+            continue
+        if dtype.lower() in INT_DTYPES:
+            stats = _numeric_stats(values, DEFAULT_FLOAT_TOLERANCE)
+            fits = stats["integer"] and (dtype in NULLABLE_INT_DTYPES or not stats["has_na"])
+            if not fits or not _fits(dtype, stats["low"], stats["high"]):
+                fitting_dtype = _dtype_from_stats(stats)
+                print(f"[INFO] {col} does not fit into {dtype}, {fitting_dtype} is used")
+                dtype = fitting_dtype
+        result.isetitem(i, values.astype(dtype))
+    return result
+
+
+def csv_dtypes(schema: dict, columns: list[str] | None = None):
+    """
+        The dtypes of the schema which are safe to pass to pd.read_csv: the categoricals and the floats.
+        The ints are parsed as int64 / float64 and checked by apply_dtype_schema, as read_csv wraps around
+        the values which do not fit into a small int.
+    """
+    return {
+        col: dtype for col, dtype in schema["dtypes"].items()
+        if dtype in ("category", "float32") and (columns is None or col in columns)
+    }
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame):
+    """
+        Memory usage (deep, MB) and dtype of every column before and after the conversion (same columns
+        in the same order), the largest savings first
+
+        Return:
+            pd.DataFrame
+    """
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str).to_numpy(),
+        "dtype_after": after.dtypes.astype(str).to_numpy(),
+        "memory_before_mb": before.memory_usage(index=False, deep=True).to_numpy() / 1024 ** 2,
+        "memory_after_mb": after.memory_usage(index=False, deep=True).to_numpy() / 1024 ** 2,
+    }, index=before.columns)
+    report["saved_mb"] = report["memory_before_mb"] - report["memory_after_mb"]
+    report["saved_pct"] = report["saved_mb"] / report["memory_before_mb"].replace(0, np.nan) * 100
+    return report.sort_values("saved_mb", ascending=False)
+
+
+def optimize_dtypes(df: pd.DataFrame, schema: dict | None = None, max_unique_ratio: float = DEFAULT_MAX_UNIQUE_RATIO,
+                    float_tolerance: float = DEFAULT_FLOAT_TOLERANCE):
+    """
+        Convert the dataframe to compact dtypes (see infer_dtype_schema) and report the memory per column
+
+        Params:
+            df: pd.DataFrame
+            schema: dict | None (inferred from the dataframe if None)
+            max_unique_ratio: float
+            float_tolerance: float
+
+        Return:
+            tuple[pd.DataFrame, dict, pd.DataFrame]: the converted dataframe, the schema and the memory report
+    """
+    if schema is None:
+        schema = infer_dtype_schema(df, max_unique_ratio, float_tolerance)
+    optimized = apply_dtype_schema(df, schema)
+    report = memory_report(df, optimized)
+    print(f"[INFO] Memory usage: {report['memory_before_mb'].sum():.1f} MB -> {report['memory_after_mb'].sum():.1f} MB")
+    return optimized, schema, report
+
+
+def schema_path(data_path: str):
+    """
+        Path of the schema file next to a csv file or a dataset folder
+    """
+    return data_path.rstrip("/\\") + SCHEMA_SUFFIX
+
+
+def save_dtype_schema(schema: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(schema, f)
+    print(f"[INFO] Dtype schema saved into {path}")
+
+
+def load_dtype_schema(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,141 @@
+# Közelítő névegyeztetés a pontosan nem párosított meccsekhez
+
+import difflib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.utils import player_index
+
+
+def _block_keys(rows: np.ndarray, dates: pd.Series, surnames: dict, week_offsets: tuple):
+    """
+        Blocking keys (week, surname prefix) of every row, one key for every player and week offset
+    """
+    weeks = (dates.to_numpy().astype("datetime64[D]").astype(np.int64) // 7)[rows]
+    blocks = []
+    for side in ("winner", "loser"):
+        for offset in week_offsets:
+            blocks.append(pd.DataFrame({"row": rows, "week": weeks + offset, "prefix": surnames[side + "_prefix"]}))
+    return pd.concat(blocks, ignore_index=True).dropna(subset=["prefix"])
+
+
+def _surnames(df: pd.DataFrame, rows: np.ndarray, normalize, prefix_length: int):
+    """
+        Full length "surname i" keys and the surname prefixes of the winner and the loser of the rows
+    """
+    surnames = {}
+    for side in ("winner", "loser"):
+        keys = normalize(df[side].iloc[rows].reset_index(drop=True), surname_length=None)
+        surnames[side] = keys.to_numpy()
+        surnames[side + "_prefix"] = keys.str[:prefix_length].to_numpy()
+    return surnames
+
+
+def _similarity(key_1, key_2, cache: dict):
+    """
+        Similarity of two "surname i" keys: sequence ratio of the surnames, lowered if the initials differ
+    """
+    if key_1 is None or key_2 is None:
+        return 0.0
+    if (key_1, key_2) not in cache:
+        surname_1, _, initial_1 = key_1.rpartition(" ")
+        surname_2, _, initial_2 = key_2.rpartition(" ")
+        ratio = difflib.SequenceMatcher(None, surname_1, surname_2).ratio()
+        cache[(key_1, key_2)] = 0.8 * ratio + 0.2 * (initial_1 == initial_2)
+    return cache[(key_1, key_2)]
+
+
+def match_unmatched(df1: pd.DataFrame, df2: pd.DataFrame, unmatched_1: np.ndarray, unmatched_2: np.ndarray,
+                    date_col: str = "date", window_days: int = 7, prefix_length: int = 2,
+                    min_score: float = 0.85):
+    """
+        Approximate matching of the rows which were not matched exactly. Candidates are generated with a
+        blocking index on (week of the date, surname prefix of a player), searched in the neighbour weeks too,
+        so every row is compared only with the handful of rows in its blocks and not with every row.
+        The candidates are scored by the name similarity of both players (in both orders) and assigned
+        greedily one to one, best score first.
+
+        Params:
+            df1: pd.DataFrame (match statistics with full names in winner / loser)
+            df2: pd.DataFrame (odds with abbreviated names in winner / loser)
+            unmatched_1: np.ndarray (boolean mask of the unmatched df1 rows)
+            unmatched_2: np.ndarray (boolean mask of the unmatched df2 rows)
+            date_col: str
+            window_days: int (maximal date difference of a match)
+            prefix_length: int (length of the surname prefix in the blocking key)
+            min_score: float (minimal similarity score of a match, between 0 and 1)
+
+        Return:
+            pd.DataFrame: row_1, row_2 (positions in df1 / df2), score and swapped (winner / loser order differs)
+    """
+    rows_1 = np.flatnonzero(unmatched_1)
+    rows_2 = np.flatnonzero(unmatched_2)
+    columns = ["row_1", "row_2", "score", "swapped"]
+    if len(rows_1) == 0 or len(rows_2) == 0:
+        return pd.DataFrame(columns=columns)
+
+    surnames_1 = _surnames(df1, rows_1, player_index.normalize_atp_names, prefix_length)
+    surnames_2 = _surnames(df2, rows_2, player_index.normalize_odds_names, prefix_length)
+    n_weeks = -(-window_days // 7)
+    blocks_1 = _block_keys(np.arange(len(rows_1)), df1[date_col].iloc[rows_1], surnames_1,
+                           tuple(range(-n_weeks, n_weeks + 1)))
+    blocks_2 = _block_keys(np.arange(len(rows_2)), df2[date_col].iloc[rows_2], surnames_2, (0,))
+
+    candidates = blocks_1.merge(blocks_2, on=["week", "prefix"], suffixes=("_1", "_2"))
+    candidates = candidates[["row_1", "row_2"]].drop_duplicates()
+    date_diff = np.abs(
+        df1[date_col].to_numpy()[rows_1[candidates["row_1"]]] - df2[date_col].to_numpy()[rows_2[candidates["row_2"]]]
+    )
+    candidates = candidates[date_diff <= np.timedelta64(window_days, "D")]
+    print(f"[INFO] Fuzzy matching {len(rows_1)} unmatched rows against {len(rows_2)} rows, "
+          f"{len(candidates)} candidate pairs")
+
+    cache = {}
+    scores, swapped = [], []
+    for row_1, row_2 in zip(candidates["row_1"].to_numpy(), candidates["row_2"].to_numpy()):
+        same_order = (_similarity(surnames_1["winner"][row_1], surnames_2["winner"][row_2], cache)
+                      + _similarity(surnames_1["loser"][row_1], surnames_2["loser"][row_2], cache)) / 2
+        swapped_order = (_similarity(surnames_1["winner"][row_1], surnames_2["loser"][row_2], cache)
+                         + _similarity(surnames_1["loser"][row_1], surnames_2["winner"][row_2], cache)) / 2
+        scores.append(max(same_order, swapped_order))
+        swapped.append(swapped_order > same_order)
+    candidates = candidates.assign(score=scores, swapped=swapped)
+    candidates = candidates[candidates["score"] >= min_score].sort_values("score", ascending=False, kind="stable")
+
+    used_1, used_2, matches = set(), set(), []
+    for row_1, row_2, score, is_swapped in candidates.itertuples(index=False):
+        if row_1 in used_1 or row_2 in used_2:
+            continue
+        used_1.add(row_1)
+        used_2.add(row_2)
+        matches.append((rows_1[row_1], rows_2[row_2], score, is_swapped))
+    return pd.DataFrame(matches, columns=columns)
+
+
+def save_match_report(df1: pd.DataFrame, matched_exact: np.ndarray, matched_fuzzy: np.ndarray, report_dir: str):
+    """
+        Save the match rates (match_report.json) and the unmatched rows of df1 (unmatched_rows.csv)
+
+        Params:
+            df1: pd.DataFrame
+            matched_exact: np.ndarray (boolean mask of the exactly matched rows)
+            matched_fuzzy: np.ndarray (boolean mask of the approximately matched rows)
+            report_dir: str
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    n_rows = len(df1)
+    unmatched = ~(matched_exact | matched_fuzzy)
+    report = {
+        "rows": n_rows,
+        "exact_matches": int(matched_exact.sum()),
+        "fuzzy_matches": int(matched_fuzzy.sum()),
+        "unmatched": int(unmatched.sum()),
+        "match_rate": float((n_rows - unmatched.sum()) / n_rows) if n_rows else 0.0,
+    }
+    with open(os.path.join(report_dir, "match_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    df1[unmatched].to_csv(os.path.join(report_dir, "unmatched_rows.csv"), index=False)
+    print(f"[INFO] Match report saved into {report_dir}")
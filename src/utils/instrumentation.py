@@ -0,0 +1,266 @@
+# Futásidő, memória és sorszám mérése lépésenként, JSON naplóval és profilozással
+
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+import psutil
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Environment variables, read at every call so they can be set in a notebook too
+LOG_PATH_ENV = "INSTRUMENTATION_LOG_PATH"          # JSON lines file of the records
+PROFILE_DIR_ENV = "INSTRUMENTATION_PROFILE_DIR"    # a profile dump of every outermost stage is written here
+PROFILER_ENV = "INSTRUMENTATION_PROFILER"          # cprofile (default) or pyinstrument
+TRACEMALLOC_ENV = "INSTRUMENTATION_TRACEMALLOC"    # 1: trace the Python allocations (slower)
+
+_records = []
+_lock = threading.Lock()
+_local = threading.local()
+_process = psutil.Process()
+_profile_count = 0
+
+
+def _rss_mb():
+    return _process.memory_info().rss / 1024 ** 2
+
+
+def _peak_rss_mb():
+    """
+        Peak resident memory of the process so far (None if the platform does not report it)
+    """
+    peak = getattr(_process.memory_info(), "peak_wset", None)
+    if peak is not None:
+        return peak / 1024 ** 2
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return max_rss / 1024 ** 2 if sys.platform == "darwin" else max_rss / 1024
+
+
+def _frame_info(value):
+    """
+        Rows and (shallow) memory usage of the first dataframe in the value
+    """
+    if isinstance(value, (tuple, list)):
+        value = next((item for item in value if isinstance(item, pd.DataFrame)), None)
+    if not isinstance(value, pd.DataFrame):
+        return None, None
+    return len(value), round(value.memory_usage(index=True, deep=False).sum() / 1024 ** 2, 3)
+
+
+def _start_profiler(stage: str):
+    if os.getenv(PROFILER_ENV, "cprofile").lower() == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("[ERROR] pyinstrument is not installed, cProfile is used")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, stage: str, profile_dir: str):
+    global _profile_count
+    with _lock:
+        _profile_count += 1
+        count = _profile_count
+    os.makedirs(profile_dir, exist_ok=True)
+    file_name = os.path.join(profile_dir, f"{stage}_{os.getpid()}_{count}")
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        profiler.dump_stats(file_name + ".prof")
+        return file_name + ".prof"
+    profiler.stop()
+    with open(file_name + ".html", "w", encoding="utf-8") as f:
+        f.write(profiler.output_html())
+    return file_name + ".html"
+
+
+def _write_record(record: dict):
+    log_path = os.getenv(LOG_PATH_ENV)
+    with _lock:
+        _records.append(record)
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+@contextmanager
+def stage(name: str, data_in=None):
+    """
+        Measure a block of code: wall time, CPU time, peak RSS of the process, tracemalloc peak (if the
+        INSTRUMENTATION_TRACEMALLOC environment variable is 1, process wide, so the concurrent stages of other
+        threads are included), input and output rows and dataframe memory.
+        The record is kept in memory for summary_table and appended to the INSTRUMENTATION_LOG_PATH JSON lines
+        file if it is set. If INSTRUMENTATION_PROFILE_DIR is set, the outermost stages are profiled into it.
+        The yielded dict can receive the output: record["output"] = df.
+
+        Params:
+            name: str
+            data_in: the input dataframe (optional)
+
+        Usage:
+            with instrumentation.stage("clean", df) as record:
+                record["output"] = data_utils.fill_na_median(df)
+    """
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    depth = len(stack)
+    frame = {"output": None, "tracemalloc_peak": 0}
+
+    trace = os.getenv(TRACEMALLOC_ENV) == "1"
+    if trace and not tracemalloc.is_tracing():
+        # kept on for the rest of the process, the stages of the other threads may be measured too
+        tracemalloc.start()
+    if trace:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]["tracemalloc_peak"] = max(stack[-1]["tracemalloc_peak"], peak)
+        tracemalloc.reset_peak()
+        frame["tracemalloc_start"] = current
+
+    profile_dir = os.getenv(PROFILE_DIR_ENV)
+    profiler = _start_profiler(name) if profile_dir and depth == 0 else None
+
+    stack.append(frame)
+    start_time = datetime.now(timezone.utc).isoformat()
+    wall_start, cpu_start, rss_start = time.perf_counter(), time.process_time(), _rss_mb()
+    error = None
+    try:
+        yield frame
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        stack.pop()
+        record = {
+            "stage": name,
+            "start": start_time,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "rss_mb": round(_rss_mb(), 3),
+            "rss_delta_mb": round(_rss_mb() - rss_start, 3),
+            "peak_rss_mb": _peak_rss_mb(),
+            "tracemalloc_peak_mb": None,
+            "rows_in": None, "memory_in_mb": None, "rows_out": None, "memory_out_mb": None,
+            "depth": depth,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "error": error,
+        }
+        if trace:
+            peak = max(frame["tracemalloc_peak"], tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]["tracemalloc_peak"] = max(stack[-1]["tracemalloc_peak"], peak)
+            record["tracemalloc_peak_mb"] = round(max(peak - frame["tracemalloc_start"], 0) / 1024 ** 2, 3)
+        record["rows_in"], record["memory_in_mb"] = _frame_info(data_in)
+        record["rows_out"], record["memory_out_mb"] = _frame_info(frame["output"])
+        if profiler is not None:
+            record["profile"] = _stop_profiler(profiler, name, profile_dir)
+        _write_record(record)
+
+
+def instrument(func=None, *, name: str | None = None):
+    """
+        Decorator measuring every call of the function with stage(). The stage name is <module>.<function>
+        by default, the input is the first dataframe argument and the output is the return value.
+
+        Usage:
+            @instrumentation.instrument
+            def fill_na_median(df, threshold=0.3): ...
+    """
+    if func is None:
+        return functools.partial(instrument, name=name)
+    stage_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        data_in = next((arg for arg in list(args) + list(kwargs.values()) if isinstance(arg, pd.DataFrame)), None)
+        with stage(stage_name, data_in) as record:
+            result = func(*args, **kwargs)
+            record["output"] = result
+        return result
+    return wrapper
+
+
+def get_records():
+    """
+        The records measured so far in this process
+
+        Return:
+            list[dict]
+    """
+    with _lock:
+        return list(_records)
+
+
+def clear_records():
+    with _lock:
+        _records.clear()
+
+
+def summary_table(records: list | None = None):
+    """
+        Summary of the records per stage, the hottest stages first: number of calls, total and max wall time,
+        total CPU time, the largest RSS growth and tracemalloc peak, total input and output rows
+
+        Params:
+            records: list | None (the records of this process if None, e.g. the lines of a JSON log)
+
+        Return:
+            pd.DataFrame
+    """
+    records = get_records() if records is None else records
+    if not records:
+        return pd.DataFrame()
+    df = pd.DataFrame(records)
+    summary = df.groupby("stage").agg(
+        calls=("wall_s", "size"),
+        wall_s=("wall_s", "sum"),
+        max_wall_s=("wall_s", "max"),
+        cpu_s=("cpu_s", "sum"),
+        max_rss_delta_mb=("rss_delta_mb", "max"),
+        tracemalloc_peak_mb=("tracemalloc_peak_mb", "max"),
+        rows_in=("rows_in", "sum"),
+        rows_out=("rows_out", "sum"),
+    )
+    summary["wall_pct"] = summary["wall_s"] / df.loc[df["depth"] == 0, "wall_s"].sum() * 100
+    return summary.sort_values("wall_s", ascending=False)
+
+
+def read_records(log_path: str):
+    """
+        Records of a JSON lines log (e.g. to summarize the stages of several runs or processes)
+    """
+    with open(log_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def print_summary(records: list | None = None):
+    summary = summary_table(records)
+    if summary.empty:
+        print("[INFO] No instrumented stages")
+        return
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.float_format", "{:.3f}".format):
+        print(f"[INFO] Stage summary\n{summary}")
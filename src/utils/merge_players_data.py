@@ -1,26 +1,149 @@
+import os
+
+import numpy as np
 import pandas as pd 
-from tqdm import tqdm
-tqdm.pandas(desc="Merge players data with there match odds")
-
-def _form_odds(name): 
-    if pd.isnull(name):
-        return None
-    parts = name.replace(".", "").replace("-", "").replace("'", "").split()
-    if(len(parts) > 2):
-        return None
-    
-    return f"{parts[0][:3].lower()} {parts[1].lower()}"
-
-def _form_atp(name): 
-    if pd.isnull(name):
-        return None
-    parts = name.replace(".", "").replace("-", "").replace("'", "").split()
-    if(len(parts) > 2):
-        return None
-    
-    return f"{parts[1][:3].lower()} {parts[0][0].lower()}"
-
-def merge_on_name_and_date(df1: pd.DataFrame, df2: pd.DataFrame, date_col: str = "date"):
+
+from src.utils import fuzzy_match, instrumentation, player_index
+
+def _add_key_codes(df1: pd.DataFrame, df2: pd.DataFrame):
+    """
+        Add integer codes of the winner / loser keys (shared by df1 and df2, -1 for missing keys),
+        so the pairs are compared and joined on integers instead of strings
+    """
+    key_cols = ["winner_key", "loser_key"]
+    keys = pd.concat([df1[key_cols], df2[key_cols]], ignore_index=True)
+    codes, _ = pd.factorize(keys.to_numpy().ravel())
+    codes = codes.reshape(-1, 2)
+    df1["_winner_code"], df1["_loser_code"] = codes[:len(df1), 0], codes[:len(df1), 1]
+    df2["_winner_code"], df2["_loser_code"] = codes[len(df1):, 0], codes[len(df1):, 1]
+
+def _fix_winner_loser_order(df1: pd.DataFrame, df2: pd.DataFrame, date_col: str):
+    """
+        Swap the winner and loser (name, key and key code) of the df2 rows where the pair of players is found
+        in df1 on the same date, but df1 has the other player as the winner. One join on the order independent
+        pair key (date, smaller code, bigger code) and a boolean mask replace the row by row comparison.
+    """
+    def _pairs(df):
+        winner_code = df["_winner_code"].to_numpy()
+        loser_code = df["_loser_code"].to_numpy()
+        return pd.DataFrame({
+            date_col: df[date_col].to_numpy(),
+            "_code_1": np.minimum(winner_code, loser_code),
+            "_code_2": np.maximum(winner_code, loser_code),
+        })
+
+    correct_winners = _pairs(df1)
+    correct_winners["_correct_winner"] = df1["_winner_code"].to_numpy()
+    correct_winners = correct_winners.drop_duplicates(subset=[date_col, "_code_1", "_code_2"], keep="last")
+    correct_winner = _pairs(df2).merge(correct_winners, on=[date_col, "_code_1", "_code_2"], how="left")
+    correct_winner = correct_winner["_correct_winner"].to_numpy()
+
+    # -1 is a missing key, the legacy dict lookup never swapped to a missing winner
+    swap = (correct_winner >= 0) & (correct_winner != df2["_winner_code"].to_numpy())
+    return _swap_winner_loser(df2, swap)
+
+def _swap_winner_loser(df2: pd.DataFrame, swap: np.ndarray):
+    """
+        Swap the winner and loser name, key and key code of the rows of the mask
+    """
+    if swap.any():
+        for col_1, col_2 in (("_winner_code", "_loser_code"), ("winner_key", "loser_key"), ("winner", "loser")):
+            values_1 = df2[col_1].to_numpy(copy=True)
+            values_2 = df2[col_2].to_numpy(copy=True)
+            df2[col_1] = np.where(swap, values_2, values_1)
+            df2[col_2] = np.where(swap, values_1, values_2)
+    print(f"[INFO] Swapped winner and loser in {swap.sum()} rows")
+    return df2
+
+def _pair_frame(df: pd.DataFrame, date_col: str):
+    """
+        Order independent pair codes, date and position of the rows where both keys are known
+    """
+    winner_code = df["_winner_code"].to_numpy()
+    loser_code = df["_loser_code"].to_numpy()
+    pairs = pd.DataFrame({
+        "_code_1": np.minimum(winner_code, loser_code),
+        "_code_2": np.maximum(winner_code, loser_code),
+        date_col: df[date_col].to_numpy(),
+        "_row": np.arange(len(df)),
+    })
+    return pairs[pairs["_code_1"] >= 0]
+
+def _asof_match(df1: pd.DataFrame, df2: pd.DataFrame, date_col: str, date_window: int):
+    """
+        Match every df2 row to the df1 row of the same (order independent) player pair with the latest date
+        on or before the df2 date, at most date_window days before it (merge_asof: one sort by date and a binary
+        search per pair). If the pair has several df1 rows on that date (e.g. round robin and final of the same
+        tournament), the n-th df2 row of the pair and date gets the n-th df1 row.
+
+        Return:
+            tuple[np.ndarray, np.ndarray]: the matched df1 position of every df2 row (-1 if none)
+                                           and the date offset in days (NaN if none)
+    """
+    pairs_1 = _pair_frame(df1, date_col).rename(columns={date_col: "_date_1", "_row": "_row_1"})
+    pairs_1["_occurrence"] = pairs_1.groupby(["_code_1", "_code_2", "_date_1"], sort=False).cumcount()
+    pairs_2 = _pair_frame(df2, date_col).rename(columns={"_row": "_row_2"})
+
+    matched = pd.merge_asof(
+        pairs_2.sort_values(date_col, kind="stable"),
+        pairs_1.sort_values("_date_1", kind="stable"),
+        left_on=date_col,
+        right_on="_date_1",
+        by=["_code_1", "_code_2"],
+        direction="backward",
+        tolerance=pd.Timedelta(days=date_window),
+    )
+    matched = matched[matched["_row_1"].notna()]
+
+    # merge_asof gives the last df1 row of the pair and date, its occurrence + 1 is the number of candidates
+    occurrence = matched.groupby(["_code_1", "_code_2", "_date_1"], sort=False).cumcount().to_numpy()
+    occurrence = np.minimum(occurrence, matched["_occurrence"].to_numpy().astype(int))
+    keys_1 = pd.MultiIndex.from_frame(pairs_1[["_code_1", "_code_2", "_date_1", "_occurrence"]])
+    keys = pd.MultiIndex.from_arrays([matched["_code_1"], matched["_code_2"], matched["_date_1"], occurrence])
+
+    rows_1 = np.full(len(df2), -1)
+    offsets = np.full(len(df2), np.nan)
+    rows_2 = matched["_row_2"].to_numpy()
+    rows_1[rows_2] = pairs_1["_row_1"].to_numpy()[keys_1.get_indexer(keys)]
+    offsets[rows_2] = (matched[date_col] - matched["_date_1"]).dt.days.to_numpy()
+    return rows_1, offsets
+
+def _print_date_offsets(offsets: np.ndarray, report_dir: str | None):
+    """
+        Distribution of the date offsets (df2 date - df1 date) of the as-of matches
+    """
+    distribution = pd.Series(offsets[~np.isnan(offsets)].astype(int), name="days").value_counts().sort_index()
+    distribution = distribution.rename_axis("offset_days").rename("rows")
+    summary = ", ".join(f"{offset}: {rows}" for offset, rows in distribution.items())
+    print(f"[INFO] Date offsets of the as-of matches (days: rows): {summary}")
+    if report_dir is not None:
+        os.makedirs(report_dir, exist_ok=True)
+        distribution.to_csv(os.path.join(report_dir, "date_offsets.csv"))
+
+def _apply_fuzzy_matches(df1: pd.DataFrame, df2: pd.DataFrame, matches: pd.DataFrame, join_cols: list[str]):
+    """
+        Copy the join keys of the matched df1 rows into their approximately matched df2 rows (and swap the
+        winner / loser names where the order differs), so the final merge joins them as well
+    """
+    if len(matches) == 0:
+        return df2
+    rows_1 = matches["row_1"].to_numpy(dtype=int)
+    rows_2 = matches["row_2"].to_numpy(dtype=int)
+    for col in join_cols:
+        values = df2[col].to_numpy(copy=True)
+        values[rows_2] = df1[col].to_numpy()[rows_1]
+        df2[col] = values
+
+    swapped_rows = rows_2[matches["swapped"].to_numpy(dtype=bool)]
+    winners = df2["winner"].to_numpy(copy=True)
+    losers = df2["loser"].to_numpy(copy=True)
+    winners[swapped_rows], losers[swapped_rows] = losers[swapped_rows], winners[swapped_rows]
+    df2["winner"], df2["loser"] = winners, losers
+    return df2
+
+@instrumentation.instrument
+def merge_on_name_and_date(df1: pd.DataFrame, df2: pd.DataFrame, date_col: str = "date", fuzzy: bool = False,
+                           report_dir: str | None = None, date_window: int | None = None):
     """
     Merge two tennis match datasets based on normalized player names and match dates.
     Handles swapped winner/loser order in the odds dataset (df2).
@@ -29,6 +152,12 @@ def merge_on_name_and_date(df1: pd.DataFrame, df2: pd.DataFrame, date_col: str =
         df1 (pd.DataFrame): Match statistics with full player names.
         df2 (pd.DataFrame): Odds data with abbreviated player names.
         date_col (str): Name of the date column (default: "date").
+        fuzzy (bool): Match the rows without exact match approximately (see fuzzy_match.match_unmatched).
+        report_dir (str | None): Save the match rates and the unmatched df1 rows into this folder.
+        date_window (int | None): As-of join instead of an exact date match: a df2 row is matched to the df1 row
+            of the same player pair with the latest date on or before it, at most date_window days earlier
+            (e.g. tourney_date of the stats and the actual match date of the odds). The df2 date is kept
+            as <date_col>_df2 and the distribution of the date offsets is reported.
 
     Returns:
         pd.DataFrame: Merged DataFrame containing matches with aligned names and dates.
@@ -39,76 +168,128 @@ def merge_on_name_and_date(df1: pd.DataFrame, df2: pd.DataFrame, date_col: str =
     df1.columns = df1.columns.str.lower()
     df2.columns = df2.columns.str.lower()
 
-    # Normalize the keys in the df1 (players games stas)
-    df1["winner_key"] = df1["winner"].apply(_form_atp)
-    df1["loser_key"] = df1["loser"].apply(_form_atp)
-    df1[date_col] = pd.to_datetime(df1[date_col], format="%Y%m%d")
-
     # Normalize the keys in the df2 (odds)
-    df2["winner_key"] = df2["winner"].apply(_form_odds)
-    df2["loser_key"] = df2["loser"].apply(_form_odds)
+    df2["winner_key"] = player_index.normalize_odds_names(df2["winner"])
+    df2["loser_key"] = player_index.normalize_odds_names(df2["loser"])
     df2[date_col] = pd.to_datetime(df2[date_col], format="%Y-%m-%d")
 
-    match_key_dict = {
-        (row[date_col], frozenset([row["winner_key"], row["loser_key"]])): row["winner_key"]
-        for _, row in df1.iterrows()
-    }
-    def fix_order(row):
-        match_key = (row[date_col], frozenset([row["winner_key"], row["loser_key"]]))
-        correct_winner = match_key_dict.get(match_key)
-
-        if correct_winner is not None and row["winner_key"] != correct_winner:
-            # swap keys and original names
-            row["winner_key"], row["loser_key"] = row["loser_key"], row["winner_key"]
-            row["winner"], row["loser"] = row["loser"], row["winner"]
-        return row
-    # Apply fix_order with progress bar
-    df2 = df2.progress_apply(fix_order, axis=1)
-
-    # Merge on date and normalized names
+    # Normalize the keys in the df1 (players games stas), multi-token names are resolved with the odds keys
+    known_keys = set(df2["winner_key"].dropna()) | set(df2["loser_key"].dropna())
+    df1["winner_key"] = player_index.normalize_atp_names(df1["winner"], known_keys)
+    df1["loser_key"] = player_index.normalize_atp_names(df1["loser"], known_keys)
+    df1[date_col] = pd.to_datetime(df1[date_col], format="%Y%m%d")
+    _add_key_codes(df1, df2)
+
+    if date_window is not None:
+        # Match every df2 row to a df1 row, then fix the swapped order and join on the df1 row position
+        rows_1, offsets = _asof_match(df1, df2, date_col, date_window)
+        correct_winner = np.where(rows_1 >= 0, df1["_winner_code"].to_numpy()[rows_1], -1)
+        df2 = _swap_winner_loser(df2, (rows_1 >= 0) & (correct_winner != df2["_winner_code"].to_numpy()))
+        df1["_row_1"], df2["_row_1"] = np.arange(len(df1)), rows_1
+        _print_date_offsets(offsets, report_dir)
+        join_cols = ["_row_1"]
+        matched_exact = np.isin(np.arange(len(df1)), rows_1)
+        unmatched_2 = rows_1 < 0
+    else:
+        # Fix the swapped winner / loser order of df2, df1 gives the correct winner of the pair
+        df2 = _fix_winner_loser_order(df1, df2, date_col)
+        join_cols = [date_col, "_winner_code", "_loser_code"]
+        keys_1 = pd.MultiIndex.from_frame(df1[join_cols])
+        keys_2 = pd.MultiIndex.from_frame(df2[join_cols])
+        matched_exact = keys_1.isin(keys_2)
+        unmatched_2 = ~keys_2.isin(keys_1)
+
+    # Report the exact matches and optionally match the rest approximately
+    matched_fuzzy = np.zeros(len(df1), dtype=bool)
+    match_type = "Exactly" if date_window is None else "As-of"
+    print(f"[INFO] {match_type} matched rows: {matched_exact.sum()} / {len(df1)} ({matched_exact.mean() * 100:.2f}%)")
+    if fuzzy:
+        matches = fuzzy_match.match_unmatched(df1, df2, ~matched_exact, unmatched_2, date_col)
+        df2 = _apply_fuzzy_matches(df1, df2, matches, join_cols)
+        matched_fuzzy[matches["row_1"].to_numpy(dtype=int)] = True
+        print(f"[INFO] Fuzzy matched rows: {matched_fuzzy.sum()}, unmatched rows: {(~(matched_exact | matched_fuzzy)).sum()}")
+    if report_dir is not None:
+        fuzzy_match.save_match_report(
+            df1.drop(columns=["_winner_code", "_loser_code", "_row_1"], errors="ignore"), matched_exact,
+            matched_fuzzy, report_dir
+        )
+
+    if date_window is not None:
+        merged = pd.merge(
+            df1,
+            df2.drop(columns=["winner_key", "loser_key", "_winner_code", "_loser_code"])
+               .rename(columns={date_col: f"{date_col}_df2"}),
+            on="_row_1",
+            suffixes=("_df1", "_df2"),
+            how="left",
+        )
+        return merged.drop(columns=["_row_1", "_winner_code", "_loser_code"])
+
+    # Merge on date and the integer codes of the normalized names
     merged = pd.merge(
         df1,
-        df2,
-        on=[date_col, "winner_key", "loser_key"],
+        df2.drop(columns=["winner_key", "loser_key"]),
+        on=[date_col, "_winner_code", "_loser_code"],
         suffixes=("_df1", "_df2"),
         how="left",
     )
+    merged = merged.drop(columns=["_winner_code", "_loser_code"])
     return merged
 
 
-def merge_players_to_matches(players_df, original_df):
+def _take_with_missing(series: pd.Series, rows: np.ndarray):
     """
-        Merge the players data back together player1 vs player2 based on ther tourney_id, match_num, player_name and tourney_date
+        Take the values of the rows, -1 gives a missing value (ints are upcasted to float only if needed)
     """
-    players_df = players_df.drop_duplicates(subset=['tourney_id', 'match_num', 'player_name', 'tourney_date'])
+    values = series.array
+    if isinstance(values, pd.arrays.NumpyExtensionArray):
+        values = values.to_numpy()
+    return pd.api.extensions.take(values, rows, allow_fill=True)
 
-    original_df['tourney_date'] = pd.to_datetime(original_df['tourney_date'])
-    players_df['tourney_date'] = pd.to_datetime(players_df['tourney_date'])
+@instrumentation.instrument
+def merge_players_to_matches(players_df, original_df):
+    """
+        Merge the players data back together player1 vs player2 based on ther tourney_id, match_num and player id
+        (player_name if the id columns are missing).
+
+        Both sides are attached in one pass: the (tourney, match_num, player) keys are turned into integer codes,
+        the row of the winner and the loser is looked up once and every stat column is taken by these positions.
+        The inputs are not modified and the wide frame is built only once. The match level columns which are
+        already in original_df (surface, round, score, winner_rank_points, ...) are not duplicated.
+    """
+    if "id" in players_df.columns and {"winner_id", "loser_id"} <= set(original_df.columns):
+        player_col, winner_col, loser_col = "id", "winner_id", "loser_id"
+    else:
+        player_col, winner_col, loser_col = "player_name", "winner_name", "loser_name"
 
     # Csak a szükséges oszlopokat tartjuk meg players_df-ben
     id_cols = ['tourney_id', 'match_num', 'player_name', 'tourney_date']
-    stat_cols = [col for col in players_df.columns if col not in id_cols + ['id', 'hand', 'ioc', 'ht', 'age']]
-    players_df_reduced = players_df[id_cols + stat_cols]
+    stat_cols = [
+        col for col in players_df.columns
+        if col not in id_cols + ['id', 'hand', 'ioc', 'ht', 'age'] and col not in original_df.columns
+    ]
 
+    # Integer codes of the tourney ids, shared by the two frames
+    tourney_codes, _ = pd.factorize(pd.concat([players_df['tourney_id'], original_df['tourney_id']], ignore_index=True))
+    player_tourney, match_tourney = tourney_codes[:len(players_df)], tourney_codes[len(players_df):]
 
-    # Winner merge
-    merged = original_df.merge(
-        players_df_reduced,
-        left_on=['tourney_id', 'match_num', 'winner_name', 'tourney_date'],
-        right_on=['tourney_id', 'match_num', 'player_name', 'tourney_date'],
-        how='left'
-    ).rename(columns={col: f'winner_{col}' for col in stat_cols})
+    player_keys = pd.MultiIndex.from_arrays([player_tourney, players_df['match_num'].to_numpy(), players_df[player_col].to_numpy()])
+    unique_rows = np.flatnonzero(~player_keys.duplicated())
+    player_keys = player_keys[unique_rows]
 
-    merged = merged.drop(columns=['player_name'])
+    new_cols = {}
+    for side, side_col in (("winner", winner_col), ("loser", loser_col)):
+        match_keys = pd.MultiIndex.from_arrays([match_tourney, original_df['match_num'].to_numpy(), original_df[side_col].to_numpy()])
+        positions = player_keys.get_indexer(match_keys)
+        rows = np.where(positions >= 0, unique_rows[positions], -1)
+        for col in stat_cols:
+            # e.g. rank_points -> winner_rank_points is already in the match data
+            if f"{side}_{col}" not in original_df.columns:
+                new_cols[f"{side}_{col}"] = _take_with_missing(players_df[col], rows)
 
-    # Loser merge
-    merged = merged.merge(
-        players_df_reduced,
-        left_on=['tourney_id', 'match_num','loser_name', 'tourney_date'],
-        right_on=['tourney_id', 'match_num', 'player_name', 'tourney_date'],
-        how='left'
-    ).rename(columns={col: f'loser_{col}' for col in stat_cols})
-
-    merged = merged.drop(columns=['player_name'])
+    columns = {col: original_df[col].array for col in original_df.columns}
+    columns.update(new_cols)
+    merged = pd.DataFrame(columns)
+    merged['tourney_date'] = pd.to_datetime(merged['tourney_date'])
     print(f"[INFO] Successfully merged players to the match")
-    return merged
\ No newline at end of file
+    return merged
@@ -0,0 +1,277 @@
+# Lépések DAG-ként futtatása, tartalom alapú gyorsítótárral és párhuzamos ágakkal
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from src.utils import instrumentation, profile_utils
+
+
+DEFAULT_MAX_WORKERS = 2
+HASH_BLOCK_SIZE = 1 << 20
+# the modules of this package are part of the code version of a stage
+SOURCE_PACKAGE = "src"
+
+
+def make_stage(name: str, func, deps: list | None = None, params: dict | None = None, modules: list | None = None,
+               volatile: bool = False, outputs: list | None = None):
+    """
+        Definition of a pipeline stage. The stage is called as func(*outputs of deps, **params).
+
+        Params:
+            name: str
+            func: callable
+            deps: list | None (names of the stages whose outputs are the inputs of this one)
+            params: dict | None (JSON serializable parameters, part of the cache key)
+            modules: list | None (modules whose source is part of the code version, besides func itself and
+                                  the project modules used by it, see code_version)
+            volatile: bool (the stage reads an external source, so it always runs and its output is keyed
+                            by its content, e.g. the incremental downloads)
+            outputs: list | None (files written by the stage, the stage runs again if one is missing)
+
+        Return:
+            dict
+    """
+    return {
+        "name": name,
+        "func": func,
+        "deps": list(deps or []),
+        "params": dict(params or {}),
+        "modules": list(modules or []),
+        "volatile": volatile,
+        "outputs": list(outputs or []),
+    }
+
+
+def _source_module(obj):
+    """
+        The module of the object (the object itself for a module) if it is part of the project sources
+    """
+    module = obj if inspect.ismodule(obj) else inspect.getmodule(obj)
+    if module is not None and module.__name__.split(".")[0] == SOURCE_PACKAGE:
+        return module
+    return None
+
+
+def _referenced_modules(func):
+    """
+        The project modules of the globals used by the function (and by its nested functions / lambdas)
+    """
+    func = inspect.unwrap(func)
+    names, codes = set(), [func.__code__]
+    while codes:
+        code = codes.pop()
+        names.update(code.co_names)
+        codes.extend(const for const in code.co_consts if inspect.iscode(const))
+    modules = (_source_module(func.__globals__[name]) for name in names if name in func.__globals__)
+    return [module for module in modules if module is not None]
+
+
+def _module_closure(modules: list):
+    """
+        The modules and the project modules imported by them, transitively (whole modules or names from them)
+    """
+    closure, stack = {}, list(modules)
+    while stack:
+        module = stack.pop()
+        if module.__name__ in closure:
+            continue
+        closure[module.__name__] = module
+        for value in list(vars(module).values()):
+            imported = _source_module(value) if inspect.ismodule(value) or callable(value) else None
+            if imported is not None and imported.__name__ not in closure:
+                stack.append(imported)
+    return [closure[name] for name in sorted(closure)]
+
+
+def code_version(stage: dict):
+    """
+        Hash of the source code of the stage function, of the project modules used by it and of the listed
+        modules, together with every project module imported by them (e.g. merge_players_data -> player_index,
+        fuzzy_match), so a change in a helper module runs the stage again
+    """
+    digest = hashlib.sha256(inspect.getsource(stage["func"]).encode())
+    for module in _module_closure(_referenced_modules(stage["func"]) + stage["modules"]):
+        digest.update(module.__name__.encode())
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()
+
+
+def _stage_key(stage: dict, input_hashes: list):
+    payload = json.dumps(
+        [stage["name"], code_version(stage), stage["params"], input_hashes], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _content_hash(output):
+    """
+        Hash of the output of a volatile stage: the content of the file for a path, the fingerprint
+        of a dataframe, the pickled bytes otherwise
+    """
+    if isinstance(output, str) and os.path.isfile(output):
+        digest = hashlib.sha256()
+        with open(output, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    if isinstance(output, pd.DataFrame):
+        return profile_utils.dataset_fingerprint(output)
+    return hashlib.sha256(pickle.dumps(output)).hexdigest()
+
+
+def _cache_file(cache_dir: str, name: str, key: str):
+    return os.path.join(cache_dir, name, f"{key}.pkl")
+
+
+def _save_output(output, cache_file: str):
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_file = cache_file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file)
+
+
+def _load_output(cache_file: str):
+    with open(cache_file, "rb") as f:
+        return pickle.load(f)
+
+
+def _run_stage(stage: dict, inputs: list):
+    with instrumentation.stage(f"pipeline.{stage['name']}", inputs) as record:
+        record["output"] = stage["func"](*inputs, **stage["params"])
+    return record["output"]
+
+
+def _select_stages(stages: list, targets: list | None):
+    """
+        The stages needed for the targets (all stages if None) in topological order
+    """
+    by_name = {stage["name"]: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Stage names must be unique")
+    for stage in stages:
+        unknown = [dep for dep in stage["deps"] if dep not in by_name]
+        if unknown:
+            raise ValueError(f"Stage {stage['name']} depends on unknown stages {unknown}")
+
+    order, state = [], {}
+
+    def _visit(name):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"The pipeline has a cycle at stage {name}")
+        state[name] = "visiting"
+        for dep in by_name[name]["deps"]:
+            _visit(dep)
+        state[name] = "done"
+        order.append(by_name[name])
+
+    for name in targets or by_name:
+        if name not in by_name:
+            raise ValueError(f"Unknown stage {name}")
+        _visit(name)
+    return order
+
+
+def _descendants(stages: list, names: set):
+    names = set(names)
+    for stage in stages:
+        if names & set(stage["deps"]):
+            names.add(stage["name"])
+    return names
+
+
+def run_pipeline(stages: list, cache_dir: str, targets: list | None = None, force: list | None = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS):
+    """
+        Run the stages needed for the targets. The output of every stage is cached on disk (cache_dir/<stage>/<key>.pkl),
+        keyed by the hash of its parameters, its code version and the hashes of its inputs, so only the stages
+        whose key changed (or whose output files are missing) run again. The stages whose inputs are ready run
+        in parallel in a thread pool, so independent branches (e.g. the ATP and the odds downloads) overlap.
+        An output is kept in memory only until the stages depending on it have finished.
+
+        Params:
+            stages: list (made by make_stage)
+            cache_dir: str
+            targets: list | None (names of the stages to build, all stages if None)
+            force: list | None (names of the stages to run again with the stages depending on them)
+            max_workers: int
+
+        Return:
+            dict: stage name -> {"key", "status" ("run" or "cached")}
+    """
+    order = _select_stages(stages, targets)
+    forced = _descendants(order, force or [])
+    target_names = set(targets or [stage["name"] for stage in order])
+    dependents = {stage["name"]: 0 for stage in order}
+    for stage in order:
+        for dep in stage["deps"]:
+            dependents[dep] += 1
+
+    results, outputs, hashes = {}, {}, {}
+    pending = list(order)
+
+    def _input(name):
+        if name not in outputs:
+            outputs[name] = _load_output(_cache_file(cache_dir, name, results[name]["key"]))
+        return outputs[name]
+
+    def _release(stage):
+        for dep in stage["deps"]:
+            dependents[dep] -= 1
+            if dependents[dep] == 0 and dep not in target_names:
+                outputs.pop(dep, None)
+
+    def _finish(stage, key, status, output=None):
+        results[stage["name"]] = {"key": key, "status": status}
+        hashes[stage["name"]] = _content_hash(output) if stage["volatile"] else key
+        if status == "run":
+            outputs[stage["name"]] = output
+            if not stage["volatile"]:
+                _save_output(output, _cache_file(cache_dir, stage["name"], key))
+        print(f"[INFO] Stage {stage['name']}: {status} (key {key[:12]})")
+        _release(stage)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        while True:
+            ready = [stage for stage in pending if all(dep in results for dep in stage["deps"])]
+            for stage in ready:
+                pending.remove(stage)
+                key = _stage_key(stage, [hashes[dep] for dep in stage["deps"]])
+                is_cached = (
+                    not stage["volatile"]
+                    and stage["name"] not in forced
+                    and os.path.isfile(_cache_file(cache_dir, stage["name"], key))
+                    and all(os.path.exists(path) for path in stage["outputs"])
+                )
+                if is_cached:
+                    _finish(stage, key, "cached")
+                    continue
+                print(f"[INFO] Stage {stage['name']}: running")
+                inputs = [_input(dep) for dep in stage["deps"]]
+                futures[executor.submit(_run_stage, stage, inputs)] = (stage, key)
+            if ready and not futures:
+                continue
+            if not futures:
+                break
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, key = futures.pop(future)
+                _finish(stage, key, "run", future.result())
+    return results
+
+
+def load_stage_output(cache_dir: str, name: str, key: str):
+    """
+        Output of a stage from the cache (key from the result of run_pipeline)
+    """
+    return _load_output(_cache_file(cache_dir, name, key))
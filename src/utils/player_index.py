@@ -0,0 +1,215 @@
+# Játékos azonosító index (név -> player_id)
+
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+# Lowercase words which start the surname in a multi-token full name (e.g. Juan Martin Del Potro)
+SURNAME_PARTICLES = {"da", "de", "del", "della", "der", "di", "dos", "du", "el", "la", "le", "van", "von"}
+INDEX_COLS = ["source", "name", "name_key", "player_id", "is_ambiguous"]
+
+
+def _tokens(name: str):
+    """
+        Split a name into tokens without accents, dots, apostrophes and hyphens (Jo-Wilfried -> JoWilfried)
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return name.replace("'", "").replace("-", "").split()
+
+
+def _make_key(surname_tokens: list[str], given_name: str, surname_length: int | None = 3):
+    surname = "".join(surname_tokens).replace(".", "").lower()
+    if not surname:
+        return None
+    initial = given_name.replace(".", "")[:1].lower()
+    return f"{surname[:surname_length]} {initial}"
+
+
+def _atp_key_candidates(name, surname_length: int | None = 3):
+    """
+        Possible keys of a full name (Given [Given2 ...] Surname [Surname2 ...]). The first candidate uses
+        the surname starting at the first particle (del, van, ...) or the last token, the others try every
+        other split of the given names and the surname (e.g. Pablo Carreno Busta).
+    """
+    if pd.isnull(name):
+        return []
+    parts = _tokens(name)
+    if len(parts) == 0:
+        return []
+    if len(parts) == 1:
+        return [_make_key(parts, "", surname_length)]
+
+    start = next((i for i in range(1, len(parts)) if parts[i].lower() in SURNAME_PARTICLES), len(parts) - 1)
+    candidates = [_make_key(parts[start:], parts[0], surname_length)]
+    for i in range(1, len(parts)):
+        key = _make_key(parts[i:], parts[0], surname_length)
+        if key not in candidates:
+            candidates.append(key)
+    return candidates
+
+
+def _odds_key(name, surname_length: int | None = 3):
+    """
+        Key of an abbreviated name (Surname [Surname2 ...] I.[I.]), e.g. Del Potro J.M. -> del j
+    """
+    if pd.isnull(name):
+        return None
+    parts = _tokens(name)
+    if len(parts) == 0:
+        return None
+
+    n_surname = len(parts)
+    while n_surname > 1 and parts[n_surname - 1].endswith("."):
+        n_surname -= 1
+    if n_surname == len(parts) and len(parts) > 1:
+        n_surname -= 1
+    given_name = parts[n_surname] if n_surname < len(parts) else ""
+    return _make_key(parts[:n_surname], given_name, surname_length)
+
+
+def _map_unique(names: pd.Series, func):
+    """
+        Apply func to every distinct value of names only once and broadcast the result back to every row
+    """
+    codes, uniques = pd.factorize(names)
+    mapped = np.array([func(value) for value in uniques] + [None], dtype=object)
+    return pd.Series(mapped[codes], index=names.index, dtype=object)
+
+
+def normalize_odds_names(names: pd.Series, surname_length: int | None = 3):
+    """
+        Normalize abbreviated player names (odds data) into "sur i" keys: the first three letters of the
+        surname and the initial of the first given name.
+
+        Params:
+            names: pd.Series
+            surname_length: int | None (letters kept from the surname, the whole surname if None)
+
+        Return:
+            pd.Series: the keys (None for missing names)
+    """
+    return _map_unique(names, lambda name: _odds_key(name, surname_length))
+
+
+def normalize_atp_names(names: pd.Series, known_keys: set | None = None, surname_length: int | None = 3):
+    """
+        Normalize full player names (match statistics) into "sur i" keys. For multi-token names the surname
+        can not be found from the name only, so if known_keys (e.g. the keys of the odds data) are given
+        the first candidate found in them is used.
+
+        Params:
+            names: pd.Series
+            known_keys: set | None
+            surname_length: int | None (letters kept from the surname, the whole surname if None)
+
+        Return:
+            pd.Series: the keys (None for missing names)
+    """
+    def _atp_key(name):
+        candidates = _atp_key_candidates(name, surname_length)
+        if not candidates:
+            return None
+        if known_keys:
+            return next((key for key in candidates if key in known_keys), candidates[0])
+        return candidates[0]
+
+    return _map_unique(names, _atp_key)
+
+
+def build_player_index(atp_df: pd.DataFrame, odds_df: pd.DataFrame | None = None,
+                       atp_name_cols: tuple = ("winner_name", "loser_name"),
+                       atp_id_cols: tuple = ("winner_id", "loser_id"),
+                       odds_name_cols: tuple = ("Winner", "Loser")):
+    """
+        Build the name -> player_id table of the match statistics and the odds data.
+        The player_id is the ATP id of the player (if the id columns exist). The odds names get the id of
+        the ATP player with the same key; if more ATP players share the key the one with the most matches
+        is used and the row is flagged as ambiguous. Keys without ATP player get new ids.
+
+        Params:
+            atp_df: pd.DataFrame
+            odds_df: pd.DataFrame | None
+            atp_name_cols: tuple
+            atp_id_cols: tuple (ids are generated from the keys if they are not in atp_df)
+            odds_name_cols: tuple
+
+        Return:
+            pd.DataFrame: source, name, name_key, player_id, is_ambiguous
+    """
+    odds_names = pd.Series(dtype=object)
+    if odds_df is not None:
+        odds_names = pd.concat([odds_df[col] for col in odds_name_cols], ignore_index=True).dropna()
+    odds = pd.DataFrame({"name": odds_names.unique()})
+    odds["name_key"] = normalize_odds_names(odds["name"])
+    known_keys = set(odds["name_key"].dropna())
+
+    atp_names = pd.concat([atp_df[col] for col in atp_name_cols], ignore_index=True)
+    if all(col in atp_df.columns for col in atp_id_cols):
+        atp_ids = pd.concat([atp_df[col] for col in atp_id_cols], ignore_index=True)
+    else:
+        atp_ids = pd.Series(np.nan, index=atp_names.index)
+    atp = pd.DataFrame({"name": atp_names, "player_id": atp_ids}).dropna(subset=["name"])
+    atp = atp.groupby(["name", "player_id"], dropna=False).size().rename("n_matches").reset_index()
+    atp["name_key"] = normalize_atp_names(atp["name"], known_keys)
+
+    # Keys without ATP id get new ids after the biggest ATP id
+    next_id = int(atp["player_id"].max()) + 1 if atp["player_id"].notna().any() else 0
+    missing_keys = pd.Index(
+        pd.concat([atp.loc[atp["player_id"].isna(), "name_key"], odds["name_key"]]).dropna().unique()
+    ).difference(atp.loc[atp["player_id"].notna(), "name_key"].dropna())
+    new_ids = pd.Series(np.arange(next_id, next_id + len(missing_keys)), index=missing_keys)
+    atp["player_id"] = atp["player_id"].fillna(atp["name_key"].map(new_ids))
+
+    key_counts = atp.groupby(["name_key", "player_id"])["n_matches"].sum().reset_index()
+    n_ids = key_counts.groupby("name_key")["player_id"].transform("size")
+    key_counts["is_ambiguous"] = n_ids > 1
+    key_ids = key_counts.sort_values("n_matches", ascending=False).drop_duplicates("name_key").set_index("name_key")
+
+    odds["player_id"] = odds["name_key"].map(key_ids["player_id"]).fillna(odds["name_key"].map(new_ids))
+    ambiguous_keys = key_ids.index[key_ids["is_ambiguous"]]
+    odds["is_ambiguous"] = odds["name_key"].isin(ambiguous_keys)
+    atp["is_ambiguous"] = atp["name_key"].isin(ambiguous_keys)
+
+    atp["source"] = "atp"
+    odds["source"] = "odds"
+    index = pd.concat([atp[INDEX_COLS], odds[INDEX_COLS]], ignore_index=True)
+    index["player_id"] = index["player_id"].astype("Int64")
+    print(f"[INFO] Player index created. Names: {len(index)}, players: {index['player_id'].nunique()}, "
+          f"ambiguous names: {index['is_ambiguous'].sum()}")
+    return index
+
+
+def save_player_index(index: pd.DataFrame, path: str):
+    """
+        Save the player index as csv
+    """
+    index.to_csv(path, index=False)
+    print(f"[INFO] Player index saved into {path}")
+
+
+def load_player_index(path: str):
+    """
+        Load the player index saved by save_player_index
+    """
+    return pd.read_csv(path, dtype={"player_id": "Int64", "is_ambiguous": bool})
+
+
+def attach_player_ids(df: pd.DataFrame, index: pd.DataFrame, name_cols: tuple, source: str):
+    """
+        Add a <name_col>_player_id integer column for every name column, so the match statistics and the
+        odds data can be joined on integer keys
+
+        Params:
+            df: pd.DataFrame
+            index: pd.DataFrame (built by build_player_index)
+            name_cols: tuple (e.g. ("winner_name", "loser_name") or ("Winner", "Loser"))
+            source: str ("atp" or "odds")
+
+        Return:
+            pd.DataFrame: a new dataframe with the id columns
+    """
+    source_index = index[index["source"] == source].drop_duplicates("name").set_index("name")["player_id"]
+    return df.assign(**{f"{col}_player_id": df[col].map(source_index) for col in name_cols})
@@ -1,12 +1,20 @@
 # Vizualizáció segédfüggvények
 
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import seaborn as sns
 import pandas as pd
 import missingno as msno
 import numpy as np
 import scipy.stats as stats
 
+from src.utils import association_utils, correlation_utils, profile_utils
+
 
 def plot_numerical_distributions(cols_name_pairs: list[list[str]], 
                                      title: list[str], 
@@ -45,7 +53,7 @@ def plot_missing_values_matrix(df: pd.DataFrame, show_only_missing_values: bool
         show_only_missing_values: (bool) If True, only show columns with missing values.
     """
     if(show_only_missing_values):
-        missing_values = df.isna().sum()
+        missing_values = profile_utils.profile_dataframe(df)["columns"]["missing_count"]
         missing_cols = missing_values[missing_values > 0].sort_values(ascending=False).index
         df = df[missing_cols]
     msno.matrix(df)
@@ -104,29 +112,23 @@ def plot_summary_numerical_features(df: pd.DataFrame, target_col: str):
     Notes:
         - Histograms and boxplots are displayed for each numeric feature.
         - Missing percentage is calculated as the fraction of NaN values multiplied by 100.
+        - For wide frames use save_numerical_features_report, which renders the figures in parallel into files.
     """
     numerical_df = df.select_dtypes(include="number")
     numerical_cols = [col for col in numerical_df if col != target_col]
+    # Every stat comes from the one pass profile of the frame
+    profile = profile_utils.profile_dataframe(df)["columns"]
     summary_stats = []
     for col in numerical_cols:
-        # Missing data ratio
-        missing_pct = df[col].isna().mean() * 100
-
-        # Stats
-        col_min = df[col].min()
-        col_max = df[col].max()
-        col_mean = df[col].mean()
-        col_median = df[col].median()
-        col_std = df[col].std()
-
+        col_stats = profile.loc[col]
         summary_stats.append({
             'column': col,
-            'missing_pct': missing_pct,
-            'min': col_min,
-            'max': col_max,
-            'mean': col_mean,
-            'median': col_median,
-            'std': col_std
+            'missing_pct': col_stats['missing_pct'],
+            'min': col_stats['min'],
+            'max': col_stats['max'],
+            'mean': col_stats['mean'],
+            'median': col_stats['median'],
+            'std': col_stats['std']
         })
 
         # Vizulise
@@ -173,15 +175,17 @@ def plot_summary_categorical_features(df: pd.DataFrame, target_col: str):
         - Missing percentage is calculated as the fraction of NaN values multiplied by 100.
         - The 'top_values' field in the summary contains the 5 most frequent values as a dictionary.
     """
-    obj_df = df.select_dtypes(include="object")
+    obj_df = df.select_dtypes(include=["object", "category"])
     obj_df_cols = [col for col in obj_df if col != target_col]
+    profile = profile_utils.profile_dataframe(df)
     cat_summary = []
 
     for col in obj_df_cols:
-        unique_vals = df[col].nunique()
-        missing_pct = df[col].isnull().mean() * 100
-        top_values = df[col].value_counts().head(5)
-        
+        unique_vals = profile["columns"].loc[col, "unique_count"]
+        missing_pct = profile["columns"].loc[col, "missing_pct"]
+        value_counts = profile["value_counts"][col]
+        top_values = value_counts.head(5)
+
         cat_summary.append({
             'column': col,
             'unique_count': unique_vals,
@@ -192,7 +196,7 @@ def plot_summary_categorical_features(df: pd.DataFrame, target_col: str):
         # Csak a low-cardinality oszlopokat rajzoljuk ki (pl. max 20 egyedi érték)
         if unique_vals <= 20:
             plt.figure(figsize=(6, 4))
-            sns.countplot(y=col, data=df, order=df[col].value_counts().index, palette='crest')
+            sns.countplot(y=col, data=df, order=value_counts.index, palette='crest')
             plt.title(f'{col} - practicality of values')
             plt.show()
 
@@ -220,14 +224,14 @@ def visualize_numeric_correlations(df: pd.DataFrame, target_col: str):
     numerical_df = df.select_dtypes(include="number")
     numerical_col = [col for col in numerical_df.columns if col != target_col]
 
-    corr_matric = df[numerical_col].corr()
+    corr_matric = correlation_utils.correlation_matrix(df, numerical_col)
 
     plt.figure(figsize=(14,10))
     sns.heatmap(corr_matric, cmap="coolwarm", center=0)
     plt.title("Correlation metrix of the numerical features")
     plt.show()
 
-def categorical_target_cramersv (df: pd.DataFrame, target_col: str):
+def categorical_target_cramersv (df: pd.DataFrame, target_col: str, max_workers: int | None = 1):
     """
     Computes and ranks Cramér's V correlations between categorical features and the target column.
 
@@ -241,6 +245,8 @@ def categorical_target_cramersv (df: pd.DataFrame, target_col: str):
             The input DataFrame containing the target and other features.
         target_col (str):
             The name of the target column for correlation calculation.
+        max_workers (int | None):
+            Number of processes computing the columns (1 computes in the current process).
 
     Returns:
         list[tuple[str, float]]:
@@ -249,31 +255,15 @@ def categorical_target_cramersv (df: pd.DataFrame, target_col: str):
 
     Notes:
         - Cramér's V is computed using a bias-corrected formula.
-        - Only object dtype columns are considered as categorical features.
+        - Only object and category dtype columns are considered as categorical features.
         - The target column must be categorical or convertible to categorical.
+        - association_utils.cramers_v_matrix gives the feature x feature associations.
     """
-    categorical_df = df.select_dtypes(include="object")
+    categorical_df = df.select_dtypes(include=["object", "category"])
     categorical_cols = [col for col in categorical_df if col != target_col]
 
-    def _cramers_v(x, y):
-        confusion_matrix = pd.crosstab(x, y)
-        chi2 = stats.chi2_contingency(confusion_matrix)[0]
-        n = confusion_matrix.sum().sum()
-        phi2 = chi2 / n
-        r,k = confusion_matrix.shape
-        phi2corr = max(0, phi2 - ((k-1)*(r-1))/(n-1))
-        rcorr = r - ((r-1)**2)/(n-1)
-        kcorr = k - ((k-1)**2)/(n-1)
-        return np.sqrt(phi2corr / min((kcorr-1), (rcorr-1)))
-
-    cat_corrs = {}
-    for col in categorical_cols:
-        if col != target_col:
-            cat_corrs[col] = _cramers_v(df[col], df[target_col])
-
-    # Result
-    sorted_cat_corrs = sorted(cat_corrs.items(), key=lambda x: x[1], reverse=True)
-    return sorted_cat_corrs
+    # Every column is factorized once and the contingency tables are built with np.bincount
+    return association_utils.target_cramers_v(df, target_col, categorical_cols, max_workers=max_workers)
 
 
 def plot_features_importance(df: pd.DataFrame, target_col: str):
@@ -298,9 +288,10 @@ def plot_features_importance(df: pd.DataFrame, target_col: str):
             displays two bar plots (positive and negative correlations).
     """
     numerical_df = df.select_dtypes(include="number")
-    numeric_cols = numerical_df.columns.to_list()
+    numeric_cols = [col for col in numerical_df.columns if col != target_col]
 
-    target_corr = df[numeric_cols].corr()[target_col].drop(target_col).sort_values(ascending=False)
+    # Only the target column of the correlation matrix is computed
+    target_corr = correlation_utils.target_correlations(df, target_col, numeric_cols)
 
     # Top 15 legerősebb kapcsolat
     print("Top 15 most important positive connection:")
@@ -318,4 +309,155 @@ def plot_features_importance(df: pd.DataFrame, target_col: str):
     plt.figure(figsize=(8,6))
     target_corr.tail(15).plot(kind='barh', color='red')
     plt.title(f"Top 15 nagaive coor with {target_col}")
-    plt.show()
\ No newline at end of file
+    plt.show()
+
+def _numeric_plot_data(col: str, values: np.ndarray, bins: int = 30, kde_max_rows: int | None = None,
+                       kde_points: int = 200, max_fliers: int = 1000, seed: int = 42):
+    """
+    Precomputes everything a histogram + KDE and a boxplot of a column needs, so only these small arrays
+    are sent to the rendering processes and not the raw column.
+
+    Args:
+        col (str): Name of the column.
+        values (np.ndarray): Values of the column (NaN values are skipped).
+        bins (int): Number of histogram bins.
+        kde_max_rows (int | None): The KDE is fitted on a random sample of this many rows (all rows if None).
+        kde_points (int): Number of points of the KDE curve.
+        max_fliers (int): The outliers of the boxplot are downsampled to this many points.
+        seed (int): Seed of the downsampling.
+
+    Returns:
+        dict: Histogram counts and edges, KDE curve (scaled to counts) and the boxplot statistics.
+    """
+    values = values[~np.isnan(values)]
+    data = {"column": col, "counts": None, "edges": None, "kde_x": None, "kde_y": None, "box": None}
+    if len(values) == 0:
+        return data
+    rng = np.random.default_rng(seed)
+    counts, edges = np.histogram(values, bins=bins)
+    data.update(counts=counts, edges=edges)
+
+    if values.min() < values.max():
+        kde_values = values
+        if kde_max_rows is not None and len(values) > kde_max_rows:
+            kde_values = rng.choice(values, kde_max_rows, replace=False)
+        try:
+            kde = stats.gaussian_kde(kde_values)
+            kde_x = np.linspace(values.min(), values.max(), kde_points)
+            data.update(kde_x=kde_x, kde_y=kde(kde_x) * len(values) * (edges[1] - edges[0]))
+        except np.linalg.LinAlgError:
+            pass
+
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    fliers = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+    if len(fliers) > max_fliers:
+        fliers = rng.choice(fliers, max_fliers, replace=False)
+    data["box"] = {
+        "label": col, "med": median, "q1": q1, "q3": q3, "mean": values.mean(),
+        "whislo": inside.min(), "whishi": inside.max(), "fliers": fliers,
+    }
+    return data
+
+
+def _render_numeric_figure(plot_data: dict, output_file: str):
+    """
+    Renders the histogram + KDE and the boxplot of a column into a PNG with the Agg canvas
+    (no pyplot, so it works in worker processes and without display).
+
+    Returns:
+        str: The output file.
+    """
+    col = plot_data["column"]
+    fig = Figure(figsize=(10, 4))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(1, 2)
+
+    if plot_data["counts"] is not None:
+        axes[0].stairs(plot_data["counts"], plot_data["edges"], fill=True, color='lightblue', edgecolor='steelblue')
+    if plot_data["kde_x"] is not None:
+        axes[0].plot(plot_data["kde_x"], plot_data["kde_y"], color='steelblue')
+    axes[0].set_title(f"{col} - Histogram")
+    axes[0].set_xlabel(col)
+    axes[0].set_ylabel("Count")
+
+    if plot_data["box"] is not None:
+        axes[1].bxp([plot_data["box"]], orientation="horizontal", patch_artist=True, showfliers=True,
+                    boxprops={"facecolor": 'lightgreen'})
+    axes[1].set_title(f"{col} - Boxplot")
+    axes[1].set_yticks([])
+    axes[1].set_xlabel(col)
+
+    fig.tight_layout()
+    fig.savefig(output_file, dpi=100)
+    return output_file
+
+
+def save_numerical_features_report(df: pd.DataFrame, target_col: str, report_dir: str, file_format: str = "html",
+                                   bins: int = 30, kde_max_rows: int | None = None, max_workers: int | None = None):
+    """
+    Batch, headless version of plot_summary_numerical_features for wide frames.
+
+    The histogram, KDE and box statistics of every numeric column (excluding the target column) are
+    precomputed with NumPy, the figures are rendered in a process pool with the Agg canvas and saved
+    as PNG files, without blocking the notebook with plt.show().
+
+    Args:
+        df (pd.DataFrame):
+            The input DataFrame containing numeric and other features.
+        target_col (str):
+            The name of the target column to exclude from numeric analysis.
+        report_dir (str):
+            Folder of the PNG files (and of index.html).
+        file_format (str):
+            "png" writes only the figures, "html" writes an index.html with the summary table and the figures too.
+        bins (int):
+            Number of histogram bins.
+        kde_max_rows (int | None):
+            Random row sample size of the KDE (all rows if None).
+        max_workers (int | None):
+            Number of rendering processes (1 renders in the current process).
+
+    Returns:
+        pd.DataFrame:
+            The summary statistics of plot_summary_numerical_features, with the path of the figure of every column.
+    """
+    numerical_df = df.select_dtypes(include="number")
+    numerical_cols = [col for col in numerical_df if col != target_col]
+    profile = profile_utils.profile_dataframe(df)["columns"]
+    os.makedirs(report_dir, exist_ok=True)
+
+    plot_data = [
+        _numeric_plot_data(col, df[col].to_numpy(dtype=np.float64, na_value=np.nan), bins, kde_max_rows)
+        for col in numerical_cols
+    ]
+    output_files = [os.path.join(report_dir, f"{i:03d}_{''.join(c if c.isalnum() else '_' for c in str(col))}.png")
+                    for i, col in enumerate(numerical_cols)]
+    if max_workers == 1:
+        list(map(_render_numeric_figure, plot_data, output_files))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_render_numeric_figure, plot_data, output_files, chunksize=4))
+    print(f"[INFO] {len(output_files)} figures saved into {report_dir}")
+
+    num_summary_df = pd.DataFrame({
+        'column': numerical_cols,
+        **{stat: profile.loc[numerical_cols, stat].to_numpy(dtype=np.float64)
+           for stat in ['missing_pct', 'min', 'max', 'mean', 'median', 'std']},
+        'figure': output_files,
+    })
+
+    if file_format == "html":
+        sections = "\n".join(
+            f"<h2>{html.escape(str(col))}</h2>\n<img src=\"{os.path.basename(output_file)}\">"
+            for col, output_file in zip(numerical_cols, output_files)
+        )
+        table = num_summary_df.drop(columns=['figure']).sort_values(by='missing_pct', ascending=False)
+        report_file = os.path.join(report_dir, "index.html")
+        with open(report_file, "w", encoding="utf-8") as f:
+            f.write("<html><head><meta charset=\"utf-8\"><title>Numerical features</title></head><body>\n"
+                    f"<h1>Numerical features</h1>\n{table.to_html(index=False, float_format='%.4g')}\n"
+                    f"{sections}\n</body></html>\n")
+        print(f"[INFO] Report saved into {report_file}")
+    return num_summary_df
@@ -0,0 +1,151 @@
+# Oszlopprofil (hiányzó értékek, statisztikák, kategóriák) egyetlen menetben, gyorsítótárral
+
+import hashlib
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75)
+DEFAULT_TOP_K = 20
+NUMERIC_BLOCK_SIZE = 64
+MAX_CACHED_PROFILES = 8
+
+_profile_cache = {}
+
+
+def dataset_fingerprint(df: pd.DataFrame):
+    """
+        Content hash of the dataframe (shape, column names, dtypes, index and values). The numerical columns are
+        hashed from their raw bytes, the other columns from pandas' hash of the values.
+
+        Return:
+            str
+    """
+    digest = hashlib.sha1()
+    digest.update(repr((df.shape, [str(col) for col in df.columns], [str(dtype) for dtype in df.dtypes])).encode())
+    digest.update(pd.util.hash_pandas_object(df.index).to_numpy().tobytes())
+    for i in range(df.shape[1]):
+        series = df.iloc[:, i]
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufcmM":
+            digest.update(np.ascontiguousarray(series.to_numpy()).tobytes())
+        else:
+            digest.update(pd.util.hash_pandas_object(series, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _numeric_profile(df: pd.DataFrame, cols: list, quantiles: tuple):
+    """
+        Missing count and moments / quantiles of the numerical columns, computed on 2-D float blocks
+        of NUMERIC_BLOCK_SIZE columns (one pass over every block)
+    """
+    rows = []
+    for start in range(0, len(cols), NUMERIC_BLOCK_SIZE):
+        block_cols = cols[start:start + NUMERIC_BLOCK_SIZE]
+        block = np.column_stack([df[col].to_numpy(dtype=np.float64, na_value=np.nan) for col in block_cols])
+        missing = np.isnan(block)
+        with warnings.catch_warnings():
+            # all missing columns give NaN statistics
+            warnings.simplefilter("ignore", RuntimeWarning)
+            block_stats = {
+                "missing_count": missing.sum(axis=0),
+                "min": np.nanmin(block, axis=0),
+                "max": np.nanmax(block, axis=0),
+                "mean": np.nanmean(block, axis=0),
+                "std": np.nanstd(block, axis=0, ddof=1),
+            }
+            block_quantiles = np.nanquantile(block, quantiles, axis=0)
+        for i, q in enumerate(quantiles):
+            block_stats["median" if q == 0.5 else f"q{int(round(q * 100))}"] = block_quantiles[i]
+        rows.append(pd.DataFrame(block_stats, index=block_cols))
+    return pd.concat(rows) if rows else pd.DataFrame()
+
+
+def _categorical_profile(df: pd.DataFrame, cols: list, top_k: int):
+    """
+        Missing count, cardinality and the top_k most frequent values of the other columns,
+        from one factorize of every column
+    """
+    rows, value_counts = {}, {}
+    for col in cols:
+        codes, uniques = pd.factorize(df[col])
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        top = np.argsort(-counts, kind="stable")[:top_k]
+        rows[col] = {"missing_count": int((codes < 0).sum()), "unique_count": len(uniques)}
+        value_counts[col] = pd.Series(counts[top], index=pd.Index(np.asarray(uniques)[top], name=col), name="count")
+    return pd.DataFrame.from_dict(rows, orient="index"), value_counts
+
+
+def profile_dataframe(df: pd.DataFrame, quantiles: tuple = DEFAULT_QUANTILES, top_k: int = DEFAULT_TOP_K,
+                      cache_dir: str | None = None):
+    """
+        Profile every column of the dataframe in one pass: missing count and percent for every column,
+        min / max / mean / std / quantiles for the numerical columns, unique count and the most frequent
+        values for the other columns. The profile is cached by the fingerprint of the data (in memory,
+        and in cache_dir if it is given), so the summaries of the same data reuse it.
+
+        Params:
+            df: pd.DataFrame
+            quantiles: tuple (0.5 is stored as the median)
+            top_k: int (number of most frequent values kept of the non numerical columns)
+            cache_dir: str | None
+
+        Return:
+            dict: rows, columns (pd.DataFrame, one row per column), value_counts (dict of pd.Series)
+                  and fingerprint
+    """
+    fingerprint = dataset_fingerprint(df)
+    cache_key = (fingerprint, tuple(quantiles), top_k)
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = os.path.join(cache_dir, f"profile_{fingerprint}_{top_k}_{'_'.join(map(str, quantiles))}.pkl")
+
+    profile = _profile_cache.get(cache_key)
+    if profile is None and cache_file is not None and os.path.isfile(cache_file):
+        with open(cache_file, "rb") as f:
+            profile = pickle.load(f)
+        _cache_profile(cache_key, profile)
+    if profile is not None:
+        _save_profile(profile, cache_file)
+        return profile
+
+    numeric_cols = df.select_dtypes(include="number").columns.tolist()
+    other_cols = [col for col in df.columns if col not in set(numeric_cols)]
+    numeric = _numeric_profile(df, numeric_cols, quantiles)
+    categorical, value_counts = _categorical_profile(df, other_cols, top_k)
+
+    columns = pd.concat([numeric, categorical]).reindex(df.columns)
+    columns.insert(0, "dtype", df.dtypes.astype(str))
+    columns.insert(1, "kind", np.where(columns.index.isin(numeric_cols), "numeric", "categorical"))
+    columns["missing_count"] = columns["missing_count"].astype(np.int64)
+    columns.insert(3, "missing_pct", columns["missing_count"] / max(len(df), 1) * 100)
+    profile = {"rows": len(df), "columns": columns, "value_counts": value_counts, "fingerprint": fingerprint}
+    print(f"[INFO] Profiled {len(df.columns)} columns of {len(df)} rows")
+
+    _cache_profile(cache_key, profile)
+    _save_profile(profile, cache_file)
+    return profile
+
+
+def _save_profile(profile: dict, cache_file: str | None):
+    if cache_file is None or os.path.isfile(cache_file):
+        return
+    os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+    with open(cache_file, "wb") as f:
+        pickle.dump(profile, f)
+
+
+def _cache_profile(cache_key: tuple, profile: dict):
+    if len(_profile_cache) >= MAX_CACHED_PROFILES:
+        _profile_cache.pop(next(iter(_profile_cache)))
+    _profile_cache[cache_key] = profile
+
+
+def clear_profile_cache():
+    """
+        Remove the profiles cached in memory
+    """
+    _profile_cache.clear()